@@ -0,0 +1,46 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def period_cutoff(day):
+    """
+    Exclusive upper bound on a ``created_at`` timestamp for a business day.
+    """
+    next_day = datetime.datetime.combine(
+        day + datetime.timedelta(days=1), datetime.time.min
+    )
+    return timezone.make_aware(next_day)
+
+
+def _start_month():
+    return getattr(settings, "FISCAL_YEAR_START_MONTH", 4)
+
+
+def fiscal_year_start_year(day):
+    """
+    Calendar year in which the fiscal year containing ``day`` starts.
+    """
+    if day.month >= _start_month():
+        return day.year
+    return day.year - 1
+
+
+def fiscal_year_bounds(start_year):
+    """
+    First and last day of the fiscal year starting in ``start_year``.
+    """
+    month = _start_month()
+    first_day = datetime.date(start_year, month, 1)
+    last_day = datetime.date(start_year + 1, month, 1) - datetime.timedelta(days=1)
+    return first_day, last_day
+
+
+def fiscal_year_label(start_year):
+    """
+    Display label of a fiscal year, e.g. ``"2025-26"``.
+    """
+    if _start_month() == 1:
+        return str(start_year)
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
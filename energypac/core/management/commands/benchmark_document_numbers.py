@@ -0,0 +1,113 @@
+import datetime
+import multiprocessing
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.models import DocumentSequence
+from core.numbering import DocumentType, format_number, is_gap_free, next_number
+from core.transactions import with_retry
+
+
+# Benchmarks number a throwaway fiscal year so real series are untouched.
+BENCHMARK_DAY = datetime.date(1900, 12, 31)
+
+
+def _allocate_many(document_type, count):
+    try:
+        return [
+            with_retry(lambda: next_number(document_type, BENCHMARK_DAY))
+            for _ in range(count)
+        ]
+    finally:
+        connections.close_all()
+
+
+def _allocate_in_threads(document_type, threads, count):
+    results = []
+    lock = threading.Lock()
+
+    def run():
+        numbers = _allocate_many(document_type, count)
+        with lock:
+            results.extend(numbers)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def _process_worker(args):
+    connections.close_all()
+    return _allocate_in_threads(*args)
+
+
+class Command(BaseCommand):
+    help = (
+        "Allocate document numbers from many threads and processes, check "
+        "that none repeat and report the throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--document-type",
+            choices=DocumentType.values,
+            default=DocumentType.PURCHASE_ORDER,
+        )
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument("--threads", type=int, default=4, help="Per process.")
+        parser.add_argument(
+            "--count", type=int, default=250, help="Numbers allocated per thread."
+        )
+
+    def _reset(self, document_type):
+        DocumentSequence.objects.filter(
+            document_type=document_type, fiscal_year=BENCHMARK_DAY.year
+        ).delete()
+
+    def handle(self, *args, **options):
+        document_type = options["document_type"]
+        processes = options["processes"]
+        job = (document_type, options["threads"], options["count"])
+
+        self._reset(document_type)
+        connections.close_all()
+        began = time.perf_counter()
+        if processes > 1:
+            with multiprocessing.get_context("fork").Pool(processes) as pool:
+                numbers = [
+                    number
+                    for chunk in pool.map(_process_worker, [job] * processes)
+                    for number in chunk
+                ]
+        else:
+            numbers = _allocate_in_threads(*job)
+        elapsed = time.perf_counter() - began
+        self._reset(document_type)
+
+        duplicates = len(numbers) - len(set(numbers))
+        if duplicates:
+            raise CommandError(f"{duplicates} duplicate number(s) allocated.")
+
+        mode = "block"
+        if is_gap_free(document_type):
+            mode = "gap-free"
+            expected = {
+                format_number(document_type, BENCHMARK_DAY.year, number)
+                for number in range(1, len(numbers) + 1)
+            }
+            if expected != set(numbers):
+                raise CommandError("Gap-free numbers are not contiguous.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(numbers)} unique {document_type} numbers ({mode}) from "
+                f"{processes} process(es) x {options['threads']} thread(s) in "
+                f"{elapsed:.2f}s ({len(numbers) / elapsed:.0f} numbers/s)."
+            )
+        )
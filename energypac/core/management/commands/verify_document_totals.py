@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.totals import document_models, mismatched_totals, refresh_totals
+
+
+class Command(BaseCommand):
+    help = "Check stored document totals against their lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Recalculate the documents whose totals are wrong.",
+        )
+
+    def handle(self, *args, **options):
+        wrong = 0
+        for model in document_models():
+            document_ids = list(mismatched_totals(model).values_list("pk", flat=True))
+            if not document_ids:
+                continue
+
+            wrong += len(document_ids)
+            label = model._meta.verbose_name_plural
+            if options["repair"]:
+                for start in range(0, len(document_ids), 500):
+                    refresh_totals(model, document_ids[start:start + 500])
+                self.stdout.write(f"Repaired {len(document_ids)} {label}.")
+            else:
+                self.stdout.write(f"{len(document_ids)} {label} with wrong totals.")
+
+        if not wrong:
+            self.stdout.write(self.style.SUCCESS("Document totals are consistent."))
+        elif options["repair"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"Repaired {wrong} document(s) with wrong totals.")
+            )
+        else:
+            raise CommandError(f"{wrong} document(s) with wrong totals.")
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 11:30
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document_type', models.CharField(choices=[('PR', 'Purchase Requisition'), ('PO', 'Purchase Order'), ('GRN', 'Goods Receipt Note'), ('SQ', 'Sales Quotation'), ('SO', 'Sales Order'), ('INV', 'Sales Invoice'), ('DSP', 'Dispatch'), ('SHP', 'Shipment')], max_length=10)),
+                ('fiscal_year', models.PositiveIntegerField(help_text='Calendar year in which the fiscal year starts')),
+                ('next_value', models.PositiveBigIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Document Sequence',
+                'verbose_name_plural': 'Document Sequences',
+                'db_table': 'document_sequences',
+                'constraints': [models.UniqueConstraint(fields=('document_type', 'fiscal_year'), name='uniq_document_sequence_type_year')],
+            },
+        ),
+    ]
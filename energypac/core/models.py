@@ -1,6 +1,8 @@
 import uuid
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+
+from core.signals import post_bulk_write, pre_bulk_write
 
 
 class UUIDModel(models.Model):
@@ -178,3 +180,178 @@ class AuditModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class MaintainedFieldsModel(models.Model):
+    """
+    Abstract base model for rows carrying figures maintained by services.
+    A plain save() of an existing row leaves ``maintained_fields`` alone, so
+    a stale instance cannot overwrite them.
+    """
+
+    maintained_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and not field.generated
+                and field.name not in self.maintained_fields
+            ]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+class DocumentTotalsModel(MaintainedFieldsModel):
+    """
+    Abstract base model for documents with stored totals.
+    Totals are summed from the document's ``items`` lines by core.totals.
+    """
+
+    maintained_fields = ("subtotal", "tax_amount")
+
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    grand_total = models.GeneratedField(
+        expression=models.F("subtotal") + models.F("tax_amount"),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        db_persist=True,
+    )
+
+    class Meta:
+        abstract = True
+
+
+class TaxedLineModel(models.Model):
+    """
+    Abstract base model for document lines taxed from the Tax master.
+    The GST amounts are filled in by masters.taxes from ``tax`` and the
+    GST state of the document's party.
+    """
+
+    tax = models.ForeignKey(
+        "masters.Tax",
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="+",
+    )
+
+    cgst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    sgst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    igst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    tax_amount = models.GeneratedField(
+        expression=(
+            models.F("cgst_amount") + models.F("sgst_amount") + models.F("igst_amount")
+        ),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        db_persist=True,
+    )
+
+    # Fields the GST amounts are calculated from.
+    TAX_INPUT_FIELDS = {"quantity", "rate", "tax", "tax_id"}
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, update_fields=None, **kwargs):
+        # Amounts recalculated on pre_save are only written if saved too.
+        if update_fields is not None and self.TAX_INPUT_FIELDS.intersection(
+            update_fields
+        ):
+            update_fields = {
+                *update_fields,
+                "cgst_amount",
+                "sgst_amount",
+                "igst_amount",
+            }
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class BulkSignalQuerySet(models.QuerySet):
+    """
+    QuerySet that sends ``post_bulk_write`` after bulk writes (and
+    ``pre_bulk_write`` before bulk updates), so rollups kept in step with a
+    model also see rows written in bulk. The write and
+    the receivers share a transaction, so a receiver can reject the write.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            post_bulk_write.send(
+                sender=self.model,
+                instances=created,
+                created=True,
+                fields=None,
+                using=self.db,
+            )
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            pre_bulk_write.send(
+                sender=self.model, instances=objs, fields=list(fields), using=self.db
+            )
+            updated = super().bulk_update(objs, fields, *args, **kwargs)
+            post_bulk_write.send(
+                sender=self.model,
+                instances=objs,
+                created=False,
+                fields=list(fields),
+                using=self.db,
+            )
+        return updated
+
+
+class DocumentSequence(UUIDModel, TimeStampedModel):
+    """
+    Number series of one document type in one fiscal year.
+    ``next_value`` is the first number not yet handed out.
+    """
+
+    class DocumentType(models.TextChoices):
+        PURCHASE_REQUISITION = "PR", "Purchase Requisition"
+        PURCHASE_ORDER = "PO", "Purchase Order"
+        GOODS_RECEIPT = "GRN", "Goods Receipt Note"
+        SALES_QUOTATION = "SQ", "Sales Quotation"
+        SALES_ORDER = "SO", "Sales Order"
+        SALES_INVOICE = "INV", "Sales Invoice"
+        DISPATCH = "DSP", "Dispatch"
+        SHIPMENT = "SHP", "Shipment"
+
+    document_type = models.CharField(max_length=10, choices=DocumentType.choices)
+
+    fiscal_year = models.PositiveIntegerField(
+        help_text="Calendar year in which the fiscal year starts"
+    )
+
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    class Meta:
+        db_table = "document_sequences"
+        verbose_name = "Document Sequence"
+        verbose_name_plural = "Document Sequences"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document_type", "fiscal_year"],
+                name="uniq_document_sequence_type_year",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.document_type} {self.fiscal_year}"
@@ -0,0 +1,165 @@
+"""
+Document numbers.
+
+Every document type has one number series per fiscal year, kept in
+``DocumentSequence``. Numbers are handed out in blocks: a process reserves
+``DOCUMENT_NUMBER_BLOCK_SIZE`` numbers with one short transaction and then
+serves them from memory, so most allocations never touch the database.
+Numbers are unique but not gap-free, since a block is lost when its
+process exits.
+
+Document types listed in ``GAP_FREE_DOCUMENT_TYPES`` (sales invoices by
+default) instead take one number at a time under a row lock held until the
+caller's transaction commits, so a rolled back document gives its number
+back. Those allocations are serialised per series.
+"""
+
+import os
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.transaction import TransactionManagementError
+from django.db.models import F
+from django.utils import timezone
+
+from core.dates import fiscal_year_label, fiscal_year_start_year
+from core.models import DocumentSequence
+from core.transactions import with_retry
+
+
+DocumentType = DocumentSequence.DocumentType
+
+DEFAULT_FORMAT = "{type}/{fy}/{number:05d}"
+
+_lock = threading.Lock()
+_blocks = {}
+_pid = os.getpid()
+
+
+def _block_size():
+    return getattr(settings, "DOCUMENT_NUMBER_BLOCK_SIZE", 50)
+
+
+def is_gap_free(document_type):
+    return document_type in getattr(
+        settings, "GAP_FREE_DOCUMENT_TYPES", [DocumentType.SALES_INVOICE]
+    )
+
+
+def format_number(document_type, fiscal_year, number):
+    formats = getattr(settings, "DOCUMENT_NUMBER_FORMATS", {})
+    return formats.get(document_type, DEFAULT_FORMAT).format(
+        type=document_type,
+        fy=fiscal_year_label(fiscal_year),
+        year=fiscal_year,
+        number=number,
+    )
+
+
+def _reserve(document_type, fiscal_year, count, using):
+    """
+    Move the series on by ``count`` and return the first reserved number.
+    Must run inside a transaction, which keeps the row locked.
+    """
+    series = DocumentSequence.objects.using(using).filter(
+        document_type=document_type, fiscal_year=fiscal_year
+    )
+    if not series.update(next_value=F("next_value") + count):
+        try:
+            with transaction.atomic(using=using):
+                DocumentSequence.objects.using(using).create(
+                    document_type=document_type,
+                    fiscal_year=fiscal_year,
+                    next_value=1 + count,
+                )
+            return 1
+        except IntegrityError:
+            # Another process created the series first.
+            series.update(next_value=F("next_value") + count)
+    return series.values_list("next_value", flat=True).get() - count
+
+
+def _take_from_block(key):
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            # Forked: blocks held by the parent must not be served twice.
+            _blocks.clear()
+            _pid = os.getpid()
+        ranges = _blocks.get(key)
+        if not ranges:
+            return None
+        start, end = ranges[0]
+        if start + 1 < end:
+            ranges[0] = (start + 1, end)
+        else:
+            ranges.pop(0)
+        return start
+
+
+def _add_block(key, start, end):
+    if start < end:
+        with _lock:
+            _blocks.setdefault(key, []).append((start, end))
+
+
+def allocate(document_type, count=1, day=None, using=None):
+    """
+    Next ``count`` raw numbers of ``document_type`` in the fiscal year of
+    ``day`` (default today), as a ``(fiscal_year, numbers)`` pair.
+    """
+    fiscal_year = fiscal_year_start_year(day or timezone.localdate())
+
+    if is_gap_free(document_type):
+        if not transaction.get_connection(using).in_atomic_block:
+            raise TransactionManagementError(
+                f"{document_type} numbers are gap-free and must be allocated "
+                "inside the transaction that saves the document."
+            )
+        start = _reserve(document_type, fiscal_year, count, using)
+        return fiscal_year, list(range(start, start + count))
+
+    key = (using, document_type, fiscal_year)
+    numbers = []
+    while len(numbers) < count:
+        number = _take_from_block(key)
+        if number is None:
+            break
+        numbers.append(number)
+
+    needed = count - len(numbers)
+    if not needed:
+        return fiscal_year, numbers
+
+    # Reserve whole blocks and keep what this call does not use.
+    size = -(-needed // _block_size()) * _block_size()
+    start = with_retry(
+        lambda: _reserve(document_type, fiscal_year, size, using), using=using
+    )
+    numbers.extend(range(start, start + needed))
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block:
+        # The reservation only stands if the caller's transaction commits.
+        transaction.on_commit(
+            lambda: _add_block(key, start + needed, start + size), using=using
+        )
+    else:
+        _add_block(key, start + needed, start + size)
+    return fiscal_year, numbers
+
+
+def next_numbers(document_type, count, day=None, using=None):
+    """
+    ``count`` formatted numbers of ``document_type`` for documents dated
+    ``day``, reserved together.
+    """
+    fiscal_year, numbers = allocate(document_type, count, day, using)
+    return [format_number(document_type, fiscal_year, number) for number in numbers]
+
+
+def next_number(document_type, day=None, using=None):
+    """
+    Next formatted number of ``document_type`` for a document dated ``day``.
+    """
+    return next_numbers(document_type, 1, day, using)[0]
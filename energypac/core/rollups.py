@@ -0,0 +1,108 @@
+from django.db import IntegrityError, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+MAX_ATTEMPTS = 3
+LOCK_BATCH_SIZE = 200
+
+
+def _sort_key(key):
+    return tuple("" if value is None else str(value) for value in key)
+
+
+def _batches(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def apply_deltas(model, key_fields, deltas, using=None):
+    """
+    Add per-key deltas to the rollup rows of ``model``.
+
+    ``key_fields`` are attnames identifying a row (e.g. ``("item_id",
+    "warehouse_id")``) and ``deltas`` maps a tuple of their values to a
+    ``{field: delta}`` dict. Existing rows are locked in key order, so
+    concurrent writers cannot deadlock; missing rows are created. The whole
+    batch costs a constant number of queries per ``LOCK_BATCH_SIZE`` keys.
+
+    Returns the affected rows keyed like ``deltas``.
+    """
+    deltas = {
+        key: changes for key, changes in deltas.items() if any(changes.values())
+    }
+    if not deltas:
+        return {}
+
+    using = using or router.db_for_write(model)
+
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with transaction.atomic(using=using):
+                return _apply_deltas(model, key_fields, deltas, using)
+        except IntegrityError:
+            # Another writer created one of our missing rows first.
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+
+
+def _apply_deltas(model, key_fields, deltas, using):
+    keys = sorted(deltas, key=_sort_key)
+    fields = sorted({field for changes in deltas.values() for field in changes})
+    manager = model._default_manager.db_manager(using)
+
+    rows = lock_rows(model, key_fields, keys, using=using)
+
+    existing = []
+    for key, row in rows.items():
+        for field, delta in deltas[key].items():
+            setattr(row, field, getattr(row, field) + delta)
+        existing.append(row)
+
+    created = []
+    for key in keys:
+        if key in rows:
+            continue
+        row = model(**dict(zip(key_fields, key)), **deltas[key])
+        rows[key] = row
+        created.append(row)
+
+    if existing:
+        update_fields = list(fields)
+        if any(field.name == "updated_at" for field in model._meta.fields):
+            now = timezone.now()
+            for row in existing:
+                row.updated_at = now
+            update_fields.append("updated_at")
+        manager.bulk_update(existing, update_fields)
+    if created:
+        manager.bulk_create(created)
+
+    return rows
+
+
+def lock_rows(model, key_fields, keys, using=None):
+    """
+    Select ``model`` rows for the given key tuples with ``SELECT ... FOR
+    UPDATE``, ordered by ``key_fields``. Must run inside a transaction.
+
+    Returns a dict mapping each found key to its row.
+    """
+    manager = model._default_manager.db_manager(using)
+    rows = {}
+
+    for batch in _batches(sorted(keys, key=_sort_key), LOCK_BATCH_SIZE):
+        condition = Q()
+        for key in batch:
+            condition |= Q(**dict(zip(key_fields, key)))
+
+        queryset = (
+            manager.select_for_update()
+            .filter(condition)
+            .order_by(*key_fields)
+        )
+        for row in queryset:
+            key = tuple(getattr(row, field) for field in key_fields)
+            rows.setdefault(key, row)
+
+    return rows
@@ -0,0 +1,14 @@
+from django.db.models.signals import ModelSignal
+
+
+# Sent by BulkSignalQuerySet.bulk_update() before the rows are written, so
+# receivers can read the values being replaced. Arguments: sender,
+# instances, fields and using.
+pre_bulk_write = ModelSignal(use_caching=True)
+
+# Sent by BulkSignalQuerySet after bulk_create() and bulk_update(), which
+# skip the per-instance model signals. Arguments: sender (the model class),
+# instances (the rows written), created (True for bulk_create), fields (the
+# fields bulk_update() wrote, None for bulk_create) and using.
+# Receivers may name the sender lazily as "app_label.ModelName".
+post_bulk_write = ModelSignal(use_caching=True)
@@ -1,3 +1,180 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import numbering
+from core.numbering import DocumentType, next_number
+from core.totals import refresh_totals
+from core.transactions import with_retry
+from items.models import Item, ItemType
+from masters.models import UnitOfMeasure, Vendor
+from procurement.models import PurchaseOrder, PurchaseOrderItem
+
+
+DAY = datetime.date(2026, 5, 1)
+
+
+@override_settings(DOCUMENT_NUMBER_BLOCK_SIZE=10)
+class DocumentNumberTests(TransactionTestCase):
+    """
+    Numbers allocated from many threads must never repeat, and gap-free
+    series must stay contiguous.
+    """
+
+    workers = 8
+    numbers_per_worker = 50
+
+    def setUp(self):
+        numbering._blocks.clear()
+
+    def _allocate_in_threads(self, document_type):
+        numbers = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.workers)
+
+        def run():
+            try:
+                start.wait()
+                for _ in range(self.numbers_per_worker):
+                    number = with_retry(lambda: next_number(document_type, DAY))
+                    with lock:
+                        numbers.append(number)
+            except Exception as exc:
+                with lock:
+                    errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        return numbers
+
+    def test_parallel_block_allocation_never_repeats(self):
+        numbers = self._allocate_in_threads(DocumentType.PURCHASE_ORDER)
+
+        self.assertEqual(len(numbers), self.workers * self.numbers_per_worker)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertIn("PO/2026-27/00001", numbers)
+
+    def test_parallel_gap_free_allocation_is_contiguous(self):
+        numbers = self._allocate_in_threads(DocumentType.SALES_INVOICE)
+
+        total = self.workers * self.numbers_per_worker
+        self.assertEqual(
+            set(numbers),
+            {f"INV/2026-27/{number:05d}" for number in range(1, total + 1)},
+        )
+
+    def test_rolled_back_gap_free_number_is_reused(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                self.assertEqual(
+                    next_number(DocumentType.SALES_INVOICE, DAY), "INV/2026-27/00001"
+                )
+                raise ValueError
+
+        with transaction.atomic():
+            self.assertEqual(
+                next_number(DocumentType.SALES_INVOICE, DAY), "INV/2026-27/00001"
+            )
+
+    def test_series_restart_each_fiscal_year(self):
+        self.assertEqual(
+            next_number(DocumentType.SALES_ORDER, datetime.date(2026, 3, 31)),
+            "SO/2025-26/00001",
+        )
+        self.assertEqual(next_number(DocumentType.SALES_ORDER, DAY), "SO/2026-27/00001")
+
+
+class DocumentTotalsTests(TestCase):
+    """
+    Stored document totals follow their lines, including lines moved to
+    another document, and verify_document_totals finds and repairs drift.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.vendor = Vendor.objects.create(name="Bharat Cables", code="BCL")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+        self.first = self.create_order("PO-1")
+        self.second = self.create_order("PO-2")
+        self.lines = [
+            PurchaseOrderItem.objects.create(
+                purchase_order=self.first, item=self.item, quantity=2, rate=rate
+            )
+            for rate in (Decimal("100.00"), Decimal("12.35"))
+        ]
+
+    def create_order(self, number):
+        return PurchaseOrder.objects.create(
+            po_number=number, vendor=self.vendor, order_date=DAY
+        )
+
+    def subtotals(self):
+        return dict(PurchaseOrder.objects.values_list("po_number", "subtotal"))
+
+    def verify(self, *args):
+        stdout = io.StringIO()
+        call_command("verify_document_totals", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_totals_follow_saved_and_deleted_lines(self):
+        self.assertEqual(self.subtotals(), {"PO-1": Decimal("224.70"), "PO-2": 0})
+
+        self.lines[0].quantity = 3
+        self.lines[0].save()
+        self.assertEqual(self.subtotals()["PO-1"], Decimal("324.70"))
+
+        self.lines[1].delete()
+        self.assertEqual(self.subtotals()["PO-1"], Decimal("300.00"))
+
+    def test_moved_line_refreshes_both_documents(self):
+        self.lines[0].purchase_order = self.second
+        self.lines[0].save()
+        self.assertEqual(
+            self.subtotals(), {"PO-1": Decimal("24.70"), "PO-2": Decimal("200.00")}
+        )
+
+        self.lines[1].purchase_order = self.second
+        PurchaseOrderItem.objects.bulk_update([self.lines[1]], ["purchase_order"])
+        self.assertEqual(self.subtotals(), {"PO-1": 0, "PO-2": Decimal("224.70")})
+
+    def test_refresh_totals_repairs_drift(self):
+        PurchaseOrder.objects.update(subtotal=1)
+
+        self.assertEqual(refresh_totals(PurchaseOrder, [self.second.pk, None]), 1)
+        self.assertEqual(self.subtotals(), {"PO-1": 1, "PO-2": 0})
+        self.assertEqual(refresh_totals(PurchaseOrder, [None]), 0)
+
+        self.assertEqual(refresh_totals(PurchaseOrder), 2)
+        self.assertEqual(self.subtotals(), {"PO-1": Decimal("224.70"), "PO-2": 0})
+
+    def test_verify_command_reports_and_repairs(self):
+        self.assertIn("Document totals are consistent.", self.verify())
+
+        PurchaseOrder.objects.filter(pk=self.first.pk).update(subtotal=1)
+        with self.assertRaisesMessage(CommandError, "1 document(s) with wrong"):
+            self.verify()
+
+        output = self.verify("--repair")
+        self.assertIn("Repaired 1 Purchase Orders.", output)
+        self.assertNotIn("consistent", output)
+        self.assertEqual(self.subtotals()["PO-1"], Decimal("224.70"))
+        self.assertIn("Document totals are consistent.", self.verify())
@@ -0,0 +1,181 @@
+"""
+Stored document totals.
+
+Documents built on ``DocumentTotalsModel`` keep ``subtotal`` and
+``tax_amount`` summed from their ``items`` lines (``quantity * rate``
+rounded per line, plus the line's ``tax_amount`` where lines have one).
+Saving, deleting or bulk writing lines recalculates the affected documents
+with one ``UPDATE`` using correlated subqueries.
+"""
+
+from decimal import Decimal
+
+from django.apps import apps
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, Round
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from core.models import DocumentTotalsModel
+from core.signals import post_bulk_write, pre_bulk_write
+
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+# Line fields the totals depend on.
+TOTAL_FIELDS = {
+    "quantity",
+    "rate",
+    "tax_amount",
+    "cgst_amount",
+    "sgst_amount",
+    "igst_amount",
+}
+
+
+def document_models():
+    return [
+        model
+        for model in apps.get_models()
+        if issubclass(model, DocumentTotalsModel)
+    ]
+
+
+def _lines(model):
+    """
+    Line model of ``model`` and the name of its foreign key to the document.
+    """
+    relation = model._meta.get_field("items")
+    return relation.related_model, relation.field.name
+
+
+def _line_sum(model, expression):
+    line_model, document_field = _lines(model)
+    total = (
+        line_model.objects.filter(**{document_field: OuterRef("pk")})
+        .order_by()
+        .values(document_field)
+        .annotate(total=Sum(expression, output_field=AMOUNT))
+        .values("total")
+    )
+    return Coalesce(Subquery(total, output_field=AMOUNT), Value(Decimal("0")))
+
+
+def expected_totals(model):
+    """
+    ``subtotal`` and ``tax_amount`` of ``model`` documents as expressions
+    over their lines.
+    """
+    line_model, _ = _lines(model)
+    subtotal = _line_sum(
+        model,
+        Round(
+            ExpressionWrapper(F("quantity") * F("rate"), output_field=AMOUNT), 2
+        ),
+    )
+    line_fields = {field.name for field in line_model._meta.get_fields()}
+    if "tax_amount" in line_fields:
+        tax_amount = _line_sum(model, F("tax_amount"))
+    else:
+        tax_amount = Value(Decimal("0"), output_field=AMOUNT)
+    return {"subtotal": subtotal, "tax_amount": tax_amount}
+
+
+def refresh_totals(model, document_ids=None):
+    """
+    Recalculate the stored totals of ``model`` documents (all of them when
+    ``document_ids`` is ``None``) in one query. Returns the rows updated.
+    """
+    documents = model._base_manager.all()
+    if document_ids is not None:
+        document_ids = {pk for pk in document_ids if pk is not None}
+        if not document_ids:
+            return 0
+        documents = documents.filter(pk__in=document_ids)
+    return documents.update(**expected_totals(model))
+
+
+def mismatched_totals(model):
+    """
+    Documents whose stored totals differ from their lines.
+    """
+    expected = expected_totals(model)
+    return (
+        model._base_manager.annotate(
+            expected_subtotal=expected["subtotal"],
+            expected_tax_amount=expected["tax_amount"],
+        )
+        .filter(
+            ~Q(subtotal=F("expected_subtotal"))
+            | ~Q(tax_amount=F("expected_tax_amount"))
+        )
+        .order_by()
+    )
+
+
+def _document_ids(line_model, document_field, instances):
+    """
+    Documents of ``instances``, including the ones they were moved from.
+    """
+    attname = line_model._meta.get_field(document_field).attname
+    ids = set()
+    for instance in instances:
+        ids.add(getattr(instance, attname))
+        ids.add(getattr(instance, f"_previous_{attname}", None))
+    return ids - {None}
+
+
+def _remember_documents(line_model, document_field, instances):
+    attname = line_model._meta.get_field(document_field).attname
+    previous = dict(
+        line_model._base_manager.filter(
+            pk__in=[instance.pk for instance in instances if instance.pk]
+        ).values_list("pk", attname)
+    )
+    for instance in instances:
+        setattr(instance, f"_previous_{attname}", previous.get(instance.pk))
+
+
+def connect_signals():
+    """
+    Keep totals of every ``DocumentTotalsModel`` in step with its lines.
+    A line moved to another document refreshes both documents. Called from
+    ``CoreConfig.ready()``.
+    """
+    for model in document_models():
+        line_model, document_field = _lines(model)
+
+        def remember(sender, instance, field=document_field, **kwargs):
+            _remember_documents(sender, field, [instance])
+
+        def remember_bulk(sender, instances, fields, field=document_field, **kwargs):
+            if field in fields:
+                _remember_documents(sender, field, instances)
+
+        def on_line(sender, instance, model=model, field=document_field, **kwargs):
+            refresh_totals(model, _document_ids(sender, field, [instance]))
+
+        def on_bulk(
+            sender, instances, fields, model=model, field=document_field, **kwargs
+        ):
+            if fields is None or TOTAL_FIELDS.union([field]).intersection(fields):
+                refresh_totals(model, _document_ids(sender, field, instances))
+
+        uid = f"document_totals:{model._meta.label}"
+        pre_save.connect(remember, sender=line_model, weak=False, dispatch_uid=uid)
+        pre_bulk_write.connect(
+            remember_bulk, sender=line_model, weak=False, dispatch_uid=uid
+        )
+        post_save.connect(on_line, sender=line_model, weak=False, dispatch_uid=uid)
+        post_delete.connect(on_line, sender=line_model, weak=False, dispatch_uid=uid)
+        post_bulk_write.connect(
+            on_bulk, sender=line_model, weak=False, dispatch_uid=uid
+        )
@@ -0,0 +1,31 @@
+import random
+import time
+
+from django.db import OperationalError, transaction
+
+
+MAX_ATTEMPTS = 20
+RETRY_DELAY = 0.01
+MAX_RETRY_DELAY = 0.2
+
+
+def with_retry(operation, using=None):
+    """
+    Run ``operation`` in a transaction, retrying lock conflicts with
+    jittered exponential backoff. Inside an outer transaction it runs in a
+    savepoint, so an exception rolls back its partial work; a conflict
+    cannot be retried there and is raised straight away.
+    """
+    if transaction.get_connection(using).in_atomic_block:
+        with transaction.atomic(using=using):
+            return operation()
+
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with transaction.atomic(using=using):
+                return operation()
+        except OperationalError:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** attempt)
+            time.sleep(random.uniform(0, delay))
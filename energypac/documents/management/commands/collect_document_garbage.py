@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.services import reference_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored document files that no document references, and "
+        "abandoned partial uploads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=60,
+            help="Spare files written more recently than this.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be deleted without deleting it.",
+        )
+
+    def handle(self, *args, **options):
+        storage = Document._meta.get_field("file").storage
+        cutoff = time.time() - options["grace_minutes"] * 60
+        referenced = reference_counts()
+
+        deleted = 0
+        freed = 0
+        for filename, path in storage.stored_files():
+            if filename in referenced:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            deleted += 1
+            freed += stat.st_size
+            if not options["dry_run"]:
+                os.remove(path)
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {deleted} unreferenced file(s), {freed} byte(s); "
+                f"{len(referenced)} file(s) referenced by "
+                f"{sum(referenced.values())} document(s)."
+            )
+        )
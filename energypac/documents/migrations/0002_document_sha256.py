@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 11:52
+
+import documents.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file content', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=documents.storage.document_storage, upload_to='documents/'),
+        ),
+    ]
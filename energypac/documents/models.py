@@ -1,8 +1,11 @@
+import os
+
 from django.db import models
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
 from core.models import UUIDModel, TimeStampedModel, StatusModel
+from documents.storage import document_storage, path_hash
 
 
 class DocumentType(UUIDModel, TimeStampedModel, StatusModel):
@@ -27,7 +30,8 @@ class DocumentType(UUIDModel, TimeStampedModel, StatusModel):
 class Document(UUIDModel, TimeStampedModel):
     """
     Stores uploaded document metadata.
-    Actual storage backend handled elsewhere.
+    Files are stored once per distinct content by documents.storage; rows
+    sharing a ``sha256`` share the file.
     """
 
     document_type = models.ForeignKey(
@@ -37,7 +41,15 @@ class Document(UUIDModel, TimeStampedModel):
     )
 
     file = models.FileField(
-        upload_to="documents/"
+        upload_to="documents/",
+        storage=document_storage
+    )
+
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 of the file content"
     )
 
     original_filename = models.CharField(
@@ -55,6 +67,15 @@ class Document(UUIDModel, TimeStampedModel):
     def __str__(self):
         return self.original_filename or str(self.id)
 
+    def save(self, *args, **kwargs):
+        # Store the upload first so its hash is known when the row is saved.
+        if self.file and not self.file._committed:
+            if not self.original_filename:
+                self.original_filename = os.path.basename(self.file.name)
+            self.file.save(self.file.name, self.file.file, save=False)
+        self.sha256 = path_hash(self.file.name or "")
+        super().save(*args, **kwargs)
+
 
 class DocumentLink(UUIDModel, TimeStampedModel):
     """
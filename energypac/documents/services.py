@@ -0,0 +1,91 @@
+"""
+Document lookups.
+
+Attachments are ``DocumentLink`` rows pointing at any object through a
+generic foreign key. The helpers here fetch them for many objects at once,
+one query per content type on the (content_type, object_id) index, instead
+of one query per object.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from documents.models import Document, DocumentLink
+
+
+def reference_counts(hashes=None):
+    """
+    Number of documents sharing each stored file, keyed by SHA-256, in one
+    grouped query.
+    """
+    documents = Document.objects.exclude(sha256="")
+    if hashes is not None:
+        documents = documents.filter(sha256__in=hashes)
+    return dict(
+        documents.order_by()
+        .values_list("sha256")
+        .annotate(references=Count("pk"))
+        .values_list("sha256", "references")
+    )
+
+
+def attachments_for(objects, document_type=None):
+    """
+    Documents linked to each of ``objects``, keyed by object, oldest link
+    first. Every object is in the result, with an empty list when nothing is
+    attached.
+
+    ``objects`` may mix models; links are read with one query per model.
+    ``document_type`` (an instance or code) limits the documents returned.
+    """
+    by_model = {}
+    for obj in objects:
+        by_model.setdefault(obj._meta.concrete_model, {})[obj.pk] = obj
+    content_types = ContentType.objects.get_for_models(
+        *by_model, for_concrete_models=True
+    )
+
+    attachments = {
+        obj: [] for instances in by_model.values() for obj in instances.values()
+    }
+    for model, instances in by_model.items():
+        links = (
+            DocumentLink.objects.filter(
+                content_type=content_types[model], object_id__in=instances
+            )
+            .select_related("document__document_type")
+            .order_by("created_at", "pk")
+        )
+        if document_type is not None:
+            if isinstance(document_type, str):
+                links = links.filter(document__document_type__code=document_type)
+            else:
+                links = links.filter(document__document_type=document_type)
+        for link in links:
+            attachments[instances[link.object_id]].append(link.document)
+    return attachments
+
+
+def with_attachment_count(queryset, name="attachment_count"):
+    """
+    Annotate ``queryset`` with the number of documents linked to each row,
+    as a correlated subquery on the (content_type, object_id) index.
+    """
+    content_type = ContentType.objects.get_for_model(queryset.model)
+    counts = (
+        DocumentLink.objects.filter(
+            content_type=content_type, object_id=OuterRef("pk")
+        )
+        .order_by()
+        .values("object_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return queryset.annotate(
+        **{
+            name: Coalesce(
+                Subquery(counts, output_field=IntegerField()), Value(0)
+            )
+        }
+    )
@@ -0,0 +1,86 @@
+"""
+Content-addressed document storage.
+
+Files are stored once per distinct content, named by the SHA-256 of their
+bytes (``documents/sha256/ab/cd/abcd...``). The hash is computed while the
+upload is streamed to a temporary file in chunks, so uploads are never held
+in memory; identical content resolves to the existing file and the copy is
+discarded. A file's reference count is the number of ``Document`` rows with
+its hash, and files nothing references are removed by the
+``collect_document_garbage`` command rather than on delete, so a concurrent
+upload of the same content never loses its file.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+PREFIX = "documents/sha256"
+
+
+def hash_path(sha256):
+    return f"{PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def path_hash(name):
+    """
+    SHA-256 of a content-addressed file name, or ``""`` for other names.
+    """
+    if not name.startswith(f"{PREFIX}/"):
+        return ""
+    return os.path.basename(name)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage keyed by the SHA-256 of the content. The name
+    passed to ``save()`` is ignored.
+    """
+
+    def save(self, name, content, max_length=None):
+        if hasattr(content, "seek"):
+            content.seek(0)
+        directory = self.path(PREFIX)
+        os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".upload")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    file.write(chunk)
+
+            name = hash_path(digest.hexdigest())
+            path = self.path(name)
+            if os.path.exists(path):
+                # Refresh the file's age so garbage collection spares it.
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temporary, self.file_permissions_mode or 0o644)
+                os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name
+
+    def stored_files(self):
+        """
+        Yield ``(filename, path)`` for every stored file, including
+        ``.upload`` files of uploads in progress (or abandoned).
+        """
+        for directory, _, files in os.walk(self.path(PREFIX)):
+            for filename in files:
+                yield filename, os.path.join(directory, filename)
+
+
+def document_storage():
+    return ContentAddressedStorage()
@@ -1,3 +1,149 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+import time
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from documents.models import Document, DocumentLink, DocumentType
+from documents.services import (
+    attachments_for,
+    reference_counts,
+    with_attachment_count,
+)
+from masters.models import Customer, Vendor
+
+
+class ContentAddressedStorageTests(TestCase):
+    """
+    Identical uploads share one stored file, and garbage collection removes
+    only files no document references.
+    """
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.document_type = DocumentType.objects.create(
+            name="Invoice", code="INVOICE"
+        )
+
+    def upload(self, content, filename):
+        return Document.objects.create(
+            document_type=self.document_type,
+            file=ContentFile(content, name=filename),
+        )
+
+    def path(self, document):
+        return document.file.storage.path(document.file.name)
+
+    def collect_garbage(self, **options):
+        call_command("collect_document_garbage", stdout=io.StringIO(), **options)
+
+    def age(self, *documents):
+        hours_ago = time.time() - 2 * 60 * 60
+        for document in documents:
+            os.utime(self.path(document), (hours_ago, hours_ago))
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.upload(b"Invoice 1", "INV-1.pdf")
+        second = self.upload(b"Invoice 1", "INV-1 copy.pdf")
+
+        sha256 = hashlib.sha256(b"Invoice 1").hexdigest()
+        self.assertEqual(first.sha256, sha256)
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(second.original_filename, "INV-1 copy.pdf")
+        self.assertEqual(reference_counts(), {sha256: 2})
+        self.assertEqual(os.listdir(os.path.dirname(self.path(first))), [sha256])
+
+    def test_garbage_collection_removes_only_unreferenced_files(self):
+        kept = self.upload(b"Invoice 1", "INV-1.pdf")
+        shared = self.upload(b"Invoice 2", "INV-2.pdf")
+        self.upload(b"Invoice 2", "INV-2 copy.pdf")
+        removed = self.upload(b"Invoice 3", "INV-3.pdf")
+        self.age(kept, shared, removed)
+
+        Document.objects.filter(pk=shared.pk).delete()
+        Document.objects.filter(pk=removed.pk).delete()
+        self.collect_garbage()
+
+        self.assertTrue(os.path.exists(self.path(kept)))
+        self.assertTrue(os.path.exists(self.path(shared)))
+        self.assertFalse(os.path.exists(self.path(removed)))
+
+    def test_recent_files_are_spared(self):
+        recent = self.upload(b"Invoice 1", "INV-1.pdf")
+        Document.objects.filter(pk=recent.pk).delete()
+
+        self.collect_garbage()
+        self.assertTrue(os.path.exists(self.path(recent)))
+
+        self.collect_garbage(grace_minutes=0, dry_run=True)
+        self.assertTrue(os.path.exists(self.path(recent)))
+
+
+class AttachmentLookupTests(TestCase):
+    """
+    Attachments of many objects are read with one query per model.
+    """
+
+    def setUp(self):
+        self.invoice_type = DocumentType.objects.create(name="Invoice", code="INVOICE")
+        self.contract_type = DocumentType.objects.create(
+            name="Contract", code="CONTRACT"
+        )
+        self.customers = [
+            Customer.objects.create(name=f"Customer {n}", code=f"C{n}")
+            for n in range(3)
+        ]
+        self.vendor = Vendor.objects.create(name="Bharat Cables", code="BCL")
+
+        self.invoice = self.attach(self.invoice_type, "INV-1.pdf", self.customers[0])
+        self.contract = self.attach(
+            self.contract_type, "CON-1.pdf", self.customers[0], self.vendor
+        )
+        self.attach(self.invoice_type, "INV-2.pdf", self.customers[1])
+
+        # Warm the content type cache, as any running process would have.
+        ContentType.objects.get_for_models(Customer, Vendor)
+
+    def attach(self, document_type, filename, *objects):
+        document = Document.objects.create(document_type=document_type, file=filename)
+        for obj in objects:
+            DocumentLink.objects.create(document=document, content_object=obj)
+        return document
+
+    def test_attachments_are_read_with_one_query_per_model(self):
+        objects = self.customers + [self.vendor]
+
+        with self.assertNumQueries(2):
+            attachments = attachments_for(objects)
+            types = [doc.document_type.code for doc in attachments[self.vendor]]
+
+        self.assertEqual(attachments[self.customers[0]], [self.invoice, self.contract])
+        self.assertEqual(len(attachments[self.customers[1]]), 1)
+        self.assertEqual(attachments[self.customers[2]], [])
+        self.assertEqual(types, ["CONTRACT"])
+
+    def test_attachments_can_be_limited_to_a_document_type(self):
+        attachments = attachments_for(self.customers, document_type="CONTRACT")
+
+        self.assertEqual(attachments[self.customers[0]], [self.contract])
+        self.assertEqual(attachments[self.customers[1]], [])
+
+    def test_attachment_counts_are_annotated_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = dict(
+                with_attachment_count(Customer.objects.order_by("code")).values_list(
+                    "code", "attachment_count"
+                )
+            )
+
+        self.assertEqual(counts, {"C0": 2, "C1": 1, "C2": 0})
@@ -127,8 +127,56 @@ USE_I18N = True
 
 STATIC_URL = "static/"
 
+# Uploaded files. Documents are stored by content under
+# documents/sha256/ (see documents.storage).
+MEDIA_ROOT = BASE_DIR / "media"
+MEDIA_URL = "media/"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "accounts.User"
+
+
+# ERP configuration
+
+# Month in which the fiscal year starts (April for Indian fiscal years)
+FISCAL_YEAR_START_MONTH = 4
+
+# Compressed per-fiscal-year files of archived stock ledger entries
+STOCK_LEDGER_ARCHIVE_DIR = BASE_DIR / "archive" / "stock_ledger"
+
+# Seconds an item's available-to-promise profile stays cached. Profiles are
+# invalidated on change, so production needs a cache shared by all processes.
+ATP_CACHE_TIMEOUT = 3600
+
+# GST state code of the company. Parties whose GST number starts with a
+# different code are charged IGST instead of CGST + SGST.
+COMPANY_GST_STATE_CODE = "19"
+
+# Seconds tax rates stay cached in each process. Changes clear the cache of
+# the process making them; other processes pick them up on expiry.
+TAX_RATE_CACHE_TIMEOUT = 300
+
+# Code of the warehouse receiving stock rejected in quality inspection.
+QC_QUARANTINE_WAREHOUSE_CODE = "QUAR"
+
+# Document numbers are reserved per process in blocks of this size.
+DOCUMENT_NUMBER_BLOCK_SIZE = 50
+
+# Document types numbered without gaps, one number at a time.
+GAP_FREE_DOCUMENT_TYPES = ["INV"]
+
+# Number format per document type. Placeholders: {type}, {fy} (e.g.
+# "2025-26"), {year} (fiscal year start) and {number}.
+DOCUMENT_NUMBER_FORMATS = {
+    "PR": "PR/{fy}/{number:05d}",
+    "PO": "PO/{fy}/{number:05d}",
+    "GRN": "GRN/{fy}/{number:05d}",
+    "SQ": "SQ/{fy}/{number:05d}",
+    "SO": "SO/{fy}/{number:05d}",
+    "INV": "INV/{fy}/{number:05d}",
+    "DSP": "DSP/{fy}/{number:05d}",
+    "SHP": "SHP/{fy}/{number:05d}",
+}
@@ -0,0 +1,453 @@
+"""
+Customer credit exposure.
+
+Exposure is the uninvoiced value of open sales orders, the outstanding
+balance of billed invoices and the payments against them that have not
+settled. It is kept per customer in ``CustomerCreditExposure``, so a credit
+check reads one row per customer instead of aggregating the order book.
+
+What each order, invoice and payment contributes is remembered in
+``CreditExposureDocument``. An event recomputes only the documents it
+touched and adds the difference to their customers' totals. A nightly
+reconciliation recomputes every customer to catch drift from writes that
+bypass signals.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, When
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from core.models import StatusModel
+from core.rollups import apply_deltas, lock_rows
+from finance.models import (
+    CreditExposureDocument,
+    CustomerCreditExposure,
+    InvoicePayment,
+)
+from masters.models import Customer
+from sales.models import SalesInvoice, SalesOrder, SalesOrderItem
+
+
+OPEN_STATUSES = (
+    StatusModel.StatusChoices.SUBMITTED,
+    StatusModel.StatusChoices.APPROVED,
+)
+
+BILLED_STATUSES = OPEN_STATUSES + (StatusModel.StatusChoices.CLOSED,)
+
+AMOUNT = DecimalField(max_digits=15, decimal_places=2)
+
+ZERO = Decimal("0")
+
+CENT = Decimal("0.01")
+
+DocumentType = CreditExposureDocument.DocumentType
+
+# Uninvoiced value of a sales order line.
+UNINVOICED = Case(
+    When(
+        invoiced_quantity__lt=F("quantity"),
+        then=Round((F("quantity") - F("invoiced_quantity")) * F("rate"), 2),
+    ),
+    default=ZERO,
+    output_field=AMOUNT,
+)
+
+# The exposure field each kind of document contributes to.
+EXPOSURE_FIELDS = {
+    DocumentType.ORDER: "open_order_amount",
+    DocumentType.INVOICE: "unpaid_invoice_amount",
+    DocumentType.PAYMENT: "unsettled_payment_amount",
+}
+
+
+class CreditLimitExceeded(Exception):
+    """
+    Raised when new business would take customers over their credit limit.
+    ``breaches`` lists ``{"customer_id", "credit_limit", "exposure",
+    "amount"}`` dicts.
+    """
+
+    def __init__(self, breaches):
+        self.breaches = breaches
+        super().__init__(f"Credit limit exceeded for {len(breaches)} customer(s).")
+
+
+def _filter(queryset, document_field, document_ids, customer_field, customer_ids):
+    if document_ids is not None:
+        queryset = queryset.filter(**{f"{document_field}__in": document_ids})
+    if customer_ids is not None:
+        queryset = queryset.filter(**{f"{customer_field}__in": customer_ids})
+    return queryset
+
+
+def order_contributions(document_ids=None, customer_ids=None):
+    """
+    Uninvoiced value of open sales orders, as order id -> (customer id,
+    amount). Orders with nothing left to invoice are left out.
+    """
+    lines = _filter(
+        SalesOrderItem.objects.filter(
+            order__status__in=OPEN_STATUSES,
+            order__is_active=True,
+            order__customer__isnull=False,
+        ),
+        "order",
+        document_ids,
+        "order__customer",
+        customer_ids,
+    )
+    return {
+        order_id: (customer_id, total)
+        for order_id, customer_id, total in (
+            lines.order_by()
+            .values_list("order_id", "order__customer_id")
+            .annotate(total=Sum(UNINVOICED))
+            .values_list("order_id", "order__customer_id", "total")
+        )
+        if total
+    }
+
+
+def invoice_contributions(document_ids=None, customer_ids=None):
+    """
+    Outstanding balance of billed invoices, as invoice id -> (customer id,
+    amount).
+    """
+    invoices = _filter(
+        SalesInvoice.objects.filter(
+            outstanding__gt=0,
+            status__in=BILLED_STATUSES,
+            is_active=True,
+            customer__isnull=False,
+        ),
+        "pk",
+        document_ids,
+        "customer",
+        customer_ids,
+    )
+    return {
+        pk: (customer_id, outstanding)
+        for pk, customer_id, outstanding in invoices.values_list(
+            "pk", "customer_id", "outstanding"
+        )
+    }
+
+
+def payment_contributions(document_ids=None, customer_ids=None):
+    """
+    Unsettled payments against billed invoices, as payment id -> (customer
+    id, amount). The invoice balance already dropped by these amounts.
+    """
+    payments = _filter(
+        InvoicePayment.objects.filter(
+            is_settled=False,
+            amount__gt=0,
+            invoice__status__in=BILLED_STATUSES,
+            invoice__is_active=True,
+            invoice__customer__isnull=False,
+        ),
+        "pk",
+        document_ids,
+        "invoice__customer",
+        customer_ids,
+    )
+    return {
+        pk: (customer_id, amount)
+        for pk, customer_id, amount in payments.values_list(
+            "pk", "invoice__customer_id", "amount"
+        )
+    }
+
+
+DOCUMENTS = {
+    DocumentType.ORDER: (SalesOrder, order_contributions),
+    DocumentType.INVOICE: (SalesInvoice, invoice_contributions),
+    DocumentType.PAYMENT: (InvoicePayment, payment_contributions),
+}
+
+
+def _customer_contributions(customer_ids):
+    return {
+        document_type: contributions(customer_ids=customer_ids)
+        for document_type, (model, contributions) in DOCUMENTS.items()
+    }
+
+
+def _exposure_totals(documents):
+    amounts = {}
+    for document_type, contributions in documents.items():
+        field = EXPOSURE_FIELDS[document_type]
+        for customer_id, amount in contributions.values():
+            totals = amounts.setdefault(
+                customer_id, dict.fromkeys(EXPOSURE_FIELDS.values(), ZERO)
+            )
+            totals[field] += amount
+    return amounts
+
+
+def exposure_amounts(customer_ids=None):
+    """
+    Recompute exposure from the documents, as customer id -> ``{field:
+    amount}`` for the amount fields of ``CustomerCreditExposure``.
+    Customers without open business are left out.
+    """
+    return _exposure_totals(_customer_contributions(customer_ids))
+
+
+def _store_contributions(document_type, contributions):
+    now = timezone.now()
+    CreditExposureDocument.objects.bulk_create(
+        [
+            CreditExposureDocument(
+                document_type=document_type,
+                document_id=document_id,
+                customer_id=customer_id,
+                amount=amount,
+                updated_at=now,
+            )
+            for document_id, (customer_id, amount) in contributions.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["document_type", "document_id"],
+        update_fields=["customer", "amount", "updated_at"],
+    )
+
+
+def refresh_document_exposure(document_type, document_ids):
+    """
+    Recompute what ``document_ids`` of ``document_type`` contribute to their
+    customers' exposure and apply the difference from what they contributed
+    before, so a document moved to another customer leaves the first one.
+
+    Costs a fixed number of queries however large the customers' books are.
+    The documents are locked first, so concurrent events for one document
+    apply their deltas one after another.
+    """
+    document_ids = {pk for pk in document_ids if pk is not None}
+    if not document_ids:
+        return {}
+
+    model, contributions = DOCUMENTS[document_type]
+    field = EXPOSURE_FIELDS[document_type]
+    with transaction.atomic():
+        list(
+            model.objects.select_for_update()
+            .filter(pk__in=document_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        stored = list(
+            CreditExposureDocument.objects.select_for_update()
+            .filter(document_type=document_type, document_id__in=document_ids)
+            .order_by("document_id")
+            .values_list("customer_id", "amount")
+        )
+        current = contributions(document_ids=document_ids)
+
+        deltas = {}
+        changes = [(customer_id, -amount) for customer_id, amount in stored]
+        changes += current.values()
+        for customer_id, amount in changes:
+            key = (customer_id,)
+            deltas.setdefault(key, {field: ZERO})[field] += amount
+
+        CreditExposureDocument.objects.filter(
+            document_type=document_type,
+            document_id__in=document_ids - current.keys(),
+        ).delete()
+        _store_contributions(document_type, current)
+        return apply_deltas(CustomerCreditExposure, ("customer_id",), deltas)
+
+
+def refresh_invoice_exposure(invoice_ids):
+    """
+    Refresh the exposure of invoices and of their unsettled payments, which
+    stop counting once the invoice is cancelled or moves customer with it.
+    """
+    invoice_ids = {pk for pk in invoice_ids if pk is not None}
+    if not invoice_ids:
+        return
+    refresh_document_exposure(DocumentType.INVOICE, invoice_ids)
+    payment_ids = set(
+        InvoicePayment.objects.filter(invoice_id__in=invoice_ids)
+        .filter(is_settled=False)
+        .values_list("pk", flat=True)
+    )
+    if payment_ids:
+        refresh_document_exposure(DocumentType.PAYMENT, payment_ids)
+
+
+def rebuild_customer_exposure(customer_ids):
+    """
+    Recompute the exposure of ``customer_ids`` from all their documents and
+    rewrite their contributions. Used by the nightly reconciliation and
+    for customers without an exposure row yet.
+    """
+    customer_ids = {pk for pk in customer_ids if pk is not None}
+    if not customer_ids:
+        return []
+
+    with transaction.atomic():
+        documents = _customer_contributions(customer_ids)
+        CreditExposureDocument.objects.filter(customer_id__in=customer_ids).delete()
+        for document_type, contributions in documents.items():
+            _store_contributions(document_type, contributions)
+
+        amounts = _exposure_totals(documents)
+        none = dict.fromkeys(EXPOSURE_FIELDS.values(), ZERO)
+        now = timezone.now()
+        return CustomerCreditExposure.objects.bulk_create(
+            [
+                CustomerCreditExposure(
+                    customer_id=customer_id,
+                    **amounts.get(customer_id, none),
+                    updated_at=now,
+                )
+                for customer_id in customer_ids
+            ],
+            update_conflicts=True,
+            unique_fields=["customer"],
+            update_fields=[*EXPOSURE_FIELDS.values(), "updated_at"],
+        )
+
+
+def _lock_exposure(customer_ids):
+    """
+    Lock the exposure rows of ``customer_ids``, creating and computing any
+    that are missing. Returns customer id -> exposure.
+    """
+    keys = [(customer_id,) for customer_id in customer_ids]
+    rows = lock_rows(CustomerCreditExposure, ("customer_id",), keys)
+    missing = [key for key in keys if key not in rows]
+    if missing:
+        CustomerCreditExposure.objects.bulk_create(
+            [CustomerCreditExposure(customer_id=key[0]) for key in missing],
+            ignore_conflicts=True,
+        )
+        # Computed only once locked, so the figures include every order
+        # committed by a concurrent check that created the row first.
+        lock_rows(CustomerCreditExposure, ("customer_id",), missing)
+        rebuild_customer_exposure(key[0] for key in missing)
+        rows.update(lock_rows(CustomerCreditExposure, ("customer_id",), missing))
+    return {key[0]: row.exposure for key, row in rows.items()}
+
+
+def check_credit(amounts):
+    """
+    Raise ``CreditLimitExceeded`` if adding ``amounts`` (customer or id ->
+    amount of new business) would take any customer with a credit limit over
+    it.
+
+    The exposure rows of those customers are locked with ``SELECT ... FOR
+    UPDATE``, so concurrent checks for a customer run one after another.
+    Call it inside the transaction that writes the new business, so the
+    lock is held until the exposure it raises is committed.
+    """
+    amounts = {
+        getattr(customer, "pk", customer): amount
+        for customer, amount in amounts.items()
+        if amount
+    }
+    if not amounts:
+        return
+
+    with transaction.atomic():
+        limits = dict(
+            Customer.objects.filter(
+                pk__in=amounts, credit_limit__isnull=False
+            ).values_list("pk", "credit_limit")
+        )
+        if not limits:
+            return
+        exposures = _lock_exposure(limits)
+
+    breaches = []
+    for customer_id, credit_limit in limits.items():
+        exposure = exposures.get(customer_id) or ZERO
+        if exposure + amounts[customer_id] > credit_limit:
+            breaches.append(
+                {
+                    "customer_id": customer_id,
+                    "credit_limit": credit_limit,
+                    "exposure": exposure,
+                    "amount": amounts[customer_id],
+                }
+            )
+    if breaches:
+        raise CreditLimitExceeded(breaches)
+
+
+def _counts_towards_exposure(order):
+    return (
+        order is not None
+        and order["customer_id"] is not None
+        and order["is_active"]
+        and order["status"] in OPEN_STATUSES
+    )
+
+
+def _uninvoiced(quantity, invoiced_quantity, rate):
+    quantity = Decimal(str(quantity)) - Decimal(str(invoiced_quantity))
+    return (max(quantity, ZERO) * Decimal(str(rate))).quantize(CENT)
+
+
+def check_order_entry(order):
+    """
+    Credit check for a sales order about to be saved directly. The order's
+    uninvoiced value counts as new business when the save opens it or moves
+    it to another customer.
+    """
+    now = {
+        "customer_id": order.customer_id,
+        "is_active": order.is_active,
+        "status": order.status,
+    }
+    if not _counts_towards_exposure(now):
+        return
+    before = (
+        SalesOrder.objects.filter(pk=order.pk)
+        .values("customer_id", "is_active", "status")
+        .first()
+    )
+    if _counts_towards_exposure(before) and before["customer_id"] == order.customer_id:
+        return
+
+    amount = SalesOrderItem.objects.filter(order_id=order.pk).aggregate(
+        total=Sum(UNINVOICED)
+    )["total"]
+    if amount:
+        check_credit({order.customer_id: amount})
+
+
+def check_order_line_entry(line):
+    """
+    Credit check for a sales order line about to be saved directly. Only
+    what the save adds to the uninvoiced value of an open order counts.
+    """
+    order = (
+        SalesOrder.objects.filter(pk=line.order_id)
+        .values("customer_id", "is_active", "status")
+        .first()
+    )
+    if not _counts_towards_exposure(order):
+        return
+
+    before = (
+        SalesOrderItem.objects.filter(pk=line.pk)
+        .values("order_id", "quantity", "invoiced_quantity", "rate")
+        .first()
+    )
+    # The invoiced quantity is maintained from the stored row, not the
+    # instance being saved.
+    invoiced_quantity = before["invoiced_quantity"] if before else ZERO
+    added = _uninvoiced(line.quantity, invoiced_quantity, line.rate)
+    if before and before["order_id"] == line.order_id:
+        added -= _uninvoiced(
+            before["quantity"], before["invoiced_quantity"], before["rate"]
+        )
+    if added > 0:
+        check_credit({order["customer_id"]: added})
@@ -0,0 +1,29 @@
+import csv
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from finance.services import AGEING_BUCKETS, receivables_ageing
+
+
+class Command(BaseCommand):
+    help = "Report outstanding receivables per customer by age, as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            help="Ageing date (YYYY-MM-DD). Defaults to today.",
+        )
+
+    def handle(self, *args, **options):
+        as_of = options["date"] or timezone.localdate()
+        buckets = [name for name, _ in AGEING_BUCKETS]
+
+        writer = csv.writer(self.stdout)
+        writer.writerow(["customer", *buckets, "total"])
+        for row in receivables_ageing(as_of):
+            writer.writerow(
+                [row["customer_label"], *(row[name] for name in buckets), row["total"]]
+            )
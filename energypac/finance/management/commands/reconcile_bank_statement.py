@@ -0,0 +1,76 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.reconciliation import DATE_FORMAT, DATE_WINDOW_DAYS, reconcile_statement
+from masters.models import Bank
+
+
+class Command(BaseCommand):
+    help = (
+        "Match a CSV bank statement to unpaid invoices and record the "
+        "matches as payments. Unmatched lines are written as CSV."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("statement", help="Path of the CSV statement.")
+        parser.add_argument(
+            "--bank", help="IFSC code of the bank the statement belongs to."
+        )
+        parser.add_argument(
+            "--date-format",
+            default=DATE_FORMAT,
+            help=f"strptime format of the date column (default {DATE_FORMAT}).",
+        )
+        parser.add_argument(
+            "--window-days",
+            type=int,
+            default=DATE_WINDOW_DAYS,
+            help="Days before a payment within which to match invoices by amount.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the matches without recording payments.",
+        )
+
+    def handle(self, *args, **options):
+        bank = None
+        if options["bank"]:
+            try:
+                bank = Bank.objects.get(ifsc_code=options["bank"])
+            except Bank.DoesNotExist:
+                raise CommandError(f"Unknown bank {options['bank']!r}.")
+
+        with open(options["statement"], newline="", encoding="utf-8-sig") as file:
+            result = reconcile_statement(
+                file,
+                bank=bank,
+                date_format=options["date_format"],
+                window_days=options["window_days"],
+                dry_run=options["dry_run"],
+            )
+
+        if result["unmatched"]:
+            writer = csv.writer(self.stdout)
+            writer.writerow(["line", "date", "amount", "reference", "reason"])
+            for line in result["unmatched"]:
+                writer.writerow(
+                    [
+                        line["line"],
+                        line.get("date", ""),
+                        line.get("amount", ""),
+                        line.get("reference", ""),
+                        line["reason"],
+                    ]
+                )
+
+        matched = result["matched_by_reference"] + result["matched_by_amount"]
+        self.stderr.write(
+            f"{result['lines']} line(s): {matched} matched "
+            f"({result['matched_by_reference']} by reference, "
+            f"{result['matched_by_amount']} by amount), "
+            f"{result['recorded']} already recorded, {result['skipped']} skipped, "
+            f"{len(result['unmatched'])} unmatched."
+            + (" Dry run, nothing recorded." if options["dry_run"] else "")
+        )
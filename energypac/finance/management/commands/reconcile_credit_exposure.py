@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from finance.credit import (
+    EXPOSURE_FIELDS,
+    ZERO,
+    exposure_amounts,
+    rebuild_customer_exposure,
+)
+from finance.models import CustomerCreditExposure
+from masters.models import Customer
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every customer's credit exposure and repair drift. "
+        "Meant to run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drift without repairing it.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        customer_ids = list(
+            Customer.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        batch_size = options["batch_size"]
+        fields = list(EXPOSURE_FIELDS.values())
+        none = dict.fromkeys(fields, ZERO)
+
+        drifted = 0
+        for start in range(0, len(customer_ids), batch_size):
+            batch = customer_ids[start:start + batch_size]
+            amounts = exposure_amounts(batch)
+            stored = {
+                row.pop("customer_id"): row
+                for row in CustomerCreditExposure.objects.filter(
+                    customer_id__in=batch
+                ).values("customer_id", *fields)
+            }
+
+            wrong = [
+                customer_id
+                for customer_id in batch
+                if stored.get(customer_id, none) != amounts.get(customer_id, none)
+            ]
+            drifted += len(wrong)
+            if wrong and not options["dry_run"]:
+                rebuild_customer_exposure(wrong)
+
+        action = "found" if options["dry_run"] else "repaired"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Credit exposure drift {action} for {drifted} of "
+                f"{len(customer_ids)} customer(s)."
+            )
+        )
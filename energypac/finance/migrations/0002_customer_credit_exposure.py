@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 11:36
+
+import django.db.models.deletion
+import django.db.models.expressions
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0001_initial'),
+        ('masters', '0003_customer_credit_limit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerCreditExposure',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('open_order_amount', models.DecimalField(decimal_places=2, default=0, help_text='Uninvoiced value of open sales orders', max_digits=15)),
+                ('unpaid_invoice_amount', models.DecimalField(decimal_places=2, default=0, help_text='Outstanding balance of billed invoices', max_digits=15)),
+                ('exposure', models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('open_order_amount'), '+', models.F('unpaid_invoice_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=15))),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='credit_exposure', to='masters.customer')),
+            ],
+            options={
+                'verbose_name': 'Customer Credit Exposure',
+                'verbose_name_plural': 'Customer Credit Exposures',
+                'db_table': 'customer_credit_exposures',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 11:47
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_utilized(apps, schema_editor):
+    InvoicePayment = apps.get_model('finance', 'InvoicePayment')
+    paid = (
+        InvoicePayment.objects.filter(lc=OuterRef('pk'))
+        .order_by()
+        .values('lc')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    apps.get_model('finance', 'LetterOfCredit').objects.update(
+        utilized_amount=Coalesce(Subquery(paid, output_field=amount), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_customer_credit_exposure'),
+        ('masters', '0003_customer_credit_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='letterofcredit',
+            name='utilized_amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Amount drawn by payments under the LC', max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='letterofcredit',
+            name='available_amount',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('amount'), '-', models.F('utilized_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=15)),
+        ),
+        migrations.RunPython(populate_utilized, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='letterofcredit',
+            index=models.Index(fields=['status', 'expiry_date'], name='lc_status_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.2 on 2026-10-18 12:35
+
+import django.db.models.deletion
+import django.db.models.expressions
+import uuid
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, When
+from django.db.models.functions import Round
+
+
+OPEN_STATUSES = ('SUBMITTED', 'APPROVED')
+
+
+def populate_exposure(apps, schema_editor):
+    # Record what each open order and unpaid invoice contributes and rebuild
+    # every customer's exposure from those contributions. Existing payments
+    # are all settled.
+    SalesOrderItem = apps.get_model('sales', 'SalesOrderItem')
+    SalesInvoice = apps.get_model('sales', 'SalesInvoice')
+    CustomerCreditExposure = apps.get_model('finance', 'CustomerCreditExposure')
+    CreditExposureDocument = apps.get_model('finance', 'CreditExposureDocument')
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+
+    uninvoiced = Case(
+        When(
+            invoiced_quantity__lt=F('quantity'),
+            then=Round((F('quantity') - F('invoiced_quantity')) * F('rate'), 2),
+        ),
+        default=Decimal('0'),
+        output_field=amount,
+    )
+    orders = (
+        SalesOrderItem.objects.filter(
+            order__status__in=OPEN_STATUSES,
+            order__is_active=True,
+            order__customer__isnull=False,
+        )
+        .order_by()
+        .values_list('order_id', 'order__customer_id')
+        .annotate(total=Sum(uninvoiced))
+        .values_list('order_id', 'order__customer_id', 'total')
+    )
+    invoices = SalesInvoice.objects.filter(
+        outstanding__gt=0,
+        status__in=OPEN_STATUSES + ('CLOSED',),
+        is_active=True,
+        customer__isnull=False,
+    ).values_list('pk', 'customer_id', 'outstanding')
+
+    documents = []
+    totals = {}
+    for document_type, field, rows in (
+        ('ORDER', 'open_order_amount', orders),
+        ('INVOICE', 'unpaid_invoice_amount', invoices),
+    ):
+        for document_id, customer_id, total in rows:
+            if not total:
+                continue
+            documents.append(
+                CreditExposureDocument(
+                    document_type=document_type,
+                    document_id=document_id,
+                    customer_id=customer_id,
+                    amount=total,
+                )
+            )
+            customer = totals.setdefault(customer_id, {})
+            customer[field] = customer.get(field, Decimal('0')) + total
+
+    CreditExposureDocument.objects.bulk_create(documents, batch_size=1000)
+    CustomerCreditExposure.objects.all().delete()
+    CustomerCreditExposure.objects.bulk_create(
+        [
+            CustomerCreditExposure(customer_id=customer_id, **fields)
+            for customer_id, fields in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_letterofcredit_utilization'),
+        ('masters', '0003_customer_credit_limit'),
+        ('sales', '0006_line_taxes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customercreditexposure',
+            name='unsettled_payment_amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Payments against billed invoices that have not settled', max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='invoicepayment',
+            name='is_settled',
+            field=models.BooleanField(default=True, help_text="Cleared; unsettled payments (e.g. cheques in clearing) still count towards the customer's credit exposure"),
+        ),
+        migrations.RemoveField(
+            model_name='customercreditexposure',
+            name='exposure',
+        ),
+        migrations.AddField(
+            model_name='customercreditexposure',
+            name='exposure',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('open_order_amount'), '+', models.F('unpaid_invoice_amount')), '+', models.F('unsettled_payment_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=15)),
+        ),
+        migrations.CreateModel(
+            name='CreditExposureDocument',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document_type', models.CharField(choices=[('ORDER', 'Sales Order'), ('INVOICE', 'Sales Invoice'), ('PAYMENT', 'Invoice Payment')], max_length=20)),
+                ('document_id', models.UUIDField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_exposure_documents', to='masters.customer')),
+            ],
+            options={
+                'verbose_name': 'Credit Exposure Document',
+                'verbose_name_plural': 'Credit Exposure Documents',
+                'db_table': 'credit_exposure_documents',
+                'constraints': [models.UniqueConstraint(fields=('document_type', 'document_id'), name='uniq_credit_exposure_document')],
+            },
+        ),
+        migrations.RunPython(populate_exposure, migrations.RunPython.noop),
+    ]
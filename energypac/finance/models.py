@@ -1,14 +1,88 @@
-from django.db import models
+from decimal import Decimal
 
-from core.models import UUIDModel, TimeStampedModel, StatusModel
-from masters.models import Bank
+from django.db import models, router
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import (
+    BulkSignalQuerySet,
+    MaintainedFieldsModel,
+    StatusModel,
+    TimeStampedModel,
+    UUIDModel,
+)
+from core.transactions import with_retry
+from masters.models import Bank, Customer
 from sales.models import SalesInvoice
 
 
-class LetterOfCredit(UUIDModel, TimeStampedModel, StatusModel):
+class LetterOfCreditExceeded(Exception):
+    """
+    Raised when payments would draw more than the amount of an LC.
+    ``lc_ids`` lists the LCs concerned.
+    """
+
+    def __init__(self, lc_ids):
+        self.lc_ids = lc_ids
+        super().__init__(f"Letter of credit amount exceeded for {len(lc_ids)} LC(s).")
+
+
+class LetterOfCreditManager(models.Manager):
+
+    def draw_down(self, changes):
+        """
+        Add ``{lc_id: amount}`` changes to the utilized amounts; negative
+        amounts release earlier drawdowns. Each drawdown is a conditional
+        ``UPDATE ... WHERE utilized_amount + amount <= lc.amount``, so
+        concurrent payments cannot overdraw an LC. Raises
+        ``LetterOfCreditExceeded`` if any drawdown does not fit; callers run
+        this in a transaction, which rolls the others back.
+        """
+        now = timezone.now()
+        exceeded = []
+        for lc_id in sorted((pk for pk in changes if changes[pk]), key=str):
+            amount = changes[lc_id]
+            lcs = self.filter(pk=lc_id)
+            if amount > 0:
+                lcs = lcs.filter(utilized_amount__lte=F("amount") - amount)
+            updated = lcs.update(
+                utilized_amount=F("utilized_amount") + amount, updated_at=now
+            )
+            if amount > 0 and not updated:
+                exceeded.append(lc_id)
+        if exceeded:
+            raise LetterOfCreditExceeded(exceeded)
+
+    def refresh_utilized(self, lc_ids=None):
+        """
+        Recalculate the utilized amounts of LCs (all of them when ``lc_ids``
+        is ``None``) from their payments in one query.
+        """
+        lcs = self.all()
+        if lc_ids is not None:
+            lcs = lcs.filter(pk__in={pk for pk in lc_ids if pk is not None})
+        paid = (
+            InvoicePayment.objects.filter(lc=OuterRef("pk"))
+            .order_by()
+            .values("lc")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        amount = models.DecimalField(max_digits=15, decimal_places=2)
+        return lcs.update(
+            utilized_amount=Coalesce(
+                Subquery(paid, output_field=amount), Value(Decimal("0"))
+            ),
+            updated_at=timezone.now(),
+        )
+
+
+class LetterOfCredit(UUIDModel, TimeStampedModel, StatusModel, MaintainedFieldsModel):
     """
     Letter of Credit (LC).
     Represents a bank-backed payment instrument.
+    ``utilized_amount`` is drawn down by the payments made under the LC.
     """
 
     lc_number = models.CharField(
@@ -31,12 +105,32 @@ class LetterOfCredit(UUIDModel, TimeStampedModel, StatusModel):
         decimal_places=2
     )
 
+    utilized_amount = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Amount drawn by payments under the LC"
+    )
+
+    available_amount = models.GeneratedField(
+        expression=models.F("amount") - models.F("utilized_amount"),
+        output_field=models.DecimalField(max_digits=15, decimal_places=2),
+        db_persist=True
+    )
+
     remarks = models.TextField(blank=True)
 
+    objects = LetterOfCreditManager()
+
+    maintained_fields = ("utilized_amount",)
+
     class Meta:
         db_table = "letter_of_credits"
         verbose_name = "Letter of Credit"
         verbose_name_plural = "Letters of Credit"
+        indexes = [
+            models.Index(fields=["status", "expiry_date"], name="lc_status_expiry_idx"),
+        ]
 
     def __str__(self):
         return self.lc_number
@@ -93,8 +187,16 @@ class InvoicePayment(UUIDModel, TimeStampedModel):
         help_text="Cheque number / transaction reference"
     )
 
+    is_settled = models.BooleanField(
+        default=True,
+        help_text="Cleared; unsettled payments (e.g. cheques in clearing) "
+        "still count towards the customer's credit exposure"
+    )
+
     remarks = models.TextField(blank=True)
 
+    objects = BulkSignalQuerySet.as_manager()
+
     class Meta:
         db_table = "invoice_payments"
         verbose_name = "Invoice Payment"
@@ -102,3 +204,123 @@ class InvoicePayment(UUIDModel, TimeStampedModel):
 
     def __str__(self):
         return f"{self.invoice.invoice_number} - {self.amount}"
+
+    def save(self, *args, **kwargs):
+        """
+        Draw the payment down from its LC, releasing what an earlier
+        version of the payment drew, in the same transaction as the save.
+        """
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+
+        def operation():
+            changes = {}
+            if not self._state.adding:
+                previous = (
+                    InvoicePayment.objects.using(using)
+                    .select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("lc_id", "amount")
+                    .first()
+                )
+                if previous and previous[0]:
+                    changes[previous[0]] = -previous[1]
+            if self.lc_id:
+                changes[self.lc_id] = changes.get(self.lc_id, 0) + Decimal(
+                    self.amount
+                )
+            LetterOfCredit.objects.db_manager(using).draw_down(changes)
+            super(InvoicePayment, self).save(*args, **kwargs)
+
+        with_retry(operation, using=using)
+
+
+class CustomerCreditExposure(UUIDModel, TimeStampedModel):
+    """
+    Credit exposure of a customer.
+    Kept up to date by order, invoice and payment events so the credit
+    check at order entry reads a single row.
+    """
+
+    customer = models.OneToOneField(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="credit_exposure"
+    )
+
+    open_order_amount = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Uninvoiced value of open sales orders"
+    )
+
+    unpaid_invoice_amount = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Outstanding balance of billed invoices"
+    )
+
+    unsettled_payment_amount = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Payments against billed invoices that have not settled"
+    )
+
+    exposure = models.GeneratedField(
+        expression=(
+            models.F("open_order_amount")
+            + models.F("unpaid_invoice_amount")
+            + models.F("unsettled_payment_amount")
+        ),
+        output_field=models.DecimalField(max_digits=15, decimal_places=2),
+        db_persist=True
+    )
+
+    class Meta:
+        db_table = "customer_credit_exposures"
+        verbose_name = "Customer Credit Exposure"
+        verbose_name_plural = "Customer Credit Exposures"
+
+    def __str__(self):
+        return f"{self.customer.code} - {self.exposure}"
+
+
+class CreditExposureDocument(UUIDModel, TimeStampedModel):
+    """
+    What one order, invoice or payment last contributed to its customer's
+    credit exposure. Events subtract it and add the document's new figure,
+    so a refresh never re-reads the customer's other documents.
+    """
+
+    class DocumentType(models.TextChoices):
+        ORDER = "ORDER", "Sales Order"
+        INVOICE = "INVOICE", "Sales Invoice"
+        PAYMENT = "PAYMENT", "Invoice Payment"
+
+    document_type = models.CharField(max_length=20, choices=DocumentType.choices)
+
+    document_id = models.UUIDField()
+
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="credit_exposure_documents"
+    )
+
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+
+    class Meta:
+        db_table = "credit_exposure_documents"
+        verbose_name = "Credit Exposure Document"
+        verbose_name_plural = "Credit Exposure Documents"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document_type", "document_id"],
+                name="uniq_credit_exposure_document",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.document_type} {self.document_id} - {self.amount}"
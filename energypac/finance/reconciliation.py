@@ -0,0 +1,233 @@
+"""
+Bank statement reconciliation.
+
+A statement is read as CSV one chunk at a time. Its credit lines are
+matched against unpaid invoices, first by an invoice number in the line's
+reference or description and then by an amount equal to an invoice's
+outstanding balance within a date window. The invoices are loaded once into
+in-memory hash indexes, and locked until the matches are written, so
+matching a line costs no queries. Matched lines
+are written as ``InvoicePayment`` rows with ``bulk_create``; a line paying
+more than its invoice owes is reported instead.
+"""
+
+import csv
+import datetime
+import re
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from finance.models import InvoicePayment
+from finance.services import unpaid_invoices
+
+
+# Statement field -> CSV column
+STATEMENT_COLUMNS = {
+    "date": "date",
+    "amount": "amount",
+    "reference": "reference",
+    "description": "description",
+}
+
+DATE_FORMAT = "%Y-%m-%d"
+
+# Days before a payment within which an invoice may be matched by amount.
+DATE_WINDOW_DAYS = 90
+
+BATCH_SIZE = 1000
+
+REFERENCE_LENGTH = InvoicePayment._meta.get_field("reference_number").max_length
+
+TOKEN_SEPARATORS = re.compile(r"[\s,;:]+")
+
+
+def _tokens(*texts):
+    for text in texts:
+        for token in TOKEN_SEPARATORS.split(text.upper()):
+            if token:
+                yield token
+
+
+def invoice_indexes(customer=None):
+    """
+    Unpaid invoices keyed by id, plus indexes from invoice number and from
+    outstanding amount (oldest invoice first) to invoice id, from one query.
+    The invoices are locked, so call this inside a transaction.
+    """
+    invoices = {}
+    by_number = {}
+    by_amount = {}
+    for row in (
+        unpaid_invoices(customer)
+        .select_for_update()
+        .order_by("invoice_date", "invoice_number")
+        .values("pk", "invoice_number", "invoice_date", "outstanding")
+    ):
+        invoices[row["pk"]] = row
+        by_number[row["invoice_number"].upper()] = row["pk"]
+        by_amount.setdefault(row["outstanding"], []).append(row["pk"])
+    return invoices, by_number, by_amount
+
+
+def _match(line, indexes, window):
+    invoices, by_number, by_amount = indexes
+    for token in _tokens(line["reference"], line["description"]):
+        pk = by_number.get(token)
+        if pk is not None and invoices[pk]["outstanding"] > 0:
+            return pk, "reference"
+
+    earliest = line["date"] - window
+    for pk in by_amount.get(line["amount"], ()):
+        invoice = invoices[pk]
+        if (
+            invoice["outstanding"] == line["amount"]
+            and earliest <= invoice["invoice_date"] <= line["date"]
+        ):
+            return pk, "amount"
+    return None, None
+
+
+def _parse(row, columns, date_format):
+    line = {
+        field: (row.get(column) or "").strip() for field, column in columns.items()
+    }
+    line["date"] = datetime.datetime.strptime(line["date"], date_format).date()
+    line["amount"] = Decimal(line["amount"].replace(",", ""))
+    line["reference"] = line["reference"][:REFERENCE_LENGTH]
+    return line
+
+
+def _line_key(reference, date, amount, description):
+    # Lines without a reference are told apart by their description.
+    return (reference, date, amount, "" if reference else description)
+
+
+def _recorded(lines):
+    """
+    Bank payments already recorded for ``lines``, counted by reference,
+    date and amount, or by date, amount and description for lines without a
+    reference, in one query.
+    """
+    if not lines:
+        return Counter()
+    return Counter(
+        _line_key(*payment)
+        for payment in InvoicePayment.objects.filter(
+            payment_mode=InvoicePayment.PaymentMode.BANK_TRANSFER,
+            payment_date__in={line["date"] for line in lines},
+            amount__in={line["amount"] for line in lines},
+        ).values_list("reference_number", "payment_date", "amount", "remarks")
+    )
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reconcile_statement(
+    statement,
+    bank=None,
+    columns=None,
+    date_format=DATE_FORMAT,
+    window_days=DATE_WINDOW_DAYS,
+    dry_run=False,
+):
+    """
+    Match the credit lines of a CSV bank ``statement`` (any iterable of
+    text lines, such as an open file) to unpaid invoices and record the
+    matches as bank payments into ``bank``.
+
+    Debit and zero lines are skipped, and so are lines already recorded as a
+    bank payment with the same reference, date and amount (or, without a
+    reference, the same date, amount and description), each recorded
+    payment accounting for one line. This makes reconciling a statement
+    twice harmless. A line for more than its
+    invoice's outstanding balance is reported as unmatched for review
+    rather than overpaying the invoice. With ``dry_run`` the matches are
+    reported but not written. Everything runs in one transaction.
+
+    Returns a dict of counts (``lines``, ``skipped``, ``recorded``,
+    ``matched_by_reference``, ``matched_by_amount``) and the ``unmatched``
+    lines, each with its ``line`` number and a ``reason``.
+    """
+    columns = {**STATEMENT_COLUMNS, **(columns or {})}
+    window = datetime.timedelta(days=window_days)
+    result = {
+        "lines": 0,
+        "skipped": 0,
+        "recorded": 0,
+        "matched_by_reference": 0,
+        "matched_by_amount": 0,
+        "unmatched": [],
+    }
+
+    with transaction.atomic():
+        indexes = invoice_indexes()
+        invoices = indexes[0]
+        rows = enumerate(csv.DictReader(statement), start=2)
+        for chunk in _chunks(rows, BATCH_SIZE):
+            lines = []
+            for number, row in chunk:
+                result["lines"] += 1
+                try:
+                    line = _parse(row, columns, date_format)
+                except (ValueError, InvalidOperation):
+                    result["unmatched"].append(
+                        {"line": number, **row, "reason": "invalid"}
+                    )
+                    continue
+                if line["amount"] <= 0:
+                    result["skipped"] += 1
+                    continue
+                line["line"] = number
+                lines.append(line)
+
+            recorded = _recorded(lines)
+            payments = []
+            for line in lines:
+                key = _line_key(
+                    line["reference"], line["date"], line["amount"], line["description"]
+                )
+                if recorded[key] > 0:
+                    recorded[key] -= 1
+                    result["recorded"] += 1
+                    continue
+                pk, matched_by = _match(line, indexes, window)
+                if pk is None:
+                    result["unmatched"].append({**line, "reason": "no match"})
+                    continue
+                invoice = invoices[pk]
+                if line["amount"] > invoice["outstanding"]:
+                    result["unmatched"].append(
+                        {
+                            **line,
+                            "reason": "exceeds outstanding of "
+                            f"{invoice['invoice_number']}",
+                        }
+                    )
+                    continue
+                result[f"matched_by_{matched_by}"] += 1
+                invoice["outstanding"] -= line["amount"]
+                payments.append(
+                    InvoicePayment(
+                        invoice_id=pk,
+                        payment_date=line["date"],
+                        amount=line["amount"],
+                        payment_mode=InvoicePayment.PaymentMode.BANK_TRANSFER,
+                        bank=bank,
+                        reference_number=line["reference"],
+                        remarks=line["description"],
+                    )
+                )
+            if payments and not dry_run:
+                InvoicePayment.objects.bulk_create(payments)
+    return result
@@ -0,0 +1,131 @@
+import datetime
+from decimal import Decimal
+
+from django.db.models import (
+    Case,
+    DecimalField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from finance.models import InvoicePayment, LetterOfCredit
+from sales.models import SalesInvoice
+from sales.services import COUNTED_STATUSES, OPEN_STATUSES
+
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+ZERO = Decimal("0")
+
+# Ageing buckets as (name, oldest age in days); the last one is open-ended.
+AGEING_BUCKETS = (
+    ("current", 30),
+    ("days_31_60", 60),
+    ("days_61_90", 90),
+    ("over_90", None),
+)
+
+
+def paid_amount():
+    """
+    Sum of the payments of the outer invoice, as a subquery expression.
+    """
+    paid = (
+        InvoicePayment.objects.filter(invoice=OuterRef("pk"))
+        .order_by()
+        .values("invoice")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    return Coalesce(Subquery(paid, output_field=AMOUNT), Value(ZERO))
+
+
+def refresh_amount_paid(invoice_ids):
+    """
+    Recalculate ``amount_paid`` of ``invoice_ids`` from their payments in
+    one query. Returns the number of invoices updated.
+    """
+    invoice_ids = {pk for pk in invoice_ids if pk is not None}
+    if not invoice_ids:
+        return 0
+    return SalesInvoice.objects.filter(pk__in=invoice_ids).update(
+        amount_paid=paid_amount()
+    )
+
+
+def unpaid_invoices(customer=None):
+    """
+    Billed invoices with an outstanding balance, read through the partial
+    index on unpaid invoices.
+    """
+    invoices = SalesInvoice.objects.filter(
+        outstanding__gt=0, status__in=COUNTED_STATUSES, is_active=True
+    )
+    if customer is not None:
+        invoices = invoices.filter(customer=customer)
+    return invoices
+
+
+def receivables_ageing(as_of=None, customer=None):
+    """
+    Outstanding receivables per customer, split into ageing buckets by
+    invoice date, in a single grouped query.
+
+    Returns one dict per customer with ``customer_id``, ``customer_label``,
+    one key per bucket in ``AGEING_BUCKETS`` and ``total``.
+    """
+    as_of = as_of or timezone.localdate()
+
+    buckets = {}
+    newest = None
+    for name, oldest in AGEING_BUCKETS:
+        condition = {}
+        if oldest is not None:
+            condition["invoice_date__gte"] = as_of - datetime.timedelta(days=oldest)
+        if newest is not None:
+            condition["invoice_date__lt"] = as_of - datetime.timedelta(days=newest)
+        buckets[name] = Coalesce(
+            Sum(
+                Case(When(then="outstanding", **condition), default=Value(ZERO)),
+                output_field=AMOUNT,
+            ),
+            Value(ZERO),
+        )
+        newest = oldest
+
+    return (
+        unpaid_invoices(customer)
+        .filter(invoice_date__lte=as_of)
+        .order_by()
+        .values(
+            "customer_id",
+            customer_label=Coalesce("customer__name", "customer_name"),
+        )
+        .annotate(**buckets, total=Sum("outstanding"))
+        .order_by("-total")
+    )
+
+
+def expiring_letters_of_credit(within_days=30, as_of=None):
+    """
+    Open LCs expiring within ``within_days`` of ``as_of`` (today by
+    default) that still have an available amount, soonest first. Reads the
+    maintained ``available_amount`` through the (status, expiry_date) index.
+    """
+    as_of = as_of or timezone.localdate()
+    return (
+        LetterOfCredit.objects.filter(
+            status__in=OPEN_STATUSES,
+            is_active=True,
+            expiry_date__gte=as_of,
+            expiry_date__lte=as_of + datetime.timedelta(days=within_days),
+            available_amount__gt=0,
+        )
+        .select_related("bank")
+        .order_by("expiry_date", "lc_number")
+    )
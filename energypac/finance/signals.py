@@ -0,0 +1,184 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.signals import post_bulk_write, pre_bulk_write
+from finance import credit, services
+from finance.models import LetterOfCredit, LetterOfCreditExceeded
+
+
+@receiver(pre_save, sender="finance.InvoicePayment")
+def remember_previous_invoice(sender, instance, **kwargs):
+    instance._previous_invoice_id = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list("invoice_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender="finance.InvoicePayment")
+@receiver(post_delete, sender="finance.InvoicePayment")
+def refresh_invoice_paid(sender, instance, **kwargs):
+    services.refresh_amount_paid(
+        [instance.invoice_id, getattr(instance, "_previous_invoice_id", None)]
+    )
+
+
+@receiver(pre_bulk_write, sender="finance.InvoicePayment")
+def remember_bulk_previous(sender, instances, **kwargs):
+    previous = {
+        pk: (invoice_id, lc_id)
+        for pk, invoice_id, lc_id in sender.objects.filter(
+            pk__in=[instance.pk for instance in instances]
+        ).values_list("pk", "invoice_id", "lc_id")
+    }
+    for instance in instances:
+        instance._previous_invoice_id, instance._previous_lc_id = previous.get(
+            instance.pk, (None, None)
+        )
+
+
+def _with_previous(instances, field):
+    ids = set()
+    for instance in instances:
+        ids.add(getattr(instance, f"{field}_id"))
+        ids.add(getattr(instance, f"_previous_{field}_id", None))
+    return ids - {None}
+
+
+@receiver(post_bulk_write, sender="finance.InvoicePayment")
+def refresh_bulk_invoice_paid(sender, instances, fields, **kwargs):
+    if fields is None or {"invoice", "amount"}.intersection(fields):
+        services.refresh_amount_paid(_with_previous(instances, "invoice"))
+
+
+# Credit exposure. These receivers run after the document totals, order
+# fulfilment and amount paid have been refreshed by earlier receivers, and
+# re-read only the documents an event touched.
+
+DocumentType = credit.DocumentType
+
+
+EXPOSURE_PARENTS = {
+    "sales.SalesOrderItem": "order",
+    "sales.SalesInvoiceItem": "invoice",
+}
+
+
+@receiver(pre_save, sender="sales.SalesOrder")
+def check_order_credit(sender, instance, **kwargs):
+    credit.check_order_entry(instance)
+
+
+@receiver(pre_save, sender="sales.SalesOrderItem")
+def check_order_line_credit(sender, instance, **kwargs):
+    credit.check_order_line_entry(instance)
+
+
+@receiver(pre_save, sender="sales.SalesOrderItem")
+@receiver(pre_save, sender="sales.SalesInvoiceItem")
+def remember_previous_document(sender, instance, **kwargs):
+    field = EXPOSURE_PARENTS[sender._meta.label]
+    setattr(
+        instance,
+        f"_previous_{field}_id",
+        sender.objects.filter(pk=instance.pk)
+        .values_list(f"{field}_id", flat=True)
+        .first(),
+    )
+
+
+@receiver(pre_bulk_write, sender="sales.SalesOrderItem")
+@receiver(pre_bulk_write, sender="sales.SalesInvoiceItem")
+def remember_bulk_previous_document(sender, instances, **kwargs):
+    field = EXPOSURE_PARENTS[sender._meta.label]
+    previous = dict(
+        sender.objects.filter(
+            pk__in=[instance.pk for instance in instances]
+        ).values_list("pk", f"{field}_id")
+    )
+    for instance in instances:
+        setattr(instance, f"_previous_{field}_id", previous.get(instance.pk))
+
+
+@receiver(post_save, sender="sales.SalesOrder")
+@receiver(post_delete, sender="sales.SalesOrder")
+def refresh_order_exposure(sender, instance, **kwargs):
+    credit.refresh_document_exposure(DocumentType.ORDER, [instance.pk])
+
+
+@receiver(post_save, sender="sales.SalesInvoice")
+@receiver(post_delete, sender="sales.SalesInvoice")
+def refresh_invoice_exposure(sender, instance, **kwargs):
+    credit.refresh_invoice_exposure([instance.pk])
+
+
+@receiver(post_save, sender="sales.SalesOrderItem")
+@receiver(post_delete, sender="sales.SalesOrderItem")
+def refresh_order_line_exposure(sender, instance, **kwargs):
+    credit.refresh_document_exposure(
+        DocumentType.ORDER, _with_previous([instance], "order")
+    )
+
+
+@receiver(post_bulk_write, sender="sales.SalesOrderItem")
+def refresh_bulk_order_exposure(sender, instances, **kwargs):
+    credit.refresh_document_exposure(
+        DocumentType.ORDER, _with_previous(instances, "order")
+    )
+
+
+@receiver(post_save, sender="sales.SalesInvoiceItem")
+@receiver(post_delete, sender="sales.SalesInvoiceItem")
+def refresh_invoice_line_exposure(sender, instance, **kwargs):
+    credit.refresh_document_exposure(
+        DocumentType.INVOICE, _with_previous([instance], "invoice")
+    )
+
+
+@receiver(post_bulk_write, sender="sales.SalesInvoiceItem")
+def refresh_bulk_invoice_exposure(sender, instances, **kwargs):
+    credit.refresh_document_exposure(
+        DocumentType.INVOICE, _with_previous(instances, "invoice")
+    )
+
+
+@receiver(post_save, sender="finance.InvoicePayment")
+@receiver(post_delete, sender="finance.InvoicePayment")
+def refresh_payment_exposure(sender, instance, **kwargs):
+    credit.refresh_document_exposure(
+        DocumentType.INVOICE, _with_previous([instance], "invoice")
+    )
+    credit.refresh_document_exposure(DocumentType.PAYMENT, [instance.pk])
+
+
+@receiver(post_bulk_write, sender="finance.InvoicePayment")
+def refresh_bulk_payment_exposure(sender, instances, **kwargs):
+    credit.refresh_document_exposure(
+        DocumentType.INVOICE, _with_previous(instances, "invoice")
+    )
+    credit.refresh_document_exposure(
+        DocumentType.PAYMENT, [instance.pk for instance in instances]
+    )
+
+
+# Letter of credit utilization. Saving a payment draws it down in
+# InvoicePayment.save(); deletes and bulk writes are handled here.
+
+
+@receiver(post_delete, sender="finance.InvoicePayment")
+def release_lc_drawdown(sender, instance, **kwargs):
+    if instance.lc_id:
+        LetterOfCredit.objects.draw_down({instance.lc_id: -instance.amount})
+
+
+@receiver(post_bulk_write, sender="finance.InvoicePayment")
+def refresh_bulk_lc_utilization(sender, instances, fields, **kwargs):
+    if fields is None or {"lc", "amount"}.intersection(fields):
+        # LCs payments moved away from are refreshed as well.
+        lc_ids = _with_previous(instances, "lc")
+        LetterOfCredit.objects.refresh_utilized(lc_ids)
+        exceeded = LetterOfCredit.objects.filter(
+            pk__in=lc_ids, available_amount__lt=0
+        ).values_list("pk", flat=True)
+        if exceeded:
+            raise LetterOfCreditExceeded(list(exceeded))
@@ -1,3 +1,571 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+from core.models import StatusModel
+from finance.credit import (
+    CreditLimitExceeded,
+    DocumentType,
+    check_credit,
+    refresh_document_exposure,
+)
+from finance.reconciliation import reconcile_statement
+from finance.services import receivables_ageing, refresh_amount_paid
+from finance.models import (
+    CustomerCreditExposure,
+    InvoicePayment,
+    LetterOfCredit,
+    LetterOfCreditExceeded,
+)
+from items.models import Item, ItemType
+from masters.models import Bank, Customer, UnitOfMeasure
+from sales.models import (
+    SalesInvoice,
+    SalesInvoiceItem,
+    SalesOrder,
+    SalesOrderItem,
+)
+
+
+class LetterOfCreditDrawdownTests(TransactionTestCase):
+    """
+    Parallel payments under one LC must never draw more than its amount.
+    """
+
+    workers = 8
+    payments_per_worker = 10
+    lc_amount = Decimal("5000.00")
+    payment_amount = Decimal("100.00")
+
+    def setUp(self):
+        self.bank = Bank.objects.create(name="State Bank", ifsc_code="SBIN0000001")
+        customer = Customer.objects.create(name="Acme Power", code="ACME")
+        self.invoice = SalesInvoice.objects.create(
+            invoice_number="INV-1",
+            customer=customer,
+            invoice_date=datetime.date(2026, 4, 1),
+        )
+        self.lc = LetterOfCredit.objects.create(
+            lc_number="LC-1",
+            bank=self.bank,
+            issue_date=datetime.date(2026, 4, 1),
+            expiry_date=datetime.date(2026, 12, 31),
+            amount=self.lc_amount,
+        )
+
+    def _pay(self, amount, lc=None):
+        return InvoicePayment.objects.create(
+            invoice=self.invoice,
+            payment_date=datetime.date(2026, 5, 1),
+            amount=amount,
+            payment_mode=InvoicePayment.PaymentMode.LC,
+            lc=lc or self.lc,
+        )
+
+    def test_parallel_drawdowns_never_exceed_amount(self):
+        results = {"paid": 0, "refused": 0, "errors": []}
+        lock = threading.Lock()
+        start = threading.Barrier(self.workers)
+
+        def run():
+            try:
+                start.wait()
+                for _ in range(self.payments_per_worker):
+                    try:
+                        self._pay(self.payment_amount)
+                        outcome = "paid"
+                    except LetterOfCreditExceeded:
+                        outcome = "refused"
+                    with lock:
+                        results[outcome] += 1
+            except Exception as exc:
+                with lock:
+                    results["errors"].append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        attempts = self.workers * self.payments_per_worker
+
+        fits = int(self.lc_amount / self.payment_amount)
+        self.assertEqual(results["errors"], [])
+        self.assertEqual(results["paid"], fits)
+        self.assertEqual(results["refused"], attempts - fits)
+
+        self.lc.refresh_from_db()
+        self.assertEqual(self.lc.utilized_amount, self.lc_amount)
+        self.assertEqual(self.lc.available_amount, 0)
+        self.assertEqual(InvoicePayment.objects.filter(lc=self.lc).count(), fits)
+
+    def test_edits_and_deletes_release_drawdowns(self):
+        other = LetterOfCredit.objects.create(
+            lc_number="LC-2",
+            bank=self.bank,
+            issue_date=datetime.date(2026, 4, 1),
+            expiry_date=datetime.date(2026, 12, 31),
+            amount=Decimal("1000.00"),
+        )
+        payment = self._pay(Decimal("4000.00"))
+
+        payment.amount = Decimal("5000.00")
+        payment.save()
+        with self.assertRaises(LetterOfCreditExceeded):
+            self._pay(Decimal("0.01"))
+
+        payment.amount = Decimal("1000.00")
+        payment.lc = other
+        payment.save()
+        self.lc.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.lc.utilized_amount, 0)
+        self.assertEqual(other.utilized_amount, Decimal("1000.00"))
+
+        payment.delete()
+        other.refresh_from_db()
+        self.assertEqual(other.available_amount, Decimal("1000.00"))
+
+    def test_bulk_payments_over_the_amount_are_rolled_back(self):
+        payments = [
+            InvoicePayment(
+                invoice=self.invoice,
+                payment_date=datetime.date(2026, 5, 1),
+                amount=Decimal("3000.00"),
+                payment_mode=InvoicePayment.PaymentMode.LC,
+                lc=self.lc,
+            )
+            for _ in range(2)
+        ]
+        with self.assertRaises(LetterOfCreditExceeded):
+            InvoicePayment.objects.bulk_create(payments)
+
+        self.assertFalse(InvoicePayment.objects.exists())
+        self.lc.refresh_from_db()
+        self.assertEqual(self.lc.utilized_amount, 0)
+
+    def test_bulk_moves_between_lcs_refresh_both(self):
+        other = LetterOfCredit.objects.create(
+            lc_number="LC-2",
+            bank=self.bank,
+            issue_date=datetime.date(2026, 4, 1),
+            expiry_date=datetime.date(2026, 12, 31),
+            amount=Decimal("1000.00"),
+        )
+        payment = self._pay(Decimal("800.00"))
+
+        payment.lc = other
+        InvoicePayment.objects.bulk_update([payment], ["lc"])
+        self.lc.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.lc.utilized_amount, 0)
+        self.assertEqual(other.utilized_amount, Decimal("800.00"))
+
+    def test_refused_edit_inside_a_transaction_keeps_the_old_drawdown(self):
+        other = LetterOfCredit.objects.create(
+            lc_number="LC-2",
+            bank=self.bank,
+            issue_date=datetime.date(2026, 4, 1),
+            expiry_date=datetime.date(2026, 12, 31),
+            amount=Decimal("100.00"),
+        )
+        payment = self._pay(Decimal("800.00"))
+
+        with transaction.atomic():
+            payment.lc = other
+            with self.assertRaises(LetterOfCreditExceeded):
+                payment.save()
+        self.lc.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.lc.utilized_amount, Decimal("800.00"))
+        self.assertEqual(other.utilized_amount, 0)
+
+
+class CustomerCreditCheckTests(TestCase):
+    """
+    Credit checks read the locked exposure row, creating it when missing.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+        self.customer = Customer.objects.create(
+            name="Acme Power", code="ACME", credit_limit=Decimal("1000.00")
+        )
+        order = SalesOrder.objects.create(
+            order_number="SO-1",
+            customer=self.customer,
+            order_date=datetime.date(2026, 4, 1),
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        SalesOrderItem.objects.create(
+            order=order, item=item, quantity=5, rate=Decimal("100.00")
+        )
+
+    def test_orders_over_the_limit_are_refused(self):
+        check_credit({self.customer: Decimal("500.00")})
+
+        with self.assertRaises(CreditLimitExceeded) as raised:
+            check_credit({self.customer: Decimal("600.00")})
+        self.assertEqual(raised.exception.breaches[0]["exposure"], Decimal("500.00"))
+
+    def test_missing_exposure_is_computed_before_checking(self):
+        CustomerCreditExposure.objects.all().delete()
+
+        with self.assertRaises(CreditLimitExceeded) as raised:
+            check_credit({self.customer.pk: Decimal("600.00")})
+        self.assertEqual(raised.exception.breaches[0]["exposure"], Decimal("500.00"))
+        self.assertEqual(
+            CustomerCreditExposure.objects.get(customer=self.customer).exposure,
+            Decimal("500.00"),
+        )
+
+
+class CustomerCreditExposureTests(TestCase):
+    """
+    Order, invoice and payment events apply their own change to the
+    customer's exposure, and order entry is checked against the limit.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+        self.customer = Customer.objects.create(
+            name="Acme Power", code="ACME", credit_limit=Decimal("1000.00")
+        )
+        self.other = Customer.objects.create(name="Bharat Grid", code="BGRID")
+
+    def create_order(self, number, quantity, customer=None, status=None):
+        order = SalesOrder.objects.create(
+            order_number=number,
+            customer=customer or self.customer,
+            order_date=datetime.date(2026, 4, 1),
+            status=status or StatusModel.StatusChoices.APPROVED,
+        )
+        SalesOrderItem.objects.create(
+            order=order, item=self.item, quantity=quantity, rate=Decimal("100.00")
+        )
+        return order
+
+    def create_invoice(self, number, quantity):
+        invoice = SalesInvoice.objects.create(
+            invoice_number=number,
+            customer=self.customer,
+            invoice_date=datetime.date(2026, 4, 1),
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        SalesInvoiceItem.objects.create(
+            invoice=invoice, item=self.item, quantity=quantity, rate=100
+        )
+        return invoice
+
+    def exposure(self, customer=None):
+        return CustomerCreditExposure.objects.get(customer=customer or self.customer)
+
+    def test_events_apply_deltas(self):
+        order = self.create_order("SO-1", 3)
+        self.assertEqual(self.exposure().open_order_amount, Decimal("300.00"))
+
+        line = order.items.get()
+        line.quantity = 2
+        line.save()
+        self.assertEqual(self.exposure().open_order_amount, Decimal("200.00"))
+
+        order.customer = self.other
+        order.save()
+        self.assertEqual(self.exposure().open_order_amount, 0)
+        self.assertEqual(self.exposure(self.other).open_order_amount, Decimal("200.00"))
+
+        order.delete()
+        self.assertEqual(self.exposure(self.other).exposure, 0)
+
+    def test_refreshes_do_not_read_the_rest_of_the_book(self):
+        order = self.create_order("SO-1", 1)
+        with self.assertNumQueries(6):
+            refresh_document_exposure(DocumentType.ORDER, [order.pk])
+
+        for number in range(2, 7):
+            self.create_order(f"SO-{number}", 1)
+        with self.assertNumQueries(6):
+            refresh_document_exposure(DocumentType.ORDER, [order.pk])
+        self.assertEqual(self.exposure().open_order_amount, Decimal("600.00"))
+
+    def test_unsettled_payments_stay_exposed(self):
+        invoice = self.create_invoice("INV-1", 4)
+        payment = InvoicePayment.objects.create(
+            invoice=invoice,
+            payment_date=datetime.date(2026, 4, 10),
+            amount=Decimal("300.00"),
+            payment_mode=InvoicePayment.PaymentMode.CHEQUE,
+            is_settled=False,
+        )
+        exposure = self.exposure()
+        self.assertEqual(exposure.unpaid_invoice_amount, Decimal("100.00"))
+        self.assertEqual(exposure.unsettled_payment_amount, Decimal("300.00"))
+        self.assertEqual(exposure.exposure, Decimal("400.00"))
+
+        payment.is_settled = True
+        InvoicePayment.objects.bulk_update([payment], ["is_settled"])
+        self.assertEqual(self.exposure().exposure, Decimal("100.00"))
+
+    def test_lines_entered_on_open_orders_are_checked(self):
+        order = self.create_order("SO-1", 6)
+        line = order.items.get()
+
+        line.quantity = 11
+        with self.assertRaises(CreditLimitExceeded) as raised:
+            line.save()
+        self.assertEqual(raised.exception.breaches[0]["amount"], Decimal("500.00"))
+
+        with self.assertRaises(CreditLimitExceeded):
+            SalesOrderItem.objects.create(
+                order=order, item=self.item, quantity=5, rate=Decimal("100.00")
+            )
+        line.quantity = 10
+        line.save()
+        self.assertEqual(self.exposure().exposure, Decimal("1000.00"))
+
+    def test_orders_are_checked_when_they_open(self):
+        self.create_order("SO-1", 6)
+        draft = self.create_order(
+            "SO-2", 5, status=StatusModel.StatusChoices.DRAFT
+        )
+
+        draft.status = StatusModel.StatusChoices.SUBMITTED
+        with self.assertRaises(CreditLimitExceeded):
+            draft.save()
+        self.assertEqual(self.exposure().exposure, Decimal("600.00"))
+
+    def test_reconciliation_repairs_drift(self):
+        self.create_order("SO-1", 3)
+        self.create_invoice("INV-1", 2)
+        SalesOrderItem.objects.update(quantity=1)
+        CustomerCreditExposure.objects.filter(customer=self.other).delete()
+
+        output = io.StringIO()
+        call_command("reconcile_credit_exposure", stdout=output)
+        self.assertIn("repaired for 1 of 2", output.getvalue())
+        self.assertEqual(self.exposure().open_order_amount, Decimal("100.00"))
+        self.assertEqual(self.exposure().exposure, Decimal("300.00"))
+
+
+class BankReconciliationTests(TestCase):
+    """
+    Statement lines are matched to unpaid invoices by reference or amount,
+    and never pay an invoice more than it owes.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+        self.customer = Customer.objects.create(name="Acme Power", code="ACME")
+        self.first = self.create_invoice("INV-1", datetime.date(2026, 4, 1), 10)
+        self.second = self.create_invoice("INV-2", datetime.date(2026, 4, 5), 3)
+
+    def create_invoice(self, number, invoice_date, quantity):
+        invoice = SalesInvoice.objects.create(
+            invoice_number=number,
+            customer=self.customer,
+            invoice_date=invoice_date,
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        SalesInvoiceItem.objects.create(
+            invoice=invoice, item=self.item, quantity=quantity, rate=100
+        )
+        return invoice
+
+    def reconcile(self, *lines):
+        statement = io.StringIO(
+            "date,amount,reference,description\n"
+            + "".join(f"{line}\n" for line in lines)
+        )
+        return reconcile_statement(statement)
+
+    def paid(self, invoice):
+        invoice.refresh_from_db()
+        return invoice.amount_paid
+
+    def test_lines_match_by_reference_then_amount(self):
+        result = self.reconcile(
+            "2026-05-01,400.00,UTR1,Part payment INV-1",
+            "2026-05-02,300.00,UTR2,NEFT ACME",
+            "2026-05-03,-50.00,UTR3,Bank charges",
+            "2026-05-04,999.00,UTR4,Unknown",
+        )
+
+        self.assertEqual(result["matched_by_reference"], 1)
+        self.assertEqual(result["matched_by_amount"], 1)
+        self.assertEqual(result["skipped"], 1)
+        self.assertEqual(
+            [line["reason"] for line in result["unmatched"]], ["no match"]
+        )
+        self.assertEqual(self.paid(self.first), Decimal("400.00"))
+        self.assertEqual(self.paid(self.second), Decimal("300.00"))
+
+    def test_reconciling_twice_records_nothing_new(self):
+        self.reconcile("2026-05-01,400.00,UTR1,INV-1")
+        result = self.reconcile("2026-05-01,400.00,UTR1,INV-1")
+
+        self.assertEqual(result["recorded"], 1)
+        self.assertEqual(InvoicePayment.objects.count(), 1)
+
+    def test_lines_without_reference_are_recorded_once(self):
+        lines = (
+            "2026-05-01,100.00,,NEFT INV-1",
+            "2026-05-01,100.00,,NEFT INV-1",
+            "2026-05-01,100.00,,NEFT INV-2",
+        )
+        self.reconcile(*lines)
+        result = self.reconcile(*lines, "2026-05-01,100.00,,NEFT INV-1")
+
+        self.assertEqual(result["recorded"], 3)
+        self.assertEqual(result["matched_by_reference"], 1)
+        self.assertEqual(InvoicePayment.objects.count(), 4)
+        self.assertEqual(self.paid(self.first), Decimal("300.00"))
+
+    def test_reference_lines_over_the_outstanding_are_not_recorded(self):
+        result = self.reconcile(
+            "2026-05-01,800.00,UTR1,INV-1",
+            "2026-05-02,500.00,UTR2,INV-1",
+        )
+
+        self.assertEqual(result["matched_by_reference"], 1)
+        self.assertEqual(
+            [line["reason"] for line in result["unmatched"]],
+            ["exceeds outstanding of INV-1"],
+        )
+        self.assertEqual(self.paid(self.first), Decimal("800.00"))
+
+
+class ReceivablesTests(TestCase):
+    """
+    Invoices keep ``amount_paid`` and ``outstanding`` in step with their
+    payments, and receivables are aged from the outstanding balances.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+        self.acme = Customer.objects.create(name="Acme Power", code="ACME")
+        self.bharat = Customer.objects.create(name="Bharat Grid", code="BGL")
+        self.first = self.create_invoice("INV-1", self.acme, (2026, 6, 20), 10)
+        self.second = self.create_invoice("INV-2", self.acme, (2026, 5, 15), 5)
+
+    def create_invoice(self, number, customer, day, quantity, **fields):
+        invoice = SalesInvoice.objects.create(
+            invoice_number=number,
+            customer=customer,
+            invoice_date=datetime.date(*day),
+            status=fields.pop("status", StatusModel.StatusChoices.APPROVED),
+        )
+        SalesInvoiceItem.objects.create(
+            invoice=invoice, item=self.item, quantity=quantity, rate=100
+        )
+        return invoice
+
+    def pay(self, invoice, amount):
+        return InvoicePayment.objects.create(
+            invoice=invoice, payment_date=datetime.date(2026, 6, 25), amount=amount
+        )
+
+    def balances(self, invoice):
+        invoice.refresh_from_db()
+        return invoice.amount_paid, invoice.outstanding
+
+    def test_payments_maintain_the_outstanding_balance(self):
+        payment = self.pay(self.first, 400)
+        InvoicePayment.objects.bulk_create(
+            [
+                InvoicePayment(
+                    invoice=invoice,
+                    payment_date=datetime.date(2026, 6, 26),
+                    amount=100,
+                )
+                for invoice in (self.first, self.second)
+            ]
+        )
+        self.assertEqual(self.balances(self.first), (500, 500))
+        self.assertEqual(self.balances(self.second), (100, 400))
+
+        payment.invoice = self.second
+        payment.save()
+        self.assertEqual(self.balances(self.first), (100, 900))
+        self.assertEqual(self.balances(self.second), (500, 0))
+
+        payment.delete()
+        self.assertEqual(self.balances(self.second), (100, 400))
+
+    def test_refresh_amount_paid_repairs_drift(self):
+        self.pay(self.first, 250)
+        SalesInvoice.objects.update(amount_paid=999)
+
+        self.assertEqual(refresh_amount_paid([self.first.pk, None]), 1)
+        self.assertEqual(refresh_amount_paid([None]), 0)
+        self.assertEqual(self.balances(self.first), (250, 750))
+        self.assertEqual(self.balances(self.second), (999, -499))
+
+    def test_receivables_are_aged_by_invoice_date(self):
+        self.create_invoice("INV-3", self.acme, (2026, 4, 15), 3)
+        self.create_invoice("INV-4", self.bharat, (2026, 1, 10), 2)
+        # Exactly 30 days old is still current.
+        self.create_invoice("INV-5", self.bharat, (2026, 5, 31), 1)
+        self.create_invoice("INV-6", self.acme, (2026, 7, 5), 1)
+        self.create_invoice(
+            "INV-7",
+            self.acme,
+            (2026, 6, 1),
+            1,
+            status=StatusModel.StatusChoices.DRAFT,
+        )
+        paid = self.create_invoice("INV-8", self.acme, (2026, 6, 1), 1)
+        self.pay(self.first, 400)
+        self.pay(paid, 100)
+
+        as_of = datetime.date(2026, 6, 30)
+        self.assertEqual(
+            [
+                (
+                    row["customer_label"],
+                    row["current"],
+                    row["days_31_60"],
+                    row["days_61_90"],
+                    row["over_90"],
+                    row["total"],
+                )
+                for row in receivables_ageing(as_of)
+            ],
+            [
+                ("Acme Power", 600, 500, 300, 0, 1400),
+                ("Bharat Grid", 100, 0, 0, 200, 300),
+            ],
+        )
+        (row,) = receivables_ageing(as_of, customer=self.bharat)
+        self.assertEqual(row["customer_id"], self.bharat.pk)
@@ -0,0 +1,463 @@
+"""
+Fiscal-year archive of the stock ledger.
+
+Each archived fiscal year is one file of zlib-compressed column blocks,
+split into row groups. A JSON footer records the byte range of every column
+block together with the created_at and item range of its row group. Readers
+memory-map the file and only decompress the columns of the row groups a
+query can match, so scanning an old year never loads the whole file.
+"""
+
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import uuid
+import zlib
+from array import array
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.dates import (
+    fiscal_year_bounds,
+    fiscal_year_label,
+    fiscal_year_start_year,
+    period_cutoff,
+)
+from inventory.models import (
+    OPENING_BALANCE_REFERENCE,
+    StockLedger,
+    StockLedgerArchive,
+    StockValuationCheckpoint,
+    signed_quantity_expression,
+)
+
+
+MAGIC = b"SLARCH01"
+ROW_GROUP_SIZE = 65536
+FETCH_SIZE = 4096
+QUANTITY_SCALE = 3
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+COLUMNS = (
+    "id",
+    "created_at",
+    "item_id",
+    "warehouse_id",
+    "movement_type",
+    "quantity",
+    "reference_type",
+    "reference_id",
+    "remarks",
+)
+UUID_COLUMNS = {"id", "item_id", "warehouse_id", "reference_id"}
+
+
+def _pks(objects):
+    """
+    Primary keys of instances or ids, as ``UUID``s to compare with decoded
+    columns; ids may also be given as strings.
+    """
+    if objects is None:
+        return None
+    return {
+        pk if isinstance(pk, uuid.UUID) else uuid.UUID(str(pk))
+        for pk in (getattr(obj, "pk", obj) for obj in objects)
+    }
+
+
+def _to_micros(value):
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _from_micros(value):
+    return EPOCH + datetime.timedelta(microseconds=value)
+
+
+def _encode(name, values, reference_types):
+    if name in UUID_COLUMNS:
+        data = b"".join(value.bytes for value in values)
+    elif name == "created_at":
+        data = array("q", map(_to_micros, values)).tobytes()
+    elif name == "movement_type":
+        data = array(
+            "b", (1 if value == StockLedger.MovementType.IN else -1 for value in values)
+        ).tobytes()
+    elif name == "quantity":
+        data = array(
+            "q", (int(value.scaleb(QUANTITY_SCALE)) for value in values)
+        ).tobytes()
+    elif name == "reference_type":
+        codes = []
+        for value in values:
+            if value not in reference_types:
+                reference_types[value] = len(reference_types)
+            codes.append(reference_types[value])
+        data = array("H", codes).tobytes()
+    else:
+        data = json.dumps(values).encode()
+    return zlib.compress(data)
+
+
+def _numbers(typecode, data, byteorder):
+    values = array(typecode)
+    values.frombytes(data)
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+
+def _decode(name, data, footer):
+    data = zlib.decompress(data)
+    byteorder = footer["byteorder"]
+    if name in UUID_COLUMNS:
+        return [uuid.UUID(bytes=data[i:i + 16]) for i in range(0, len(data), 16)]
+    if name == "created_at":
+        return [_from_micros(value) for value in _numbers("q", data, byteorder)]
+    if name == "movement_type":
+        return [
+            StockLedger.MovementType.IN if value > 0 else StockLedger.MovementType.OUT
+            for value in _numbers("b", data, byteorder)
+        ]
+    if name == "quantity":
+        return [
+            Decimal(value).scaleb(-QUANTITY_SCALE)
+            for value in _numbers("q", data, byteorder)
+        ]
+    if name == "reference_type":
+        names = footer["reference_types"]
+        return [names[value] for value in _numbers("H", data, byteorder)]
+    return json.loads(data)
+
+
+class ArchiveWriter:
+    """
+    Writes ledger rows, given as tuples in ``COLUMNS`` order, to an archive
+    file. The file only appears at ``path`` once ``close()`` succeeds.
+    """
+
+    def __init__(self, path, metadata):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.temp_path = self.path.with_name(self.path.name + ".tmp")
+        self.file = open(self.temp_path, "wb")
+        self.file.write(MAGIC)
+        self.footer = dict(
+            metadata,
+            byteorder=sys.byteorder,
+            rows=0,
+            reference_types=[],
+            row_groups=[],
+        )
+        self.reference_types = {}
+        self.pending = []
+
+    def write(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+
+        columns = dict(zip(COLUMNS, zip(*self.pending)))
+        item_ids = [value.hex for value in columns["item_id"]]
+        created_at = [_to_micros(value) for value in columns["created_at"]]
+        group = {
+            "rows": len(self.pending),
+            "min_item": min(item_ids),
+            "max_item": max(item_ids),
+            "min_created_at": min(created_at),
+            "max_created_at": max(created_at),
+            "columns": {},
+        }
+        for name in COLUMNS:
+            data = _encode(name, list(columns[name]), self.reference_types)
+            group["columns"][name] = [self.file.tell(), len(data)]
+            self.file.write(data)
+
+        self.footer["rows"] += len(self.pending)
+        self.footer["row_groups"].append(group)
+        self.pending = []
+
+    def close(self):
+        self._flush()
+        self.footer["reference_types"] = sorted(
+            self.reference_types, key=self.reference_types.get
+        )
+        footer = json.dumps(self.footer).encode()
+        self.file.write(footer)
+        self.file.write(struct.pack("<Q", len(footer)))
+        self.file.write(MAGIC)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+        return self.footer["rows"]
+
+    def discard(self):
+        self.file.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+class ArchiveReader:
+    """
+    Memory-mapped reader for an archive file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        size = len(self.buffer)
+        if self.buffer[:8] != MAGIC or self.buffer[size - 8:] != MAGIC:
+            raise ValueError(f"{path} is not a stock ledger archive.")
+        (footer_length,) = struct.unpack("<Q", self.buffer[size - 16:size - 8])
+        self.footer = json.loads(self.buffer[size - 16 - footer_length:size - 16])
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _matches_group(self, group, item_hexes, start, end):
+        if start is not None and group["max_created_at"] < _to_micros(start):
+            return False
+        if end is not None and group["min_created_at"] >= _to_micros(end):
+            return False
+        if item_hexes is not None:
+            return any(
+                group["min_item"] <= item <= group["max_item"] for item in item_hexes
+            )
+        return True
+
+    def scan(self, columns=COLUMNS, items=None, warehouses=None, start=None, end=None):
+        """
+        Yield tuples of ``columns`` for archived rows of the given items and
+        warehouses (instances or ids) with ``start <= created_at < end``.
+        """
+        items = _pks(items)
+        warehouses = _pks(warehouses)
+        item_hexes = None if items is None else [item.hex for item in items]
+
+        filters = []
+        if items is not None:
+            filters.append("item_id")
+        if warehouses is not None:
+            filters.append("warehouse_id")
+        if start is not None or end is not None:
+            filters.append("created_at")
+        needed = list(dict.fromkeys([*columns, *filters]))
+
+        for group in self.footer["row_groups"]:
+            if not self._matches_group(group, item_hexes, start, end):
+                continue
+
+            data = {}
+            for name in needed:
+                offset, length = group["columns"][name]
+                block = self.buffer[offset:offset + length]
+                data[name] = _decode(name, block, self.footer)
+
+            for index in range(group["rows"]):
+                if items is not None and data["item_id"][index] not in items:
+                    continue
+                if (
+                    warehouses is not None
+                    and data["warehouse_id"][index] not in warehouses
+                ):
+                    continue
+                if start is not None and data["created_at"][index] < start:
+                    continue
+                if end is not None and data["created_at"][index] >= end:
+                    continue
+                yield tuple(data[name][index] for name in columns)
+
+
+def _archives(start=None, end=None):
+    archives = StockLedgerArchive.objects.all()
+    if start is not None:
+        archives = archives.filter(end_date__gte=timezone.localdate(start))
+    if end is not None:
+        archives = archives.filter(start_date__lte=timezone.localdate(end))
+    return archives.order_by("start_date")
+
+
+def archived_entries(
+    columns=COLUMNS, items=None, warehouses=None, start=None, end=None
+):
+    """
+    Yield archived ledger rows across every archived fiscal year overlapping
+    ``start <= created_at < end``, oldest year first.
+    """
+    for archive in _archives(start, end):
+        with ArchiveReader(archive.file_path) as reader:
+            yield from reader.scan(columns, items, warehouses, start, end)
+
+
+def archived_movement(start, end, items=None, warehouses=None):
+    """
+    Net archived quantity per (item_id, warehouse_id), excluding opening
+    balance entries, for ``start <= created_at < end``.
+    """
+    totals = {}
+    rows = archived_entries(
+        ("item_id", "warehouse_id", "movement_type", "quantity", "reference_type"),
+        items,
+        warehouses,
+        start,
+        end,
+    )
+    for item_id, warehouse_id, movement_type, quantity, reference_type in rows:
+        if reference_type == OPENING_BALANCE_REFERENCE:
+            continue
+        if movement_type == StockLedger.MovementType.OUT:
+            quantity = -quantity
+        key = (item_id, warehouse_id)
+        totals[key] = totals.get(key, Decimal("0")) + quantity
+    return totals
+
+
+def ledger_history(
+    items=None, warehouses=None, start=None, end=None, include_opening=False
+):
+    """
+    Yield ledger rows as dicts from archived fiscal years and the live table.
+
+    Rows come fiscal year by fiscal year, and by item, warehouse and time
+    within each. Opening balance entries summarise archived years whose rows
+    are also returned, so they are skipped unless ``include_opening``.
+    """
+    for row in archived_entries(COLUMNS, items, warehouses, start, end):
+        row = dict(zip(COLUMNS, row))
+        if include_opening or row["reference_type"] != OPENING_BALANCE_REFERENCE:
+            yield row
+
+    live = StockLedger.objects.all()
+    if items is not None:
+        live = live.filter(item__in=items)
+    if warehouses is not None:
+        live = live.filter(warehouse__in=warehouses)
+    if start is not None:
+        live = live.filter(created_at__gte=start)
+    if end is not None:
+        live = live.filter(created_at__lt=end)
+    if not include_opening:
+        live = live.exclude(reference_type=OPENING_BALANCE_REFERENCE)
+
+    yield from live.order_by("item_id", "warehouse_id", "created_at", "pk").values(
+        *COLUMNS
+    ).iterator(chunk_size=FETCH_SIZE)
+
+
+def archive_path(label):
+    return Path(settings.STOCK_LEDGER_ARCHIVE_DIR) / f"stock_ledger_{label}.slar"
+
+
+def archive_fiscal_year(start_year):
+    """
+    Move the ledger entries of a closed fiscal year into its archive file.
+
+    Valuation checkpoints are saved at the year end first, so valuation can
+    continue from them. The year's entries are replaced by one opening
+    balance entry per item and warehouse, dated at the start of the next
+    fiscal year; stock balances are unchanged.
+    """
+    # Imported here, valuation depends on the archive boundary.
+    from inventory.valuation import value_stock
+
+    first_day, last_day = fiscal_year_bounds(start_year)
+    label = fiscal_year_label(start_year)
+    current_first_day, _ = fiscal_year_bounds(
+        fiscal_year_start_year(timezone.localdate())
+    )
+    if last_day >= current_first_day:
+        raise ValueError(f"Fiscal year {label} is not closed yet.")
+    if StockLedgerArchive.objects.filter(fiscal_year=label).exists():
+        raise ValueError(f"Fiscal year {label} is already archived.")
+
+    start = period_cutoff(first_day - datetime.timedelta(days=1))
+    end = period_cutoff(last_day)
+    if StockLedger.objects.filter(created_at__lt=start).exists():
+        raise ValueError("Archive earlier fiscal years first.")
+
+    for method in StockValuationCheckpoint.Method.values:
+        value_stock(last_day, method, incremental=True, save=True)
+
+    path = archive_path(label)
+    writer = ArchiveWriter(
+        path,
+        {
+            "fiscal_year": label,
+            "start_date": first_day.isoformat(),
+            "end_date": last_day.isoformat(),
+        },
+    )
+    try:
+        with transaction.atomic():
+            entries = StockLedger.objects.filter(
+                created_at__gte=start, created_at__lt=end
+            )
+            for row in (
+                entries.order_by("item_id", "warehouse_id", "created_at", "pk")
+                .values_list(*COLUMNS)
+                .iterator(chunk_size=FETCH_SIZE)
+            ):
+                writer.write(row)
+            closing = (
+                entries.order_by()
+                .values_list("item_id", "warehouse_id")
+                .annotate(total=Sum(signed_quantity_expression()))
+            )
+            closing = [row for row in closing if row[2]]
+
+            archive = StockLedgerArchive.objects.create(
+                fiscal_year=label,
+                start_date=first_day,
+                end_date=last_day,
+                file_path=str(path),
+                row_count=writer.close(),
+            )
+            entries.delete()
+
+            StockLedger.objects.bulk_create(
+                (
+                    StockLedger(
+                        item_id=item_id,
+                        warehouse_id=warehouse_id,
+                        movement_type=(
+                            StockLedger.MovementType.IN
+                            if total > 0
+                            else StockLedger.MovementType.OUT
+                        ),
+                        quantity=abs(total),
+                        reference_type=OPENING_BALANCE_REFERENCE,
+                        reference_id=archive.pk,
+                        remarks=f"Closing stock of fiscal year {label}",
+                    )
+                    for item_id, warehouse_id, total in closing
+                ),
+                update_balances=False,
+            )
+            StockLedger.objects.filter(
+                reference_type=OPENING_BALANCE_REFERENCE, reference_id=archive.pk
+            ).update(created_at=end)
+    except BaseException:
+        writer.discard()
+        path.unlink(missing_ok=True)
+        raise
+
+    return archive
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.archive import archive_fiscal_year
+
+
+class Command(BaseCommand):
+    help = "Move a closed fiscal year of stock ledger entries to its archive file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "start_year",
+            type=int,
+            help="Year in which the fiscal year starts, e.g. 2024 for 2024-25.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            archive = archive_fiscal_year(options["start_year"])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archive.row_count} ledger entry(ies) of fiscal year "
+                f"{archive.fiscal_year} to {archive.file_path}."
+            )
+        )
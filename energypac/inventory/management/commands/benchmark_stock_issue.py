@@ -0,0 +1,147 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+
+from inventory.models import StockBalance, StockLedger, StockReservation
+from inventory.reservations import InsufficientStock, issue_stock
+from items.models import Item, ItemType
+from masters.models import UnitOfMeasure, Warehouse
+
+
+# Benchmarks issue from throwaway items in a throwaway warehouse, removed
+# again afterwards, so real stock is untouched.
+BENCHMARK_CODE = "BENCHMARK"
+
+
+class Command(BaseCommand):
+    help = (
+        "Issue stock from many threads against the same balances, check that "
+        "none goes negative and report the throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--count", type=int, default=100, help="Issues made per thread."
+        )
+        parser.add_argument(
+            "--items", type=int, default=2, help="Items each issue takes."
+        )
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=400,
+            help="Opening stock per item, in units of one issue.",
+        )
+
+    def _setup(self, item_count, stock):
+        uom = UnitOfMeasure.objects.create(name=BENCHMARK_CODE, code=BENCHMARK_CODE)
+        warehouse = Warehouse.objects.create(name=BENCHMARK_CODE, code=BENCHMARK_CODE)
+        items = [
+            Item.objects.create(
+                code=f"{BENCHMARK_CODE}-{index}",
+                name=f"{BENCHMARK_CODE} {index}",
+                item_type=ItemType.RAW_MATERIAL,
+                uom=uom,
+            )
+            for index in range(item_count)
+        ]
+        StockLedger.objects.bulk_create(
+            StockLedger(
+                item=item,
+                warehouse=warehouse,
+                movement_type=StockLedger.MovementType.IN,
+                quantity=stock,
+                reference_type="ADJUSTMENT",
+                reference_id=uuid.uuid4(),
+            )
+            for item in items
+        )
+        return warehouse, items
+
+    def _reset(self):
+        rows = Q(item__code__startswith=f"{BENCHMARK_CODE}-") | Q(
+            warehouse__code=BENCHMARK_CODE
+        )
+        with transaction.atomic():
+            for model in (StockLedger, StockBalance, StockReservation):
+                model.objects.filter(rows).delete()
+            Item.objects.filter(code__startswith=f"{BENCHMARK_CODE}-").delete()
+            Warehouse.objects.filter(code=BENCHMARK_CODE).delete()
+            UnitOfMeasure.objects.filter(code=BENCHMARK_CODE).delete()
+
+    def _issue_in_threads(self, warehouse, items, threads, count):
+        results = {"issued": 0, "short": 0, "errors": []}
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def run(index):
+            lines = [(item, warehouse, 1) for item in items]
+            if index % 2:
+                # Half the threads list the items the other way round.
+                lines.reverse()
+            try:
+                start.wait()
+                for _ in range(count):
+                    try:
+                        issue_stock(lines, "BENCHMARK", uuid.uuid4())
+                        outcome = "issued"
+                    except InsufficientStock:
+                        outcome = "short"
+                    with lock:
+                        results[outcome] += 1
+            except Exception as exc:
+                with lock:
+                    results["errors"].append(exc)
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=run, args=(index,)) for index in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        stock = options["stock"]
+
+        self._reset()
+        warehouse, items = self._setup(options["items"], stock)
+        try:
+            began = time.perf_counter()
+            results = self._issue_in_threads(
+                warehouse, items, threads, options["count"]
+            )
+            elapsed = time.perf_counter() - began
+            negative = StockBalance.objects.filter(
+                warehouse=warehouse, quantity__lt=0
+            ).count()
+        finally:
+            self._reset()
+
+        if results["errors"]:
+            raise CommandError(f"Issuers failed: {results['errors'][0]!r}")
+        if negative:
+            raise CommandError(f"{negative} balance(s) went negative.")
+        if results["issued"] > stock:
+            raise CommandError(
+                f"{results['issued']} issues passed against a stock of {stock}."
+            )
+
+        attempts = results["issued"] + results["short"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{attempts} issue(s) of {len(items)} item(s) from {threads} "
+                f"thread(s) in {elapsed:.2f}s ({attempts / elapsed:.0f} issues/s): "
+                f"{results['issued']} issued, {results['short']} short, no "
+                f"negative stock."
+            )
+        )
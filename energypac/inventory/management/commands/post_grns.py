@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import GoodsReceiptNote
+from inventory.services import post_grns
+
+
+class Command(BaseCommand):
+    help = "Post approved GRNs to the stock ledger in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("grn_numbers", nargs="*", help="GRN numbers to post.")
+        parser.add_argument(
+            "--all-approved",
+            action="store_true",
+            help="Post every approved GRN.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of GRNs posted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        grns = GoodsReceiptNote.objects.filter(
+            status=GoodsReceiptNote.StatusChoices.APPROVED
+        )
+        if options["grn_numbers"]:
+            grns = grns.filter(grn_number__in=options["grn_numbers"])
+        elif not options["all_approved"]:
+            raise CommandError("Pass GRN numbers or --all-approved.")
+
+        grn_ids = list(
+            grns.order_by("received_date", "grn_number").values_list("pk", flat=True)
+        )
+        batch_size = options["batch_size"]
+
+        posted = 0
+        for start in range(0, len(grn_ids), batch_size):
+            posted += len(post_grns(grn_ids[start:start + batch_size]))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Posted {posted} ledger entry(ies) from {len(grn_ids)} GRN(s)."
+            )
+        )
@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from inventory.models import StockBalance, StockLedger, signed_quantity_expression
+
+
+class Command(BaseCommand):
+    help = "Rebuild stock balances from the stock ledger and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drift, do not correct balances.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            balances = {
+                (row.item_id, row.warehouse_id): row
+                for row in StockBalance.objects.select_for_update()
+            }
+            ledger = {
+                (row["item_id"], row["warehouse_id"]): row["total"]
+                for row in StockLedger.objects.order_by()
+                .values("item_id", "warehouse_id")
+                .annotate(total=Sum(signed_quantity_expression()))
+            }
+
+            now = timezone.now()
+            changed = []
+            missing = []
+            for key in ledger.keys() | balances.keys():
+                expected = ledger.get(key) or Decimal("0")
+                row = balances.get(key)
+                actual = row.quantity if row else Decimal("0")
+                if expected == actual:
+                    continue
+
+                item_id, warehouse_id = key
+                self.stdout.write(
+                    f"Drift item={item_id} warehouse={warehouse_id}: "
+                    f"balance {actual}, ledger {expected}"
+                )
+                if row:
+                    row.quantity = expected
+                    row.updated_at = now
+                    changed.append(row)
+                else:
+                    missing.append(
+                        StockBalance(
+                            item_id=item_id,
+                            warehouse_id=warehouse_id,
+                            quantity=expected,
+                        )
+                    )
+
+            drift = len(changed) + len(missing)
+            if options["dry_run"]:
+                self.stdout.write(f"{drift} balance(s) drifted from the ledger.")
+                return
+
+            StockBalance.objects.bulk_update(changed, ["quantity", "updated_at"])
+            StockBalance.objects.bulk_create(missing)
+
+        self.stdout.write(self.style.SUCCESS(f"Corrected {drift} balance(s)."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import GoodsReceiptNote
+from inventory.services import reverse_grns
+
+
+class Command(BaseCommand):
+    help = "Reverse posted GRNs on the stock ledger and their purchase orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("grn_numbers", nargs="+", help="GRN numbers to reverse.")
+
+    def handle(self, *args, **options):
+        grn_ids = list(
+            GoodsReceiptNote.objects.filter(
+                grn_number__in=options["grn_numbers"]
+            ).values_list("pk", flat=True)
+        )
+        reversed_entries = reverse_grns(grn_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reversed {len(reversed_entries)} ledger entry(ies) "
+                f"from {len(grn_ids)} GRN(s)."
+            )
+        )
@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.snapshots import last_period_end, take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Store closing stock per item and warehouse for a period end."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            help="Period end date (YYYY-MM-DD). Defaults to the last month end.",
+        )
+
+    def handle(self, *args, **options):
+        period_end = options["date"] or last_period_end(timezone.localdate())
+        try:
+            count = take_snapshot(period_end)
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(
+            self.style.SUCCESS(f"Stored {count} snapshot row(s) for {period_end}.")
+        )
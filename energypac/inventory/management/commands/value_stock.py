@@ -0,0 +1,73 @@
+import csv
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.models import StockValuationCheckpoint
+from inventory.valuation import value_stock
+from items.models import Item
+from masters.models import Warehouse
+
+
+class Command(BaseCommand):
+    help = "Value closing stock per item and warehouse (FIFO or weighted average)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            help="Valuation date (YYYY-MM-DD). Defaults to today.",
+        )
+        parser.add_argument(
+            "--method",
+            choices=StockValuationCheckpoint.Method.values,
+            default=StockValuationCheckpoint.Method.FIFO,
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Resume from the latest saved checkpoint.",
+        )
+        parser.add_argument(
+            "--save",
+            action="store_true",
+            help="Save the closing layers as a checkpoint for the date.",
+        )
+
+    def handle(self, *args, **options):
+        day = options["date"] or timezone.localdate()
+        try:
+            rows = value_stock(
+                day,
+                method=options["method"],
+                incremental=options["incremental"],
+                save=options["save"],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        item_codes = dict(
+            Item.objects.filter(pk__in={row["item_id"] for row in rows}).values_list(
+                "pk", "code"
+            )
+        )
+        warehouse_codes = dict(Warehouse.objects.values_list("pk", "code"))
+
+        writer = csv.writer(self.stdout)
+        writer.writerow(["item", "warehouse", "quantity", "value"])
+        for row in sorted(
+            rows,
+            key=lambda row: (
+                item_codes[row["item_id"]],
+                warehouse_codes[row["warehouse_id"]],
+            ),
+        ):
+            writer.writerow(
+                [
+                    item_codes[row["item_id"]],
+                    warehouse_codes[row["warehouse_id"]],
+                    row["quantity"],
+                    row["value"],
+                ]
+            )
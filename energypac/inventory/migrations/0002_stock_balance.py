@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 11:17
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, When
+
+
+def populate_stock_balances(apps, schema_editor):
+    StockLedger = apps.get_model('inventory', 'StockLedger')
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    signed_quantity = Case(
+        When(movement_type='OUT', then=-F('quantity')),
+        default=F('quantity'),
+        output_field=models.DecimalField(max_digits=15, decimal_places=3),
+    )
+    totals = (
+        StockLedger.objects.order_by()
+        .values('item_id', 'warehouse_id')
+        .annotate(total=Sum(signed_quantity))
+    )
+    StockBalance.objects.bulk_create(
+        StockBalance(item_id=row['item_id'], warehouse_id=row['warehouse_id'], quantity=row['total'])
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('items', '0001_initial'),
+        ('masters', '0002_customer_vendor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_balances', to='items.item')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_balances', to='masters.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Stock Balance',
+                'verbose_name_plural': 'Stock Balances',
+                'db_table': 'stock_balances',
+                'constraints': [models.UniqueConstraint(fields=('item', 'warehouse'), name='uniq_stock_balance_item_warehouse')],
+            },
+        ),
+        migrations.RunPython(populate_stock_balances, migrations.RunPython.noop),
+    ]
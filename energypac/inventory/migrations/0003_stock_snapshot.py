@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 11:17
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_stock_balance'),
+        ('items', '0001_initial'),
+        ('masters', '0002_customer_vendor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('period_end', models.DateField(help_text='Last day of the snapshot period')),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=15)),
+            ],
+            options={
+                'verbose_name': 'Stock Snapshot',
+                'verbose_name_plural': 'Stock Snapshots',
+                'db_table': 'stock_snapshots',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['created_at'], name='stock_ledge_created_a6837a_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_snapshots', to='items.item'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_snapshots', to='masters.warehouse'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('period_end', 'item', 'warehouse'), name='uniq_stock_snapshot_period_item_warehouse'),
+        ),
+    ]
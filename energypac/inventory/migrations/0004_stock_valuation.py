@@ -0,0 +1,74 @@
+# Generated by Django 5.2 on 2026-10-18 11:18
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stock_snapshot'),
+        ('items', '0001_initial'),
+        ('masters', '0002_customer_vendor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockValuationCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('method', models.CharField(choices=[('FIFO', 'First In First Out'), ('AVERAGE', 'Weighted Average')], max_length=10)),
+                ('valuation_date', models.DateField(help_text='Ledger entries up to the end of this day are included')),
+            ],
+            options={
+                'verbose_name': 'Stock Valuation Checkpoint',
+                'verbose_name_plural': 'Stock Valuation Checkpoints',
+                'db_table': 'stock_valuation_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockValuationLayer',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sequence', models.PositiveIntegerField()),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=15)),
+                ('rate', models.DecimalField(decimal_places=4, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Stock Valuation Layer',
+                'verbose_name_plural': 'Stock Valuation Layers',
+                'db_table': 'stock_valuation_layers',
+                'ordering': ['checkpoint', 'item', 'warehouse', 'sequence'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='stockledger',
+            name='stock_ledge_item_id_5e4663_idx',
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['item', 'warehouse', 'created_at'], name='stock_ledge_item_id_34f258_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockvaluationcheckpoint',
+            constraint=models.UniqueConstraint(fields=('method', 'valuation_date'), name='uniq_stock_valuation_checkpoint_method_date'),
+        ),
+        migrations.AddField(
+            model_name='stockvaluationlayer',
+            name='checkpoint',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='layers', to='inventory.stockvaluationcheckpoint'),
+        ),
+        migrations.AddField(
+            model_name='stockvaluationlayer',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_valuation_layers', to='items.item'),
+        ),
+        migrations.AddField(
+            model_name='stockvaluationlayer',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_valuation_layers', to='masters.warehouse'),
+        ),
+    ]
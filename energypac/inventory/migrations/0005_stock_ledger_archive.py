@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 11:20
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stock_valuation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLedgerArchive',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('fiscal_year', models.CharField(max_length=20, unique=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('file_path', models.CharField(max_length=500)),
+                ('row_count', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Stock Ledger Archive',
+                'verbose_name_plural': 'Stock Ledger Archives',
+                'db_table': 'stock_ledger_archives',
+                'ordering': ['start_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 11:22
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stock_ledger_archive'),
+        ('items', '0001_initial'),
+        ('masters', '0002_customer_vendor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockbalance',
+            name='reserved_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Quantity held by active stock reservations', max_digits=15),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('reference_type', models.CharField(help_text='Source document type (Dispatch, Sales Order, etc.)', max_length=50)),
+                ('reference_id', models.UUIDField(help_text='UUID of the source document')),
+                ('reservation_status', models.CharField(choices=[('ACTIVE', 'Active'), ('ISSUED', 'Issued'), ('RELEASED', 'Released')], default='ACTIVE', max_length=10)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_reservations', to='items.item')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_reservations', to='masters.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Stock Reservation',
+                'verbose_name_plural': 'Stock Reservations',
+                'db_table': 'stock_reservations',
+                'indexes': [models.Index(fields=['reference_type', 'reference_id'], name='stock_reser_referen_49ae4d_idx')],
+            },
+        ),
+    ]
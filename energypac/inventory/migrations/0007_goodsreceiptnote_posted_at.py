@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+def populate_posted_at(apps, schema_editor):
+    # GRNs with lines on the ledger that were not reversed count as posted.
+    GoodsReceiptItem = apps.get_model('inventory', 'GoodsReceiptItem')
+    StockLedger = apps.get_model('inventory', 'StockLedger')
+
+    def line_ids(reference_type):
+        return StockLedger.objects.filter(reference_type=reference_type).values(
+            'reference_id'
+        )
+
+    lines = GoodsReceiptItem.objects.filter(pk__in=line_ids('GRN')).exclude(
+        pk__in=line_ids('GRN_REVERSAL')
+    )
+    apps.get_model('inventory', 'GoodsReceiptNote').objects.filter(
+        pk__in=lines.values('grn_id')
+    ).update(posted_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goodsreceiptnote',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, help_text='When the GRN was posted to the stock ledger', null=True),
+        ),
+        migrations.RunPython(populate_posted_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-18 12:03
+
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_posted_at(apps, schema_editor):
+    # Lines with a GRN entry that was not reversed are received, as are
+    # lines of posted GRNs whose entries were archived or that were only
+    # received through a posted quality inspection.
+    GoodsReceiptItem = apps.get_model('inventory', 'GoodsReceiptItem')
+    GoodsReceiptNote = apps.get_model('inventory', 'GoodsReceiptNote')
+    StockLedger = apps.get_model('inventory', 'StockLedger')
+    QualityInspectionItem = apps.get_model('quality', 'QualityInspectionItem')
+
+    def entries(reference_type):
+        return Exists(
+            StockLedger.objects.filter(
+                reference_type=reference_type, reference_id=OuterRef('pk')
+            )
+        )
+
+    inspected = Exists(
+        QualityInspectionItem.objects.filter(grn_item_id=OuterRef('pk'))
+    )
+    inspection_posted = Exists(
+        QualityInspectionItem.objects.filter(
+            grn_item_id=OuterRef('pk'), inspection__posted_at__isnull=False
+        )
+    )
+    received = Q(entries('GRN')) | Q(
+        Q(grn__posted_at__isnull=False)
+        & Q(inspection_posted | ~Q(inspected) & ~Q(entries('GRN')))
+    )
+    GoodsReceiptItem.objects.filter(received & ~Q(entries('GRN_REVERSAL'))).update(
+        posted_at=Coalesce(
+            Subquery(
+                GoodsReceiptNote.objects.filter(pk=OuterRef('grn_id')).values(
+                    'posted_at'
+                )
+            ),
+            F('updated_at'),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_goodsreceiptnote_posted_at'),
+        ('quality', '0003_quality_daily_fact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goodsreceiptitem',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, help_text='When the line was received into stock', null=True),
+        ),
+        migrations.RunPython(populate_posted_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_purchase_order_item(apps, schema_editor):
+    # Link each GRN line to the oldest line of its purchase order for the
+    # same item, the line receipts fill first.
+    GoodsReceiptItem = apps.get_model('inventory', 'GoodsReceiptItem')
+    GoodsReceiptNote = apps.get_model('inventory', 'GoodsReceiptNote')
+    PurchaseOrderItem = apps.get_model('procurement', 'PurchaseOrderItem')
+
+    purchase_order = GoodsReceiptNote.objects.filter(
+        pk=OuterRef(OuterRef('grn_id'))
+    ).values('purchase_order_id')
+    GoodsReceiptItem.objects.filter(grn__purchase_order__isnull=False).update(
+        purchase_order_item=Subquery(
+            PurchaseOrderItem.objects.filter(
+                purchase_order_id=Subquery(purchase_order),
+                item_id=OuterRef('item_id'),
+            )
+            .order_by('created_at', 'pk')
+            .values('pk')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_goodsreceiptitem_posted_at'),
+        ('procurement', '0006_line_taxes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goodsreceiptitem',
+            name='purchase_order_item',
+            field=models.ForeignKey(blank=True, help_text='Purchase order line received; its rate costs the receipt', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='grn_items', to='procurement.purchaseorderitem'),
+        ),
+        migrations.RunPython(populate_purchase_order_item, migrations.RunPython.noop),
+    ]
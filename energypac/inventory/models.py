@@ -1,9 +1,15 @@
-from django.db import models
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models import Case, F, When
 
 from core.models import UUIDModel, TimeStampedModel, StatusModel
+from core.rollups import apply_deltas
+from core.signals import post_bulk_write
 from items.models import Item
 from masters.models import Warehouse
-from procurement.models import PurchaseOrder
+from procurement.models import PurchaseOrder, PurchaseOrderItem
 
 
 class GoodsReceiptNote(UUIDModel, TimeStampedModel, StatusModel):
@@ -32,6 +38,12 @@ class GoodsReceiptNote(UUIDModel, TimeStampedModel, StatusModel):
 
     remarks = models.TextField(blank=True)
 
+    posted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the GRN was posted to the stock ledger",
+    )
+
     class Meta:
         db_table = "goods_receipt_notes"
         verbose_name = "Goods Receipt Note"
@@ -52,8 +64,23 @@ class GoodsReceiptItem(UUIDModel, TimeStampedModel):
 
     item = models.ForeignKey(Item, on_delete=models.PROTECT, related_name="grn_items")
 
+    purchase_order_item = models.ForeignKey(
+        PurchaseOrderItem,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="grn_items",
+        help_text="Purchase order line received; its rate costs the receipt",
+    )
+
     quantity = models.DecimalField(max_digits=12, decimal_places=3)
 
+    posted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the line was received into stock",
+    )
+
     class Meta:
         db_table = "goods_receipt_items"
         verbose_name = "Goods Receipt Item"
@@ -63,10 +90,37 @@ class GoodsReceiptItem(UUIDModel, TimeStampedModel):
         return f"{self.grn.grn_number} - {self.item.code}"
 
 
+# Ledger entries carrying the closing stock of archived fiscal years
+OPENING_BALANCE_REFERENCE = "OPENING"
+
+
+class StockLedgerQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, update_balances=True, **kwargs):
+        """
+        Insert ledger entries and apply them to ``StockBalance`` in the
+        same transaction, then send ``post_bulk_write``.
+        """
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            if update_balances:
+                StockBalance.objects.db_manager(self.db).apply_movements(created)
+            post_bulk_write.send(
+                sender=self.model,
+                instances=created,
+                created=True,
+                fields=None,
+                using=self.db,
+            )
+        return created
+
+
 class StockLedger(UUIDModel, TimeStampedModel):
     """
     Stock Ledger.
     Every stock movement (IN / OUT) creates one ledger entry.
+    Ledger entries are append-only; each insert updates ``StockBalance``.
     """
 
     class MovementType(models.TextChoices):
@@ -93,14 +147,303 @@ class StockLedger(UUIDModel, TimeStampedModel):
 
     remarks = models.TextField(blank=True)
 
+    objects = StockLedgerQuerySet.as_manager()
+
     class Meta:
         db_table = "stock_ledger"
         verbose_name = "Stock Ledger"
         verbose_name_plural = "Stock Ledger"
         indexes = [
-            models.Index(fields=["item", "warehouse"]),
+            models.Index(fields=["item", "warehouse", "created_at"]),
             models.Index(fields=["reference_type", "reference_id"]),
+            models.Index(fields=["created_at"]),
         ]
 
     def __str__(self):
         return f"{self.item.code} | {self.movement_type} | {self.quantity}"
+
+    @property
+    def signed_quantity(self):
+        if self.movement_type == self.MovementType.OUT:
+            return -self.quantity
+        return self.quantity
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if adding:
+                StockBalance.objects.db_manager(using).apply_movements([self])
+
+
+def signed_quantity_expression():
+    """
+    Ledger quantity with OUT movements negated, for use in aggregates.
+    """
+    return Case(
+        When(movement_type=StockLedger.MovementType.OUT, then=-F("quantity")),
+        default=F("quantity"),
+        output_field=models.DecimalField(max_digits=15, decimal_places=3),
+    )
+
+
+class StockBalanceManager(models.Manager):
+
+    def apply_movements(self, entries):
+        """
+        Add the signed quantities of ledger ``entries`` to their balances.
+        """
+        deltas = {}
+        for entry in entries:
+            key = (entry.item_id, entry.warehouse_id)
+            changes = deltas.setdefault(key, {"quantity": Decimal("0")})
+            changes["quantity"] += entry.signed_quantity
+        return apply_deltas(
+            self.model, ("item_id", "warehouse_id"), deltas, using=self.db
+        )
+
+    def on_hand(self, item, warehouse):
+        """
+        Current on-hand quantity for an item in a warehouse.
+        """
+        quantities = self.filter(item=item, warehouse=warehouse).values_list(
+            "quantity", flat=True
+        )
+        return next(iter(quantities), Decimal("0"))
+
+    def available(self, item, warehouse):
+        """
+        On-hand quantity not held by stock reservations.
+        """
+        quantities = self.filter(item=item, warehouse=warehouse).values_list(
+            F("quantity") - F("reserved_quantity"), flat=True
+        )
+        return next(iter(quantities), Decimal("0"))
+
+    def usable(self):
+        """
+        Balances whose stock can supply demand: everything outside the
+        quality quarantine warehouse.
+        """
+        return self.exclude(warehouse__code=settings.QC_QUARANTINE_WAREHOUSE_CODE)
+
+
+class StockBalance(UUIDModel, TimeStampedModel):
+    """
+    Stock Balance.
+    On-hand quantity per item and warehouse, kept in step with the ledger.
+    """
+
+    item = models.ForeignKey(
+        Item, on_delete=models.PROTECT, related_name="stock_balances"
+    )
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name="stock_balances"
+    )
+
+    quantity = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+
+    reserved_quantity = models.DecimalField(
+        max_digits=15,
+        decimal_places=3,
+        default=0,
+        help_text="Quantity held by active stock reservations",
+    )
+
+    objects = StockBalanceManager()
+
+    class Meta:
+        db_table = "stock_balances"
+        verbose_name = "Stock Balance"
+        verbose_name_plural = "Stock Balances"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["item", "warehouse"], name="uniq_stock_balance_item_warehouse"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.item.code} | {self.warehouse.code} | {self.quantity}"
+
+    @property
+    def available_quantity(self):
+        return self.quantity - self.reserved_quantity
+
+
+class StockReservation(UUIDModel, TimeStampedModel):
+    """
+    Stock Reservation.
+    Quantity of an item held in a warehouse for a source document.
+    """
+
+    class ReservationStatus(models.TextChoices):
+        ACTIVE = "ACTIVE", "Active"
+        ISSUED = "ISSUED", "Issued"
+        RELEASED = "RELEASED", "Released"
+
+    item = models.ForeignKey(
+        Item, on_delete=models.PROTECT, related_name="stock_reservations"
+    )
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name="stock_reservations"
+    )
+
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)
+
+    reference_type = models.CharField(
+        max_length=50, help_text="Source document type (Dispatch, Sales Order, etc.)"
+    )
+
+    reference_id = models.UUIDField(help_text="UUID of the source document")
+
+    reservation_status = models.CharField(
+        max_length=10,
+        choices=ReservationStatus.choices,
+        default=ReservationStatus.ACTIVE,
+    )
+
+    class Meta:
+        db_table = "stock_reservations"
+        verbose_name = "Stock Reservation"
+        verbose_name_plural = "Stock Reservations"
+        indexes = [
+            models.Index(fields=["reference_type", "reference_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.item.code} | {self.reference_type} | {self.quantity}"
+
+
+class StockSnapshot(UUIDModel, TimeStampedModel):
+    """
+    Stock Snapshot.
+    Closing quantity per item and warehouse at the end of a period.
+    """
+
+    item = models.ForeignKey(
+        Item, on_delete=models.PROTECT, related_name="stock_snapshots"
+    )
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name="stock_snapshots"
+    )
+
+    period_end = models.DateField(help_text="Last day of the snapshot period")
+
+    quantity = models.DecimalField(max_digits=15, decimal_places=3)
+
+    class Meta:
+        db_table = "stock_snapshots"
+        verbose_name = "Stock Snapshot"
+        verbose_name_plural = "Stock Snapshots"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period_end", "item", "warehouse"],
+                name="uniq_stock_snapshot_period_item_warehouse",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period_end} | {self.item.code} | {self.quantity}"
+
+
+class StockValuationCheckpoint(UUIDModel, TimeStampedModel):
+    """
+    Saved state of a stock valuation run.
+    Incremental runs resume from the cost layers of the latest checkpoint.
+    """
+
+    class Method(models.TextChoices):
+        FIFO = "FIFO", "First In First Out"
+        AVERAGE = "AVERAGE", "Weighted Average"
+
+    method = models.CharField(max_length=10, choices=Method.choices)
+
+    valuation_date = models.DateField(
+        help_text="Ledger entries up to the end of this day are included"
+    )
+
+    class Meta:
+        db_table = "stock_valuation_checkpoints"
+        verbose_name = "Stock Valuation Checkpoint"
+        verbose_name_plural = "Stock Valuation Checkpoints"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["method", "valuation_date"],
+                name="uniq_stock_valuation_checkpoint_method_date",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.method} | {self.valuation_date}"
+
+
+class StockValuationLayer(UUIDModel):
+    """
+    Cost layer of an item in a warehouse at a valuation checkpoint.
+    """
+
+    checkpoint = models.ForeignKey(
+        StockValuationCheckpoint, on_delete=models.CASCADE, related_name="layers"
+    )
+
+    item = models.ForeignKey(
+        Item, on_delete=models.PROTECT, related_name="stock_valuation_layers"
+    )
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name="stock_valuation_layers"
+    )
+
+    sequence = models.PositiveIntegerField()
+
+    quantity = models.DecimalField(max_digits=15, decimal_places=3)
+
+    rate = models.DecimalField(max_digits=14, decimal_places=4)
+
+    class Meta:
+        db_table = "stock_valuation_layers"
+        verbose_name = "Stock Valuation Layer"
+        verbose_name_plural = "Stock Valuation Layers"
+        ordering = ["checkpoint", "item", "warehouse", "sequence"]
+
+    def __str__(self):
+        return f"{self.item.code} | {self.quantity} @ {self.rate}"
+
+
+class StockLedgerArchiveManager(models.Manager):
+
+    def boundary(self):
+        """
+        Last day covered by the ledger archive, or ``None``.
+        """
+        return self.aggregate(last_day=models.Max("end_date"))["last_day"]
+
+
+class StockLedgerArchive(UUIDModel, TimeStampedModel):
+    """
+    Fiscal year of stock ledger entries moved to a compressed archive file.
+    """
+
+    fiscal_year = models.CharField(max_length=20, unique=True)
+
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    file_path = models.CharField(max_length=500)
+
+    row_count = models.PositiveIntegerField()
+
+    objects = StockLedgerArchiveManager()
+
+    class Meta:
+        db_table = "stock_ledger_archives"
+        verbose_name = "Stock Ledger Archive"
+        verbose_name_plural = "Stock Ledger Archives"
+        ordering = ["start_date"]
+
+    def __str__(self):
+        return self.fiscal_year
@@ -0,0 +1,283 @@
+"""
+Stock reservation and issue.
+
+Every operation changes ``StockBalance`` rows with conditional updates such
+as ``UPDATE ... SET quantity = quantity - q WHERE quantity - reserved >= q``,
+so the availability check and the change happen atomically in the database.
+Rows are updated in (item, warehouse) order, so transactions touching the
+same balances always lock them in the same order and cannot deadlock. Lock
+timeouts, deadlock victims and serialization failures are retried.
+"""
+
+from decimal import Decimal
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.transactions import with_retry
+from inventory.models import StockBalance, StockLedger, StockReservation
+
+
+ReservationStatus = StockReservation.ReservationStatus
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when a reservation or issue would exceed the available stock.
+    ``shortages`` lists ``{"item_id", "warehouse_id", "requested",
+    "available"}`` dicts.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for {len(shortages)} line(s).")
+
+
+def _pk(obj):
+    return getattr(obj, "pk", obj)
+
+
+def _lock_order(key):
+    return tuple(map(str, key))
+
+
+def _totals(lines):
+    """
+    Sum ``(item, warehouse, quantity)`` lines per (item_id, warehouse_id).
+    Raises ``ValueError`` for quantities that are not positive.
+    """
+    totals = {}
+    for item, warehouse, quantity in lines:
+        quantity = Decimal(quantity)
+        if quantity <= 0:
+            raise ValueError("Stock quantities must be positive.")
+        key = (_pk(item), _pk(warehouse))
+        totals[key] = totals.get(key, Decimal("0")) + quantity
+    return totals
+
+
+def _shortage(key, requested):
+    item_id, warehouse_id = key
+    return {
+        "item_id": item_id,
+        "warehouse_id": warehouse_id,
+        "requested": requested,
+        "available": StockBalance.objects.available(item_id, warehouse_id),
+    }
+
+
+def reserve_stock(lines, reference_type, reference_id):
+    """
+    Reserve ``(item, warehouse, quantity)`` lines for a source document.
+    Raises ``InsufficientStock`` without reserving anything if any line
+    exceeds the available stock.
+    """
+    totals = _totals(lines)
+
+    def operation():
+        now = timezone.now()
+        shortages = []
+        for key in sorted(totals, key=_lock_order):
+            item_id, warehouse_id = key
+            quantity = totals[key]
+            updated = StockBalance.objects.filter(
+                item_id=item_id,
+                warehouse_id=warehouse_id,
+                quantity__gte=F("reserved_quantity") + quantity,
+            ).update(
+                reserved_quantity=F("reserved_quantity") + quantity, updated_at=now
+            )
+            if not updated:
+                shortages.append(_shortage(key, quantity))
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        return StockReservation.objects.bulk_create(
+            StockReservation(
+                item_id=item_id,
+                warehouse_id=warehouse_id,
+                quantity=quantity,
+                reference_type=reference_type,
+                reference_id=reference_id,
+            )
+            for (item_id, warehouse_id), quantity in totals.items()
+        )
+
+    return with_retry(operation)
+
+
+def lock_reservations(references):
+    """
+    Active reservations of many ``(reference_type, reference_id)`` source
+    documents, locked with ``SELECT ... FOR UPDATE`` in one query, oldest
+    first.
+    """
+    condition = Q()
+    for reference_type, reference_id in references:
+        condition |= Q(reference_type=reference_type, reference_id=reference_id)
+    if not condition:
+        return []
+    return list(
+        StockReservation.objects.select_for_update()
+        .filter(condition, reservation_status=ReservationStatus.ACTIVE)
+        .order_by("created_at", "pk")
+    )
+
+
+def _reservation_key(reservation):
+    return (
+        reservation.reference_type,
+        reservation.reference_id,
+        reservation.item_id,
+        reservation.warehouse_id,
+    )
+
+
+def consume_reservations(reservations, consumed, now=None):
+    """
+    Take ``consumed`` quantities, keyed by ``(reference_type, reference_id,
+    item_id, warehouse_id)``, off ``reservations``, oldest first.
+    Reservations used up are marked issued; a partly used one keeps the rest
+    active. Balances are left to the caller.
+    """
+    now = now or timezone.now()
+    left = dict(consumed)
+    issued = []
+    reduced = []
+    for reservation in reservations:
+        key = _reservation_key(reservation)
+        taken = min(left.get(key, Decimal("0")), reservation.quantity)
+        if not taken:
+            continue
+        left[key] -= taken
+        if taken == reservation.quantity:
+            issued.append(reservation.pk)
+        else:
+            reservation.quantity -= taken
+            reservation.updated_at = now
+            reduced.append(reservation)
+
+    StockReservation.objects.filter(pk__in=issued).update(
+        reservation_status=ReservationStatus.ISSUED, updated_at=now
+    )
+    StockReservation.objects.bulk_update(reduced, ["quantity", "updated_at"])
+
+
+def _active_reservations(reference_type, reference_id):
+    """
+    Locked active reservations of a source document and their quantities
+    per (item_id, warehouse_id).
+    """
+    reservations = lock_reservations([(reference_type, reference_id)])
+    totals = {}
+    for reservation in reservations:
+        key = (reservation.item_id, reservation.warehouse_id)
+        totals[key] = totals.get(key, Decimal("0")) + reservation.quantity
+    return reservations, totals
+
+
+def release_reservation(reference_type, reference_id):
+    """
+    Release the active reservations of a source document.
+    """
+
+    def operation():
+        reservations, reserved = _active_reservations(reference_type, reference_id)
+        now = timezone.now()
+        for key in sorted(reserved, key=_lock_order):
+            item_id, warehouse_id = key
+            StockBalance.objects.filter(
+                item_id=item_id, warehouse_id=warehouse_id
+            ).update(
+                reserved_quantity=F("reserved_quantity") - reserved[key],
+                updated_at=now,
+            )
+        return StockReservation.objects.filter(
+            pk__in=[reservation.pk for reservation in reservations]
+        ).update(reservation_status=ReservationStatus.RELEASED, updated_at=now)
+
+    return with_retry(operation)
+
+
+def take_stock(totals, consumed=None, now=None):
+    """
+    Take ``totals``, ``(item_id, warehouse_id)`` -> quantity, off the stock
+    balances without going below what is reserved. ``consumed`` gives the
+    part of the reservations per key that the caller uses up itself.
+
+    Balances are updated conditionally in lock order. ``InsufficientStock``
+    lists every short key; raised inside the caller's transaction, it undoes
+    the updates of the keys that did fit. The caller then writes its OUT
+    entries with ``update_balances=False``.
+    """
+    consumed = consumed or {}
+    now = now or timezone.now()
+    shortages = []
+    for key in sorted(totals, key=_lock_order):
+        item_id, warehouse_id = key
+        quantity = totals[key]
+        own = consumed.get(key, Decimal("0"))
+        updated = StockBalance.objects.filter(
+            item_id=item_id,
+            warehouse_id=warehouse_id,
+            quantity__gte=F("reserved_quantity") - own + quantity,
+        ).update(
+            quantity=F("quantity") - quantity,
+            reserved_quantity=F("reserved_quantity") - own,
+            updated_at=now,
+        )
+        if not updated:
+            shortages.append(_shortage(key, quantity))
+    if shortages:
+        raise InsufficientStock(shortages)
+
+
+def issue_stock(lines, reference_type, reference_id, remarks=""):
+    """
+    Issue ``(item, warehouse, quantity)`` lines as OUT ledger entries.
+
+    Active reservations of the same source document are consumed up to the
+    quantity issued, so reserved stock is available to it; whatever is left
+    of them stays reserved. Raises ``InsufficientStock`` without issuing
+    anything if any line would drive stock below what other documents have
+    reserved, and ``ValueError`` for quantities that are not positive.
+    Returns the ledger entries created.
+    """
+    totals = _totals(lines)
+
+    def operation():
+        # Reservations are locked before balances, as in release_reservation.
+        reservations, reserved = _active_reservations(reference_type, reference_id)
+        consumed = {
+            key: min(reserved.get(key, Decimal("0")), quantity)
+            for key, quantity in totals.items()
+        }
+        now = timezone.now()
+        take_stock(totals, consumed, now)
+        consume_reservations(
+            reservations,
+            {
+                (reference_type, reference_id) + key: quantity
+                for key, quantity in consumed.items()
+            },
+            now,
+        )
+
+        # Balances were already updated above.
+        return StockLedger.objects.bulk_create(
+            (
+                StockLedger(
+                    item_id=item_id,
+                    warehouse_id=warehouse_id,
+                    movement_type=StockLedger.MovementType.OUT,
+                    quantity=quantity,
+                    reference_type=reference_type,
+                    reference_id=reference_id,
+                    remarks=remarks,
+                )
+                for (item_id, warehouse_id), quantity in totals.items()
+            ),
+            update_balances=False,
+        )
+
+    return with_retry(operation)
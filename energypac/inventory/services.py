@@ -0,0 +1,277 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from inventory.models import GoodsReceiptItem, GoodsReceiptNote, StockLedger
+from inventory.reservations import take_stock
+from procurement.performance import record_deliveries, record_inspections
+from procurement.services import apply_receipts
+from quality.analytics import record_facts
+from quality.models import QualityInspection, QualityInspectionItem
+
+
+GRN_REFERENCE = "GRN"
+GRN_REVERSAL_REFERENCE = "GRN_REVERSAL"
+
+
+def _pks(objects):
+    return [getattr(obj, "pk", obj) for obj in objects]
+
+
+def post_grns(grns):
+    """
+    Post approved GRNs to the stock ledger.
+
+    ``grns`` may be GRN instances or primary keys. Lines with quality
+    inspection results are left to ``quality.services.post_inspections``,
+    which posts only the accepted quantity here. Every other line that is
+    not received yet becomes one IN entry with ``reference_type="GRN"`` and
+    ``reference_id`` set to the GRN line, and is stamped ``posted_at``, so
+    posting can safely be repeated, also after the entries were archived.
+    All entries are written with one ``bulk_create`` in a single
+    transaction, and the received quantities of the purchase order lines
+    are updated with them.
+
+    Returns the ledger entries created.
+    """
+    with transaction.atomic():
+        # Lock the GRNs so two posting runs cannot both see a line as unposted.
+        grn_ids = list(
+            GoodsReceiptNote.objects.select_for_update()
+            .filter(pk__in=_pks(grns), status=GoodsReceiptNote.StatusChoices.APPROVED)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        if not grn_ids:
+            return []
+
+        lines = list(
+            GoodsReceiptItem.objects.filter(
+                grn_id__in=grn_ids, posted_at__isnull=True, qc_items__isnull=True
+            ).values(
+                "pk",
+                "grn_id",
+                "item_id",
+                "quantity",
+                warehouse_id=F("grn__warehouse_id"),
+                grn_number=F("grn__grn_number"),
+                purchase_order_id=F("grn__purchase_order_id"),
+            )
+        )
+
+        entries = [
+            StockLedger(
+                item_id=line["item_id"],
+                warehouse_id=line["warehouse_id"],
+                movement_type=StockLedger.MovementType.IN,
+                quantity=line["quantity"],
+                reference_type=GRN_REFERENCE,
+                reference_id=line["pk"],
+                remarks=line["grn_number"],
+            )
+            for line in lines
+        ]
+        apply_receipts(_receipts(lines))
+        mark_received(
+            [line["pk"] for line in lines], {line["grn_id"] for line in lines}
+        )
+        return StockLedger.objects.bulk_create(entries)
+
+
+def mark_received(line_ids, grn_ids):
+    """
+    Stamp GRN lines as received into stock. Those of ``grn_ids`` that have
+    received lines and were not posted yet are stamped ``posted_at`` and
+    added to the vendor performance rollups.
+    """
+    GoodsReceiptItem.objects.filter(pk__in=line_ids).update(
+        posted_at=timezone.now()
+    )
+    _record_posting(
+        GoodsReceiptItem.objects.filter(
+            grn_id__in=grn_ids, posted_at__isnull=False
+        ).values("grn_id"),
+        posted=True,
+    )
+
+
+def _record_posting(grn_ids, posted):
+    """
+    Stamp (or, with ``posted=False``, clear) ``posted_at`` on the GRNs not
+    in that state yet and add them to (or take them off) the vendor
+    performance rollups.
+    """
+    grns = GoodsReceiptNote.objects.filter(
+        pk__in=grn_ids, posted_at__isnull=posted
+    )
+    record_deliveries(
+        grns.values_list(
+            "purchase_order__vendor_id",
+            "received_date",
+            "purchase_order__delivery_date",
+        ),
+        sign=1 if posted else -1,
+    )
+    grns.update(posted_at=timezone.now() if posted else None)
+
+
+def _receipts(lines, sign=1):
+    """
+    Quantities of GRN lines, given as dicts, per ``(purchase_order_id,
+    item_id)``.
+    """
+    receipts = {}
+    for line in lines:
+        key = (line["purchase_order_id"], line["item_id"])
+        receipts[key] = receipts.get(key, 0) + sign * line["quantity"]
+    return receipts
+
+
+def reverse_grns(grns):
+    """
+    Reverse posted GRNs.
+
+    Every received line gets an OUT entry with
+    ``reference_type="GRN_REVERSAL"`` and ``reference_id`` set to the GRN
+    line for the quantity it left in the GRN's warehouse. For lines of a
+    posted quality inspection that is the accepted quantity of all their
+    inspection lines, and the rejected quantity is taken out of the
+    quarantine warehouse the same way; the inspections
+    are unposted again and taken off the vendor performance rollups and
+    daily QC facts. The received quantities are taken off the purchase order
+    lines and the lines' ``posted_at`` is cleared. GRNs are locked and all
+    entries written in one transaction, so reversing can safely be repeated
+    as well. The GRNs are taken off the vendor performance rollups and can
+    be posted again.
+
+    Raises ``InsufficientStock`` and reverses nothing if received stock has
+    since been issued or reserved, as for ``issue_stock``.
+
+    Returns the ledger entries created.
+    """
+    with transaction.atomic():
+        grn_ids = list(
+            GoodsReceiptNote.objects.select_for_update()
+            .filter(pk__in=_pks(grns))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        lines = list(
+            GoodsReceiptItem.objects.filter(
+                grn_id__in=grn_ids, posted_at__isnull=False
+            ).values(
+                "pk",
+                "item_id",
+                "quantity",
+                warehouse_id=F("grn__warehouse_id"),
+                grn_number=F("grn__grn_number"),
+                purchase_order_id=F("grn__purchase_order_id"),
+            )
+        )
+        inspection_lines = list(
+            QualityInspectionItem.objects.filter(
+                inspection__grn_id__in=grn_ids, inspection__posted_at__isnull=False
+            ).values(
+                "grn_item_id",
+                "inspection_id",
+                "item_id",
+                "rejection_reason_id",
+                "received_quantity",
+                "accepted_quantity",
+                "rejected_quantity",
+                day=F("inspection__inspection_date"),
+                vendor_id=F("inspection__grn__purchase_order__vendor_id"),
+            )
+        )
+        # An inspection may split a GRN line over several lines, e.g. one per
+        # rejection reason.
+        inspected = {}
+        for inspection_line in inspection_lines:
+            accepted, rejected = inspected.get(inspection_line["grn_item_id"], (0, 0))
+            inspected[inspection_line["grn_item_id"]] = (
+                accepted + inspection_line["accepted_quantity"],
+                rejected + inspection_line["rejected_quantity"],
+            )
+        quarantine = None
+        if any(rejected for _, rejected in inspected.values()):
+            # Imported here, quality.services posts GRN lines through this module.
+            from quality.services import quarantine_warehouse
+
+            quarantine = quarantine_warehouse().pk
+
+        # (line, warehouse_id, quantity)
+        movements = []
+        for line in lines:
+            if line["pk"] not in inspected:
+                movements.append((line, line["warehouse_id"], line["quantity"]))
+                continue
+            accepted, rejected = inspected[line["pk"]]
+            movements.append((line, line["warehouse_id"], accepted))
+            movements.append((line, quarantine, rejected))
+
+        entries = [
+            StockLedger(
+                item_id=line["item_id"],
+                warehouse_id=warehouse_id,
+                movement_type=StockLedger.MovementType.OUT,
+                quantity=quantity,
+                reference_type=GRN_REVERSAL_REFERENCE,
+                reference_id=line["pk"],
+                remarks=line["grn_number"],
+            )
+            for line, warehouse_id, quantity in movements
+            if quantity
+        ]
+        taken = {}
+        for entry in entries:
+            key = (entry.item_id, entry.warehouse_id)
+            taken[key] = taken.get(key, 0) + entry.quantity
+        take_stock(taken)
+        apply_receipts(_receipts(lines, sign=-1))
+        GoodsReceiptItem.objects.filter(pk__in=[line["pk"] for line in lines]).update(
+            posted_at=None
+        )
+        _record_posting(grn_ids, posted=False)
+        _unpost_inspections(inspection_lines)
+        # Balances were already updated by take_stock.
+        return StockLedger.objects.bulk_create(entries, update_balances=False)
+
+
+def _unpost_inspections(lines):
+    """
+    Clear ``posted_at`` on the inspections of posted inspection ``lines``
+    and take the lines off the vendor performance rollups and daily QC
+    facts.
+    """
+    lines = list(lines)
+    record_inspections(
+        [
+            (
+                line["vendor_id"],
+                line["day"],
+                line["rejection_reason_id"],
+                line["received_quantity"],
+                line["rejected_quantity"],
+            )
+            for line in lines
+        ],
+        sign=-1,
+    )
+    record_facts(
+        [
+            (
+                line["day"],
+                line["item_id"],
+                line["vendor_id"],
+                line["rejection_reason_id"],
+                line["received_quantity"],
+                line["accepted_quantity"],
+                line["rejected_quantity"],
+            )
+            for line in lines
+        ],
+        sign=-1,
+    )
+    QualityInspection.objects.filter(
+        pk__in={line["inspection_id"] for line in lines}
+    ).update(posted_at=None)
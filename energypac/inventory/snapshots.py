@@ -0,0 +1,130 @@
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from core.dates import period_cutoff
+from inventory.archive import archived_movement
+from inventory.models import (
+    OPENING_BALANCE_REFERENCE,
+    StockLedger,
+    StockLedgerArchive,
+    StockSnapshot,
+    signed_quantity_expression,
+)
+
+
+def last_period_end(day):
+    """
+    Last day of the month before ``day``.
+    """
+    return day.replace(day=1) - datetime.timedelta(days=1)
+
+
+def _filter(queryset, items, warehouses):
+    if items is not None:
+        queryset = queryset.filter(item__in=items)
+    if warehouses is not None:
+        queryset = queryset.filter(warehouse__in=warehouses)
+    return queryset
+
+
+def ledger_movement(start, end, items=None, warehouses=None):
+    """
+    Net ledger quantity per (item_id, warehouse_id) with ``start <=
+    created_at < end``. ``start`` may be ``None`` for the whole history.
+
+    The whole history up to a date after the archived fiscal years is read
+    from the live table, whose opening balance entries stand in for the
+    archive. Any other range adds up the real movements of the live table
+    and the archive files.
+    """
+    boundary = StockLedgerArchive.objects.boundary()
+    archive_end = period_cutoff(boundary) if boundary else None
+    real_movements = start is not None or (archive_end and end <= archive_end)
+
+    entries = StockLedger.objects.filter(created_at__lt=end)
+    if start is not None:
+        entries = entries.filter(created_at__gte=start)
+    if real_movements:
+        entries = entries.exclude(reference_type=OPENING_BALANCE_REFERENCE)
+    entries = (
+        _filter(entries, items, warehouses)
+        .order_by()
+        .values_list("item_id", "warehouse_id")
+        .annotate(total=Sum(signed_quantity_expression()))
+    )
+    totals = {
+        (item_id, warehouse_id): total for item_id, warehouse_id, total in entries
+    }
+
+    if real_movements and archive_end and (start is None or start < archive_end):
+        archived = archived_movement(start, min(end, archive_end), items, warehouses)
+        for key, quantity in archived.items():
+            totals[key] = totals.get(key, Decimal("0")) + quantity
+
+    return totals
+
+
+def nearest_snapshot(day):
+    """
+    Latest snapshot period ending on or before ``day``, or ``None``.
+    """
+    return StockSnapshot.objects.filter(period_end__lte=day).aggregate(
+        period_end=Max("period_end")
+    )["period_end"]
+
+
+def stock_as_of(day, items=None, warehouses=None):
+    """
+    Stock per (item_id, warehouse_id) at the end of ``day``.
+
+    Starts from the nearest earlier snapshot and adds only the ledger
+    movement recorded after it. Pairs with zero stock are omitted.
+    """
+    stock = {}
+    start = None
+
+    period_end = nearest_snapshot(day)
+    if period_end is not None:
+        snapshots = _filter(
+            StockSnapshot.objects.filter(period_end=period_end), items, warehouses
+        ).values_list("item_id", "warehouse_id", "quantity")
+        for item_id, warehouse_id, quantity in snapshots:
+            stock[(item_id, warehouse_id)] = quantity
+        start = period_cutoff(period_end)
+
+    if period_end != day:
+        movement = ledger_movement(start, period_cutoff(day), items, warehouses)
+        for key, quantity in movement.items():
+            stock[key] = stock.get(key, Decimal("0")) + quantity
+
+    return {key: quantity for key, quantity in stock.items() if quantity}
+
+
+def take_snapshot(period_end):
+    """
+    Store closing stock for the period ending on ``period_end``, replacing
+    any earlier snapshot of the same period. Returns the number of rows.
+
+    Only closed periods can be stored, as stock posted later on
+    ``period_end`` would be missing from the snapshot.
+    """
+    if period_end >= timezone.localdate():
+        raise ValueError("Stock snapshots can only be taken for closed periods.")
+
+    with transaction.atomic():
+        StockSnapshot.objects.filter(period_end=period_end).delete()
+        closing = stock_as_of(period_end)
+        StockSnapshot.objects.bulk_create(
+            StockSnapshot(
+                item_id=item_id,
+                warehouse_id=warehouse_id,
+                period_end=period_end,
+                quantity=quantity,
+            )
+            for (item_id, warehouse_id), quantity in closing.items()
+        )
+    return len(closing)
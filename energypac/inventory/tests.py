@@ -1,3 +1,662 @@
-from django.test import TestCase
+import datetime
+import io
+import tempfile
+import threading
+import uuid
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.dates import period_cutoff
+from inventory.archive import archive_fiscal_year, ledger_history
+
+from inventory.models import (
+    GoodsReceiptItem,
+    GoodsReceiptNote,
+    StockBalance,
+    StockLedger,
+    StockReservation,
+)
+from inventory.reservations import (
+    InsufficientStock,
+    issue_stock,
+    release_reservation,
+    reserve_stock,
+)
+from inventory.services import post_grns, reverse_grns
+from inventory.snapshots import ledger_movement, stock_as_of, take_snapshot
+from inventory.valuation import Method, value_stock
+from items.models import Item, ItemType
+from masters.models import UnitOfMeasure, Vendor, Warehouse
+from procurement.models import PurchaseOrder, PurchaseOrderItem, VendorPerformance
+from quality.models import (
+    QualityDailyFact,
+    QualityInspection,
+    QualityInspectionItem,
+    RejectionReason,
+)
+from quality.services import post_inspections
+
+
+class StockBalanceTests(TestCase):
+    """
+    Ledger inserts keep ``StockBalance`` up to date, and
+    rebuild_stock_balances finds and repairs drift from the ledger.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.yard = Warehouse.objects.create(name="Yard", code="YARD")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+
+    def entry(self, warehouse, movement_type, quantity):
+        return StockLedger(
+            item=self.item,
+            warehouse=warehouse,
+            movement_type=movement_type,
+            quantity=quantity,
+            reference_type="ADJUSTMENT",
+            reference_id=uuid.uuid4(),
+        )
+
+    def balances(self):
+        return dict(StockBalance.objects.values_list("warehouse__code", "quantity"))
+
+    def rebuild(self, *args):
+        output = io.StringIO()
+        call_command("rebuild_stock_balances", *args, stdout=output)
+        return output.getvalue()
+
+    def test_saves_and_bulk_creates_update_balances(self):
+        IN, OUT = StockLedger.MovementType.IN, StockLedger.MovementType.OUT
+        entry = self.entry(self.warehouse, IN, 10)
+        entry.save()
+        self.entry(self.warehouse, OUT, 3).save()
+        StockLedger.objects.bulk_create(
+            [
+                self.entry(self.warehouse, IN, 5),
+                self.entry(self.yard, IN, 4),
+                self.entry(self.yard, OUT, 1),
+            ]
+        )
+        self.assertEqual(self.balances(), {"MAIN": 12, "YARD": 3})
+
+        # Saving an existing entry again does not apply it twice.
+        entry.remarks = "Opening stock"
+        entry.save()
+        self.assertEqual(self.balances(), {"MAIN": 12, "YARD": 3})
+
+    def test_rebuild_reports_and_repairs_drift(self):
+        StockLedger.objects.bulk_create(
+            [
+                self.entry(self.warehouse, StockLedger.MovementType.IN, 10),
+                self.entry(self.yard, StockLedger.MovementType.IN, 4),
+            ]
+        )
+        self.assertIn("Corrected 0 balance(s).", self.rebuild())
+
+        StockBalance.objects.filter(warehouse=self.warehouse).update(quantity=7)
+        StockBalance.objects.filter(warehouse=self.yard).delete()
+        output = self.rebuild("--dry-run")
+        self.assertIn("balance 7.000, ledger 10", output)
+        self.assertIn("2 balance(s) drifted from the ledger.", output)
+        self.assertEqual(self.balances(), {"MAIN": 7})
+
+        self.assertIn("Corrected 2 balance(s).", self.rebuild())
+        self.assertEqual(self.balances(), {"MAIN": 10, "YARD": 4})
+        self.assertIn("Corrected 0 balance(s).", self.rebuild())
+
+
+class StockIssueConcurrencyTests(TransactionTestCase):
+    """
+    Parallel issuers against the same balances must never drive stock
+    negative.
+    """
+
+    workers = 8
+    issues_per_worker = 25
+    opening_stock = Decimal("100")
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.items = [
+            Item.objects.create(
+                code=f"ITEM-{index}",
+                name=f"Item {index}",
+                item_type=ItemType.RAW_MATERIAL,
+                uom=uom,
+            )
+            for index in range(2)
+        ]
+        StockLedger.objects.bulk_create(
+            StockLedger(
+                item=item,
+                warehouse=self.warehouse,
+                movement_type=StockLedger.MovementType.IN,
+                quantity=self.opening_stock,
+                reference_type="ADJUSTMENT",
+                reference_id=uuid.uuid4(),
+            )
+            for item in self.items
+        )
+
+    def _run_issuers(self, worker):
+        results = {"issued": 0, "short": 0, "errors": []}
+        lock = threading.Lock()
+        start = threading.Barrier(self.workers)
+
+        def run(index):
+            try:
+                start.wait()
+                for _ in range(self.issues_per_worker):
+                    outcome = worker(index)
+                    with lock:
+                        results[outcome] += 1
+            except Exception as exc:
+                with lock:
+                    results["errors"].append(exc)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=run, args=(index,)) for index in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_parallel_issues_never_drive_stock_negative(self):
+        item = self.items[0]
+
+        def worker(index):
+            try:
+                issue_stock(
+                    [(item, self.warehouse, 1)], "DISPATCH", uuid.uuid4()
+                )
+            except InsufficientStock:
+                return "short"
+            return "issued"
+
+        results = self._run_issuers(worker)
+
+        self.assertEqual(results["errors"], [])
+        self.assertEqual(results["issued"], int(self.opening_stock))
+        self.assertEqual(
+            results["short"],
+            self.workers * self.issues_per_worker - int(self.opening_stock),
+        )
+        self.assertEqual(StockBalance.objects.on_hand(item, self.warehouse), 0)
+        self.assertEqual(
+            StockLedger.objects.filter(
+                item=item, movement_type=StockLedger.MovementType.OUT
+            ).count(),
+            int(self.opening_stock),
+        )
+
+    def test_multi_line_issues_in_opposite_order_do_not_deadlock(self):
+        def worker(index):
+            lines = [(item, self.warehouse, 1) for item in self.items]
+            if index % 2:
+                lines.reverse()
+            try:
+                issue_stock(lines, "DISPATCH", uuid.uuid4())
+            except InsufficientStock:
+                return "short"
+            return "issued"
+
+        results = self._run_issuers(worker)
+
+        self.assertEqual(results["errors"], [])
+        self.assertEqual(results["issued"], int(self.opening_stock))
+        for item in self.items:
+            self.assertEqual(StockBalance.objects.on_hand(item, self.warehouse), 0)
+
+    def test_reserved_stock_is_only_issued_to_its_document(self):
+        item = self.items[0]
+        order_id = uuid.uuid4()
+        reserve_stock([(item, self.warehouse, 60)], "SALES_ORDER", order_id)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            issue_stock([(item, self.warehouse, 50)], "DISPATCH", uuid.uuid4())
+        self.assertEqual(raised.exception.shortages[0]["available"], 40)
+
+        issue_stock([(item, self.warehouse, 50)], "SALES_ORDER", order_id)
+        balance = StockBalance.objects.get(item=item, warehouse=self.warehouse)
+        self.assertEqual(balance.quantity, 50)
+        self.assertEqual(balance.reserved_quantity, 10)
+        self.assertEqual(
+            list(
+                StockReservation.objects.filter(
+                    reservation_status=StockReservation.ReservationStatus.ACTIVE
+                ).values_list("quantity", flat=True)
+            ),
+            [10],
+        )
+
+        reserve_stock([(item, self.warehouse, 20)], "SALES_ORDER", order_id)
+        self.assertEqual(release_reservation("SALES_ORDER", order_id), 2)
+        self.assertEqual(StockBalance.objects.available(item, self.warehouse), 50)
+
+    def test_quantities_must_be_positive(self):
+        item = self.items[0]
+
+        for quantity in (0, -5):
+            lines = [(item, self.warehouse, quantity)]
+            with self.assertRaises(ValueError):
+                issue_stock(lines, "DISPATCH", uuid.uuid4())
+            with self.assertRaises(ValueError):
+                reserve_stock(lines, "DISPATCH", uuid.uuid4())
+        self.assertEqual(StockBalance.objects.on_hand(item, self.warehouse), 100)
+
+
+class GoodsReceiptPostingTests(TestCase):
+    """
+    Posting, reversing and reposting GRNs keeps stock, purchase order
+    receipts and vendor performance in step.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.vendor = Vendor.objects.create(name="Bharat Cables", code="BCL")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+        self.order = PurchaseOrder.objects.create(
+            po_number="PO-1",
+            vendor=self.vendor,
+            order_date=datetime.date(2026, 4, 1),
+            delivery_date=datetime.date(2026, 4, 10),
+            status=PurchaseOrder.StatusChoices.APPROVED,
+        )
+        self.order_line = PurchaseOrderItem.objects.create(
+            purchase_order=self.order, item=self.item, quantity=10, rate=100
+        )
+        self.grn = self.create_grn("GRN-1", Decimal("10"))
+
+    def create_grn(self, number, quantity, received_date=None):
+        grn = GoodsReceiptNote.objects.create(
+            grn_number=number,
+            purchase_order=self.order,
+            received_date=received_date or datetime.date(2026, 4, 10),
+            warehouse=self.warehouse,
+            status=GoodsReceiptNote.StatusChoices.APPROVED,
+        )
+        GoodsReceiptItem.objects.create(grn=grn, item=self.item, quantity=quantity)
+        return grn
+
+    def assertPosted(self, on_hand, received, grn_count):
+        self.assertEqual(
+            StockBalance.objects.on_hand(self.item, self.warehouse), on_hand
+        )
+        self.order_line.refresh_from_db()
+        self.assertEqual(self.order_line.received_quantity, received)
+        self.assertEqual(
+            sum(
+                VendorPerformance.objects.filter(vendor=self.vendor).values_list(
+                    "grn_count", flat=True
+                )
+            ),
+            grn_count,
+        )
+
+    def test_reversed_grns_can_be_posted_again(self):
+        self.assertEqual(len(post_grns([self.grn])), 1)
+        self.assertEqual(post_grns([self.grn]), [])
+        self.assertPosted(on_hand=10, received=10, grn_count=1)
+
+        self.assertEqual(len(reverse_grns([self.grn])), 1)
+        self.assertEqual(reverse_grns([self.grn]), [])
+        self.assertPosted(on_hand=0, received=0, grn_count=0)
+
+        self.assertEqual(len(post_grns([self.grn])), 1)
+        self.assertPosted(on_hand=10, received=10, grn_count=1)
+        self.grn.refresh_from_db()
+        self.assertIsNotNone(self.grn.posted_at)
+
+    def test_snapshots_are_only_taken_for_closed_periods(self):
+        post_grns([self.grn])
+        today = timezone.localdate()
+
+        for period_end in (today, today + datetime.timedelta(days=1)):
+            with self.assertRaises(ValueError):
+                take_snapshot(period_end)
+        # The receipt was posted today, after yesterday's period closed.
+        self.assertEqual(take_snapshot(today - datetime.timedelta(days=1)), 0)
+
+    def test_archived_grns_are_not_posted_again(self):
+        reversed_grn = self.create_grn("GRN-2", Decimal("5"))
+        post_grns([self.grn, reversed_grn])
+        reverse_grns([reversed_grn])
+        StockLedger.objects.update(
+            created_at=timezone.make_aware(datetime.datetime(2024, 6, 1, 12))
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(STOCK_LEDGER_ARCHIVE_DIR=directory):
+                archive_fiscal_year(2024)
+        self.assertFalse(
+            StockLedger.objects.filter(reference_type__startswith="GRN").exists()
+        )
+
+        self.assertEqual(post_grns([self.grn]), [])
+        self.assertPosted(on_hand=10, received=10, grn_count=1)
+
+        self.assertEqual(len(reverse_grns([self.grn])), 1)
+        self.assertPosted(on_hand=0, received=0, grn_count=0)
+
+    def test_reversing_inspected_grns_reverses_quarantined_rejects(self):
+        quarantine = Warehouse.objects.create(name="Quarantine", code="QUAR")
+        post_grns([self.grn])
+        inspection = QualityInspection.objects.create(
+            grn=self.grn,
+            inspection_date=datetime.date(2026, 4, 11),
+            status=QualityInspection.StatusChoices.APPROVED,
+        )
+        QualityInspectionItem.objects.create(
+            inspection=inspection,
+            grn_item=self.grn.items.get(),
+            item=self.item,
+            received_quantity=10,
+            accepted_quantity=7,
+            rejected_quantity=3,
+            rejection_reason=RejectionReason.objects.create(
+                code="DMG", description="Damaged"
+            ),
+        )
+        post_inspections([inspection])
+        self.assertPosted(on_hand=7, received=10, grn_count=1)
+        self.assertEqual(StockBalance.objects.on_hand(self.item, quarantine), 3)
+
+        reverse_grns([self.grn])
+        self.assertPosted(on_hand=0, received=0, grn_count=0)
+        self.assertEqual(StockBalance.objects.on_hand(self.item, quarantine), 0)
+        inspection.refresh_from_db()
+        self.assertIsNone(inspection.posted_at)
+        self.assertEqual(
+            sum(QualityDailyFact.objects.values_list("line_count", flat=True)), 0
+        )
+
+        post_inspections([inspection])
+        self.assertPosted(on_hand=7, received=10, grn_count=1)
+        self.assertEqual(StockBalance.objects.on_hand(self.item, quarantine), 3)
+
+    def test_split_inspection_lines_are_reversed_together(self):
+        quarantine = Warehouse.objects.create(name="Quarantine", code="QUAR")
+        inspection = QualityInspection.objects.create(
+            grn=self.grn,
+            inspection_date=datetime.date(2026, 4, 11),
+            status=QualityInspection.StatusChoices.APPROVED,
+        )
+        for code, accepted, rejected in (("DMG", 6, 2), ("RUST", 1, 1)):
+            QualityInspectionItem.objects.create(
+                inspection=inspection,
+                grn_item=self.grn.items.get(),
+                item=self.item,
+                received_quantity=accepted + rejected,
+                accepted_quantity=accepted,
+                rejected_quantity=rejected,
+                rejection_reason=RejectionReason.objects.create(
+                    code=code, description=code
+                ),
+            )
+        post_inspections([inspection])
+        self.assertEqual(StockBalance.objects.on_hand(self.item, self.warehouse), 7)
+        self.assertEqual(StockBalance.objects.on_hand(self.item, quarantine), 3)
+
+        reverse_grns([self.grn])
+        self.assertEqual(StockBalance.objects.on_hand(self.item, self.warehouse), 0)
+        self.assertEqual(StockBalance.objects.on_hand(self.item, quarantine), 0)
+
+    def test_issued_receipts_cannot_be_reversed(self):
+        post_grns([self.grn])
+        issue_stock([(self.item, self.warehouse, 4)], "ISSUE", uuid.uuid4())
+
+        with self.assertRaises(InsufficientStock):
+            reverse_grns([self.grn])
+        self.assertPosted(on_hand=6, received=10, grn_count=1)
+        self.assertFalse(
+            StockLedger.objects.filter(reference_type="GRN_REVERSAL").exists()
+        )
+
+
+class StockValuationTests(TestCase):
+    """
+    Receipts are costed at the rate of their own purchase order line and
+    valued FIFO or at weighted average, also when resumed from a checkpoint.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+        self.today = timezone.localdate()
+        order = PurchaseOrder.objects.create(
+            po_number="PO-1",
+            vendor=Vendor.objects.create(name="Bharat Cables", code="BCL"),
+            order_date=self.day(30),
+            status=PurchaseOrder.StatusChoices.APPROVED,
+        )
+        # Two lines for the same item, so each receipt must use its own.
+        self.cheap, self.dear = [
+            PurchaseOrderItem.objects.create(
+                purchase_order=order, item=self.item, quantity=10, rate=rate
+            )
+            for rate in (100, 120)
+        ]
+
+    def day(self, days_ago):
+        return self.today - datetime.timedelta(days=days_ago)
+
+    def backdate(self, entries, days_ago):
+        noon = datetime.datetime.combine(self.day(days_ago), datetime.time(12))
+        StockLedger.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+            created_at=timezone.make_aware(noon)
+        )
+
+    def receive(self, order_line, quantity, days_ago):
+        grn = GoodsReceiptNote.objects.create(
+            grn_number=f"GRN-{days_ago}",
+            purchase_order=order_line.purchase_order,
+            received_date=self.day(days_ago),
+            warehouse=self.warehouse,
+            status=GoodsReceiptNote.StatusChoices.APPROVED,
+        )
+        GoodsReceiptItem.objects.create(
+            grn=grn,
+            item=self.item,
+            purchase_order_item=order_line,
+            quantity=quantity,
+        )
+        self.backdate(post_grns([grn]), days_ago)
+
+    def move(self, movement_type, quantity, days_ago):
+        entry = StockLedger.objects.create(
+            item=self.item,
+            warehouse=self.warehouse,
+            movement_type=movement_type,
+            quantity=quantity,
+            reference_type="ADJUSTMENT",
+            reference_id=uuid.uuid4(),
+        )
+        self.backdate([entry], days_ago)
+
+    def valued(self, method, days_ago=0, **options):
+        return [
+            (row["quantity"], row["value"])
+            for row in value_stock(self.day(days_ago), method, **options)
+        ]
+
+    def test_fifo_and_weighted_average(self):
+        self.receive(self.cheap, 10, days_ago=5)
+        self.receive(self.dear, 10, days_ago=4)
+        self.move(StockLedger.MovementType.OUT, 15, days_ago=3)
+
+        self.assertEqual(self.valued(Method.FIFO), [(5, Decimal("600.00"))])
+        self.assertEqual(self.valued(Method.AVERAGE), [(5, Decimal("550.00"))])
+
+    def test_first_receipts_without_a_rate_take_the_purchase_rate(self):
+        self.move(StockLedger.MovementType.IN, 4, days_ago=5)
+
+        self.assertEqual(self.valued(Method.FIFO), [(4, Decimal("480.00"))])
+
+    def test_resumed_runs_match_full_runs(self):
+        self.receive(self.cheap, 10, days_ago=5)
+        self.move(StockLedger.MovementType.OUT, 10, days_ago=4)
+        self.move(StockLedger.MovementType.IN, 5, days_ago=2)
+
+        for method in (Method.FIFO, Method.AVERAGE):
+            self.assertEqual(self.valued(method, days_ago=3, save=True), [])
+            full = self.valued(method)
+            self.assertEqual(full, [(5, Decimal("500.00"))])
+            self.assertEqual(self.valued(method, incremental=True), full)
+
+
+class StockSnapshotTests(TestCase):
+    """
+    Stock on a day read from a snapshot plus the later ledger movement
+    equals the sum of the whole ledger up to that day.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.yard = Warehouse.objects.create(name="Yard", code="YARD")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+        IN, OUT = StockLedger.MovementType.IN, StockLedger.MovementType.OUT
+        self.first = self.move(self.warehouse, IN, 10, datetime.date(2026, 3, 10))
+        self.move(self.warehouse, OUT, 2, datetime.date(2026, 3, 31))
+        self.move(self.yard, IN, 3, datetime.date(2026, 3, 31))
+        self.move(self.warehouse, IN, 7, datetime.date(2026, 4, 5))
+        self.move(self.yard, OUT, 3, datetime.date(2026, 4, 30))
+        self.move(self.warehouse, OUT, 4, datetime.date(2026, 5, 20))
+        self.move(self.warehouse, IN, 1)
+
+    def move(self, warehouse, movement_type, quantity, day=None):
+        entry = StockLedger.objects.create(
+            item=self.item,
+            warehouse=warehouse,
+            movement_type=movement_type,
+            quantity=quantity,
+            reference_type="ADJUSTMENT",
+            reference_id=uuid.uuid4(),
+        )
+        if day is not None:
+            noon = datetime.datetime.combine(day, datetime.time(12))
+            StockLedger.objects.filter(pk=entry.pk).update(
+                created_at=timezone.make_aware(noon)
+            )
+        return entry
+
+    def ledger_sum(self, day):
+        movement = ledger_movement(None, period_cutoff(day))
+        return {key: quantity for key, quantity in movement.items() if quantity}
+
+    def test_snapshot_plus_deltas_equals_the_ledger(self):
+        days = [
+            datetime.date(2026, 3, 31),
+            datetime.date(2026, 4, 15),
+            datetime.date(2026, 4, 30),
+            datetime.date(2026, 5, 31),
+            timezone.localdate(),
+        ]
+        expected = {day: self.ledger_sum(day) for day in days}
+        main, yard = (self.item.pk, self.warehouse.pk), (self.item.pk, self.yard.pk)
+        self.assertEqual(expected[days[0]], {main: 8, yard: 3})
+        self.assertEqual(expected[days[-1]], {main: 12})
+
+        self.assertEqual(take_snapshot(datetime.date(2026, 3, 31)), 2)
+        self.assertEqual(take_snapshot(datetime.date(2026, 4, 30)), 1)
+        for day in days:
+            self.assertEqual(stock_as_of(day), expected[day], day)
+        self.assertEqual(stock_as_of(days[1], warehouses=[self.yard.pk]), {yard: 3})
+
+        # Later days are read from the snapshot, not the ledger before it.
+        StockLedger.objects.filter(pk=self.first.pk).delete()
+        self.assertEqual(stock_as_of(days[3]), expected[days[3]])
+
+
+class LedgerArchiveTests(TestCase):
+    """
+    Ledger history and past stock read archived fiscal years together with
+    the live ledger.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+        self.move(StockLedger.MovementType.IN, 10, datetime.date(2024, 6, 1))
+        self.move(StockLedger.MovementType.OUT, 3, datetime.date(2024, 9, 1))
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(STOCK_LEDGER_ARCHIVE_DIR=directory.name):
+            archive_fiscal_year(2024)
+        self.move(StockLedger.MovementType.IN, 5)
+
+    def move(self, movement_type, quantity, day=None):
+        entry = StockLedger.objects.create(
+            item=self.item,
+            warehouse=self.warehouse,
+            movement_type=movement_type,
+            quantity=quantity,
+            reference_type="ADJUSTMENT",
+            reference_id=uuid.uuid4(),
+        )
+        if day is not None:
+            noon = datetime.datetime.combine(day, datetime.time(12))
+            StockLedger.objects.filter(pk=entry.pk).update(
+                created_at=timezone.make_aware(noon)
+            )
+
+    def test_history_spans_the_archive_and_the_live_ledger(self):
+        rows = list(ledger_history(items=[str(self.item.pk)]))
+
+        self.assertEqual(
+            [(row["movement_type"], row["quantity"]) for row in rows],
+            [("IN", 10), ("OUT", 3), ("IN", 5)],
+        )
+        self.assertEqual(
+            len(list(ledger_history(warehouses=[self.warehouse.pk]))), 3
+        )
+        self.assertEqual(len(list(ledger_history(include_opening=True))), 4)
+
+    def test_stock_as_of_archived_and_live_days(self):
+        key = (self.item.pk, self.warehouse.pk)
+        items = [str(self.item.pk)]
+
+        self.assertEqual(stock_as_of(datetime.date(2024, 5, 31), items), {})
+        self.assertEqual(stock_as_of(datetime.date(2024, 7, 1), items), {key: 10})
+        self.assertEqual(stock_as_of(datetime.date(2025, 3, 31), items), {key: 7})
+        self.assertEqual(stock_as_of(timezone.localdate(), items), {key: 12})
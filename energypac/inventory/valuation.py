@@ -0,0 +1,342 @@
+from collections import deque
+from decimal import Decimal
+from itertools import groupby, islice
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, OuterRef, Subquery, When
+from django.utils import timezone
+
+from core.dates import period_cutoff
+from inventory.models import (
+    OPENING_BALANCE_REFERENCE,
+    GoodsReceiptItem,
+    StockLedger,
+    StockLedgerArchive,
+    StockValuationCheckpoint,
+    StockValuationLayer,
+)
+from inventory.services import GRN_REFERENCE
+from procurement.models import PurchaseOrderItem
+
+
+ZERO = Decimal("0")
+RATE_PLACES = Decimal("0.0001")
+VALUE_PLACES = Decimal("0.01")
+CHUNK_SIZE = 2000
+
+Method = StockValuationCheckpoint.Method
+
+
+def _receipt_rate():
+    """
+    Rate of the purchase order line a GRN entry received, if any.
+    """
+    return Case(
+        When(
+            reference_type=GRN_REFERENCE,
+            then=Subquery(
+                GoodsReceiptItem.objects.filter(pk=OuterRef("reference_id")).values(
+                    "purchase_order_item__rate"
+                )[:1]
+            ),
+        ),
+        default=None,
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def _purchase_rates(day):
+    """
+    Look up the rate of an item's latest purchase order line dated on or
+    before ``day``, zero if it was never ordered. Items are valued one after
+    another, so only the last lookup is kept.
+    """
+    last = {}
+
+    def rate(item_id):
+        if item_id not in last:
+            last.clear()
+            last[item_id] = (
+                PurchaseOrderItem.objects.filter(
+                    item_id=item_id, purchase_order__order_date__lte=day
+                )
+                .order_by("-purchase_order__order_date", "-created_at", "-pk")
+                .values_list("rate", flat=True)
+                .first()
+                or ZERO
+            )
+        return last[item_id]
+
+    return rate
+
+
+def stream_ledger(start, end, chunk_size=CHUNK_SIZE):
+    """
+    Yield ``(item_id, warehouse_id, movement_type, quantity, rate)`` for
+    ledger entries with ``start <= created_at < end``, ordered by item,
+    warehouse and time, fetched ``chunk_size`` rows at a time. Opening
+    balance entries are skipped; their cost comes from the checkpoint saved
+    when the fiscal year was archived.
+    """
+    entries = StockLedger.objects.filter(created_at__lt=end).exclude(
+        reference_type=OPENING_BALANCE_REFERENCE
+    )
+    if start is not None:
+        entries = entries.filter(created_at__gte=start)
+    return (
+        entries.annotate(rate=_receipt_rate())
+        .order_by("item_id", "warehouse_id", "created_at", "pk")
+        .values_list("item_id", "warehouse_id", "movement_type", "quantity", "rate")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class CostLayers:
+    """
+    Cost layers of one item in one warehouse.
+
+    Layers are ``[quantity, rate]`` pairs, oldest first. FIFO keeps one layer
+    per receipt still in stock; weighted average keeps a single layer. Issues
+    beyond the available stock leave a negative layer at the last rate.
+    Receipts without a rate are costed at the last rate, or at
+    ``fallback_rate()`` before any rate is known.
+    """
+
+    def __init__(self, method, layers=(), fallback_rate=lambda: ZERO):
+        self.method = method
+        self.layers = deque([quantity, rate] for quantity, rate in layers)
+        self.last_rate = self.layers[-1][1] if self.layers else None
+        self.fallback_rate = fallback_rate
+        if method == Method.FIFO:
+            # A checkpoint may hold an empty layer only to keep the last rate.
+            self.layers = deque(layer for layer in self.layers if layer[0])
+
+    @property
+    def quantity(self):
+        return sum((layer[0] for layer in self.layers), ZERO)
+
+    @property
+    def value(self):
+        value = sum((layer[0] * layer[1] for layer in self.layers), ZERO)
+        return value.quantize(VALUE_PLACES)
+
+    def _current_rate(self):
+        if self.last_rate is None:
+            self.last_rate = self.fallback_rate()
+        return self.last_rate
+
+    def receive(self, quantity, rate):
+        if rate is None:
+            rate = self._current_rate()
+        self.last_rate = rate
+
+        if self.method == Method.AVERAGE:
+            self._receive_average(quantity, rate)
+        elif self.layers and self.layers[-1][0] < 0:
+            # Cover a negative position before opening a new layer.
+            remaining = self.layers[-1][0] + quantity
+            if remaining <= 0:
+                self.layers[-1][0] = remaining
+            else:
+                self.layers[-1] = [remaining, rate]
+        else:
+            self.layers.append([quantity, rate])
+
+    def _receive_average(self, quantity, rate):
+        if not self.layers:
+            self.layers.append([quantity, rate])
+            return
+
+        layer = self.layers[0]
+        total = layer[0] + quantity
+        if total > 0 and layer[0] > 0:
+            value = layer[0] * layer[1] + quantity * rate
+            layer[1] = (value / total).quantize(RATE_PLACES)
+        elif total > 0:
+            layer[1] = rate
+        layer[0] = total
+
+    def issue(self, quantity):
+        while quantity > 0 and self.layers and self.layers[0][0] > 0:
+            layer = self.layers[0]
+            taken = min(layer[0], quantity)
+            layer[0] -= taken
+            quantity -= taken
+            # The single average layer is kept at zero to remember its rate.
+            if layer[0] == 0 and (self.method == Method.FIFO or len(self.layers) > 1):
+                self.layers.popleft()
+
+        if quantity > 0:
+            if self.layers and self.layers[-1][0] <= 0:
+                self.layers[-1][0] -= quantity
+            else:
+                self.layers.append([-quantity, self._current_rate()])
+
+    def apply(self, movement_type, quantity, rate):
+        if movement_type == StockLedger.MovementType.IN:
+            self.receive(quantity, rate)
+        else:
+            self.issue(quantity)
+
+    def checkpoint_layers(self):
+        """
+        Layers to save in a checkpoint. An empty position keeps one empty
+        layer at the last rate, so a resumed run costs the next receipt or
+        issue without a rate the same as an uninterrupted one.
+        """
+        layers = [layer for layer in self.layers if layer[0]]
+        if not layers and self.last_rate is not None:
+            layers = [[ZERO, self.last_rate]]
+        return layers
+
+
+def _checkpoint_layers(checkpoint, chunk_size=CHUNK_SIZE):
+    """
+    Yield ``((item_id, warehouse_id), layers)`` from a checkpoint, in the
+    order ``stream_ledger`` returns entries.
+    """
+    rows = checkpoint.layers.order_by(
+        "item_id", "warehouse_id", "sequence"
+    ).values_list("item_id", "warehouse_id", "quantity", "rate")
+    for key, layers in groupby(
+        rows.iterator(chunk_size=chunk_size), key=lambda row: row[:2]
+    ):
+        yield key, [(quantity, rate) for _, _, quantity, rate in layers]
+
+
+def starting_checkpoint(day, method, incremental):
+    """
+    Checkpoint a valuation at the end of ``day`` has to start from.
+
+    Without ``incremental`` that is the checkpoint saved at the end of the
+    last archived fiscal year, if any. With it, the latest checkpoint on or
+    before ``day`` that does not predate the archive.
+    """
+    boundary = StockLedgerArchive.objects.boundary()
+    if boundary is not None and day < boundary:
+        raise ValueError(f"Stock up to {boundary} is archived and cannot be valued.")
+
+    checkpoints = StockValuationCheckpoint.objects.filter(
+        method=method, valuation_date__lte=day
+    )
+    if not incremental:
+        if boundary is None:
+            return None
+        checkpoints = checkpoints.filter(valuation_date=boundary)
+    elif boundary is not None:
+        checkpoints = checkpoints.filter(valuation_date__gte=boundary)
+
+    checkpoint = checkpoints.order_by("-valuation_date").first()
+    if checkpoint is None and boundary is not None:
+        raise ValueError(f"No {method} valuation checkpoint at archive end {boundary}.")
+    return checkpoint
+
+
+def compute_layers(
+    day, method=Method.FIFO, incremental=False, chunk_size=CHUNK_SIZE
+):
+    """
+    Yield ``((item_id, warehouse_id), CostLayers)`` at the end of ``day``,
+    ordered by item and warehouse.
+
+    Ledger entries and checkpoint layers are streamed in chunks and merged,
+    so only the layers of one item and warehouse are held at a time. With
+    ``incremental`` the run starts from the latest saved checkpoint on or
+    before ``day`` and only replays the ledger after it. Once fiscal years
+    are archived, runs never start before the checkpoint at the archive end.
+    """
+    seeds = iter(())
+    start = None
+    checkpoint = starting_checkpoint(day, method, incremental)
+    if checkpoint is not None:
+        seeds = _checkpoint_layers(checkpoint, chunk_size)
+        start = period_cutoff(checkpoint.valuation_date)
+    purchase_rate = _purchase_rates(day)
+
+    def cost_layers(key, layers=()):
+        return CostLayers(method, layers, lambda: purchase_rate(key[0]))
+
+    seed = next(seeds, None)
+    entries = stream_ledger(start, period_cutoff(day), chunk_size)
+    for key, rows in groupby(entries, key=lambda row: row[:2]):
+        while seed is not None and seed[0] < key:
+            yield seed[0], cost_layers(*seed)
+            seed = next(seeds, None)
+        if seed is not None and seed[0] == key:
+            current = cost_layers(*seed)
+            seed = next(seeds, None)
+        else:
+            current = cost_layers(key)
+        for _, _, movement_type, quantity, rate in rows:
+            current.apply(movement_type, quantity, rate)
+        yield key, current
+
+    while seed is not None:
+        yield seed[0], cost_layers(*seed)
+        seed = next(seeds, None)
+
+
+def value_stock(day, method=Method.FIFO, incremental=False, save=False):
+    """
+    Closing quantity and value per item and warehouse at the end of ``day``.
+
+    Returns a list of ``{"item_id", "warehouse_id", "quantity", "value"}``
+    dicts. With ``save`` the resulting layers are stored as the checkpoint
+    for ``day`` so later incremental runs can resume from it; only closed
+    days can be saved, as entries posted later on ``day`` would be lost.
+    """
+    if save and day >= timezone.localdate():
+        raise ValueError("Valuation checkpoints can only be saved for past days.")
+
+    rows = []
+
+    def valued(closing):
+        for (item_id, warehouse_id), layers in closing:
+            if layers.quantity:
+                rows.append(
+                    {
+                        "item_id": item_id,
+                        "warehouse_id": warehouse_id,
+                        "quantity": layers.quantity,
+                        "value": layers.value,
+                    }
+                )
+            yield (item_id, warehouse_id), layers
+
+    closing = valued(compute_layers(day, method, incremental))
+    if save:
+        save_checkpoint(day, method, closing)
+    else:
+        deque(closing, maxlen=0)
+    return rows
+
+
+def save_checkpoint(day, method, closing):
+    """
+    Store ``closing``, an iterable of ``(key, CostLayers)``, as the
+    checkpoint for ``day``, inserting ``CHUNK_SIZE`` layers at a time.
+    """
+    with transaction.atomic():
+        StockValuationCheckpoint.objects.filter(
+            method=method, valuation_date=day
+        ).delete()
+        checkpoint = StockValuationCheckpoint.objects.create(
+            method=method, valuation_date=day
+        )
+        layers = (
+            StockValuationLayer(
+                checkpoint=checkpoint,
+                item_id=item_id,
+                warehouse_id=warehouse_id,
+                sequence=sequence,
+                quantity=quantity,
+                rate=rate,
+            )
+            for (item_id, warehouse_id), cost_layers in closing
+            for sequence, (quantity, rate) in enumerate(
+                cost_layers.checkpoint_layers()
+            )
+        )
+        while batch := list(islice(layers, CHUNK_SIZE)):
+            StockValuationLayer.objects.bulk_create(batch)
+    return checkpoint
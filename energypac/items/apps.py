@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ItemsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'items'
+
+    def ready(self):
+        from items import pricing
+
+        pricing.connect_signals()
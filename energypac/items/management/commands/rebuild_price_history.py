@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from items.models import PriceHistory
+from items.pricing import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the price history from quotation, order, invoice and PO lines."
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt price history: {PriceHistory.objects.count()} row(s)."
+            )
+        )
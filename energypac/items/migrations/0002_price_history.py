@@ -0,0 +1,103 @@
+# Generated by Django 5.2 on 2026-10-18 11:38
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+# Source line model -> (source type, document field, date field, party field)
+SOURCES = {
+    ('sales', 'SalesQuotationItem'): (
+        'SQ', 'quotation', 'quotation_date', 'customer'
+    ),
+    ('sales', 'SalesOrderItem'): ('SO', 'order', 'order_date', 'customer'),
+    ('sales', 'SalesInvoiceItem'): ('INV', 'invoice', 'invoice_date', 'customer'),
+    ('procurement', 'PurchaseOrderItem'): (
+        'PO', 'purchase_order', 'order_date', 'vendor'
+    ),
+}
+
+BATCH_SIZE = 1000
+
+
+def populate_price_history(apps, schema_editor):
+    PriceHistory = apps.get_model('items', 'PriceHistory')
+    for (app_label, model_name), source in SOURCES.items():
+        source_type, document, date_field, party = source
+        lines = (
+            apps.get_model(app_label, model_name)
+            .objects.filter(
+                **{
+                    f'{document}__{party}__isnull': False,
+                    f'{document}__is_active': True,
+                }
+            )
+            .exclude(**{f'{document}__status': 'REJECTED'})
+            .values_list(
+                'pk',
+                'item_id',
+                'rate',
+                'quantity',
+                f'{document}__{date_field}',
+                f'{document}__{party}_id',
+            )
+        )
+        side = 'SALES' if party == 'customer' else 'PURCHASE'
+        rows = []
+        for line_id, item_id, rate, quantity, day, party_id in lines.iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            rows.append(
+                PriceHistory(
+                    side=side,
+                    item_id=item_id,
+                    price_date=day,
+                    rate=rate,
+                    quantity=quantity,
+                    source_type=source_type,
+                    source_line_id=line_id,
+                    **{f'{party}_id': party_id},
+                )
+            )
+            if len(rows) == BATCH_SIZE:
+                PriceHistory.objects.bulk_create(rows)
+                rows = []
+        PriceHistory.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0001_initial'),
+        ('masters', '0003_customer_credit_limit'),
+        ('procurement', '0004_document_totals'),
+        ('sales', '0005_salesinvoice_outstanding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('side', models.CharField(choices=[('SALES', 'Sales'), ('PURCHASE', 'Purchase')], max_length=10)),
+                ('price_date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('source_type', models.CharField(help_text='Document type of the source line (SQ, SO, INV, PO)', max_length=10)),
+                ('source_line_id', models.UUIDField()),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='masters.customer')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='items.item')),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='masters.vendor')),
+            ],
+            options={
+                'verbose_name': 'Price History',
+                'verbose_name_plural': 'Price History',
+                'db_table': 'item_price_history',
+                'indexes': [models.Index(fields=['customer', 'item', 'price_date'], name='price_customer_item_idx'), models.Index(fields=['vendor', 'item', 'price_date'], name='price_vendor_item_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source_type', 'source_line_id'), name='uniq_price_history_source_line')],
+            },
+        ),
+        migrations.RunPython(populate_price_history, migrations.RunPython.noop),
+    ]
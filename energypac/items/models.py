@@ -1,7 +1,7 @@
 from django.db import models
 
 from core.models import UUIDModel, TimeStampedModel, StatusModel
-from masters.models import UnitOfMeasure
+from masters.models import Customer, UnitOfMeasure, Vendor
 
 
 class ItemType(models.TextChoices):
@@ -52,3 +52,76 @@ class Item(UUIDModel, TimeStampedModel, StatusModel):
 
     def __str__(self):
         return f"{self.code} - {self.name}"
+
+
+class PriceHistory(UUIDModel, TimeStampedModel):
+    """
+    Price history.
+    One row per priced sales or purchase document line, kept in step with
+    the lines for fast last-price lookups per customer/vendor and item.
+    """
+
+    class Side(models.TextChoices):
+        SALES = "SALES", "Sales"
+        PURCHASE = "PURCHASE", "Purchase"
+
+    side = models.CharField(max_length=10, choices=Side.choices)
+
+    customer = models.ForeignKey(
+        Customer,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="price_history"
+    )
+
+    vendor = models.ForeignKey(
+        Vendor,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="price_history"
+    )
+
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="price_history"
+    )
+
+    price_date = models.DateField()
+
+    rate = models.DecimalField(max_digits=12, decimal_places=2)
+
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)
+
+    source_type = models.CharField(
+        max_length=10,
+        help_text="Document type of the source line (SQ, SO, INV, PO)"
+    )
+
+    source_line_id = models.UUIDField()
+
+    class Meta:
+        db_table = "item_price_history"
+        verbose_name = "Price History"
+        verbose_name_plural = "Price History"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source_type", "source_line_id"],
+                name="uniq_price_history_source_line",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["customer", "item", "price_date"],
+                name="price_customer_item_idx",
+            ),
+            models.Index(
+                fields=["vendor", "item", "price_date"],
+                name="price_vendor_item_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.item.code} @ {self.rate} on {self.price_date}"
@@ -0,0 +1,222 @@
+"""
+Price history per customer/vendor and item.
+
+``PriceHistory`` holds one row per priced document line, copied from
+quotation, sales order, invoice and purchase order lines whenever they or
+their documents are saved. Lookups then read the (party, item, date)
+indexes instead of sorting the line tables joined to their headers.
+"""
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Avg, Max, Min, OuterRef, Subquery
+from django.db.models.signals import post_delete, post_save
+
+from core.models import StatusModel
+from core.signals import post_bulk_write
+from items.models import PriceHistory
+
+
+# Source line model -> (source type, document field, date field, party field)
+SOURCES = {
+    "sales.SalesQuotationItem": ("SQ", "quotation", "quotation_date", "customer"),
+    "sales.SalesOrderItem": ("SO", "order", "order_date", "customer"),
+    "sales.SalesInvoiceItem": ("INV", "invoice", "invoice_date", "customer"),
+    "procurement.PurchaseOrderItem": (
+        "PO",
+        "purchase_order",
+        "order_date",
+        "vendor",
+    ),
+}
+
+# Line fields copied into the price history.
+HISTORY_FIELDS = {"item", "rate", "quantity"}
+
+SYNC_BATCH_SIZE = 1000
+
+
+def _history_rows(line_model, source, line_ids):
+    source_type, document, date_field, party = source
+    lines = line_model.objects.filter(
+        **{f"{document}__{party}__isnull": False, f"{document}__is_active": True}
+    ).exclude(**{f"{document}__status": StatusModel.StatusChoices.REJECTED})
+    if line_ids is not None:
+        lines = lines.filter(pk__in=line_ids)
+
+    side = "SALES" if party == "customer" else "PURCHASE"
+    for line_id, item_id, rate, quantity, day, party_id in lines.values_list(
+        "pk",
+        "item_id",
+        "rate",
+        "quantity",
+        f"{document}__{date_field}",
+        f"{document}__{party}_id",
+    ).iterator(chunk_size=SYNC_BATCH_SIZE):
+        yield PriceHistory(
+            side=side,
+            item_id=item_id,
+            price_date=day,
+            rate=rate,
+            quantity=quantity,
+            source_type=source_type,
+            source_line_id=line_id,
+            **{f"{party}_id": party_id},
+        )
+
+
+def _upsert(rows):
+    if rows:
+        PriceHistory.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["source_type", "source_line_id"],
+            update_fields=[
+                "customer",
+                "vendor",
+                "item",
+                "price_date",
+                "rate",
+                "quantity",
+                "updated_at",
+            ],
+        )
+
+
+def sync_lines(label, line_ids=None):
+    """
+    Bring the price history of ``label`` lines (all of them when
+    ``line_ids`` is ``None``) in line with the lines: rows are upserted for
+    priced lines and removed for lines that are gone or no longer count.
+    """
+    line_model = apps.get_model(label)
+    source = SOURCES[label]
+    if line_ids is not None:
+        line_ids = list({pk for pk in line_ids if pk is not None})
+        if not line_ids:
+            return
+
+    with transaction.atomic():
+        history = PriceHistory.objects.filter(source_type=source[0])
+        rows = _history_rows(line_model, source, line_ids)
+        if line_ids is None:
+            history.delete()
+        else:
+            rows = list(rows)
+            history.filter(source_line_id__in=line_ids).exclude(
+                source_line_id__in=[row.source_line_id for row in rows]
+            ).delete()
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == SYNC_BATCH_SIZE:
+                _upsert(batch)
+                batch = []
+        _upsert(batch)
+
+
+def sync_documents(label, document_ids):
+    """
+    Resync the price history of every line of the given documents.
+    """
+    line_model = apps.get_model(label)
+    document = SOURCES[label][1]
+    lines = line_model.objects.filter(**{f"{document}_id__in": document_ids})
+    sync_lines(label, lines.values_list("pk", flat=True))
+
+
+def rebuild():
+    """
+    Rebuild the whole price history from the document lines.
+    """
+    for label in SOURCES:
+        sync_lines(label)
+
+
+def price_summary(items, customer=None, vendor=None, since=None):
+    """
+    Last, minimum, maximum and average rate of each item for one customer
+    or vendor, keyed by item id, in a single query.
+
+    ``items`` may be instances or ids and ``since`` limits the history to
+    prices on or after a date. Items never priced for the party are missing
+    from the result.
+    """
+    if (customer is None) == (vendor is None):
+        raise ValueError("Pass exactly one of customer or vendor.")
+
+    if customer is not None:
+        history = PriceHistory.objects.filter(customer=customer)
+    else:
+        history = PriceHistory.objects.filter(vendor=vendor)
+    if since is not None:
+        history = history.filter(price_date__gte=since)
+
+    latest = history.filter(item=OuterRef("item")).order_by(
+        "-price_date", "-created_at"
+    )
+    rows = (
+        history.filter(item__in=[getattr(item, "pk", item) for item in items])
+        .order_by()
+        .values("item_id")
+        .annotate(
+            last_rate=Subquery(latest.values("rate")[:1]),
+            last_date=Max("price_date"),
+            min_rate=Min("rate"),
+            max_rate=Max("rate"),
+            avg_rate=Avg("rate"),
+        )
+    )
+    return {row.pop("item_id"): row for row in rows}
+
+
+def _watched(fields):
+    # update_fields may name foreign keys by field name or attname.
+    return frozenset(fields).union(f"{field}_id" for field in fields)
+
+
+def _writes(fields, watched):
+    """
+    Whether a save or bulk write of ``fields`` (``None`` for every field)
+    can change the price history.
+    """
+    return fields is None or not watched.isdisjoint(fields)
+
+
+def connect_signals():
+    """
+    Keep the price history in step with its source lines and documents.
+    Called from ``ItemsConfig.ready()``.
+    """
+    for label, (_, document, date_field, party) in SOURCES.items():
+        line_model = apps.get_model(label)
+        document_model = line_model._meta.get_field(document).related_model
+        line_fields = _watched(HISTORY_FIELDS.union([document]))
+        document_fields = _watched({date_field, party, "status", "is_active"})
+
+        def on_line(sender, instance, label=label, watched=line_fields, **kwargs):
+            if _writes(kwargs.get("update_fields"), watched):
+                sync_lines(label, [instance.pk])
+
+        def on_bulk(
+            sender, instances, fields, label=label, watched=line_fields, **kwargs
+        ):
+            if _writes(fields, watched):
+                sync_lines(label, [instance.pk for instance in instances])
+
+        def on_document(
+            sender, instance, label=label, watched=document_fields, **kwargs
+        ):
+            if _writes(kwargs.get("update_fields"), watched):
+                sync_documents(label, [instance.pk])
+
+        uid = f"price_history:{label}"
+        post_save.connect(on_line, sender=line_model, weak=False, dispatch_uid=uid)
+        post_delete.connect(on_line, sender=line_model, weak=False, dispatch_uid=uid)
+        post_bulk_write.connect(
+            on_bulk, sender=line_model, weak=False, dispatch_uid=uid
+        )
+        post_save.connect(
+            on_document, sender=document_model, weak=False, dispatch_uid=uid
+        )
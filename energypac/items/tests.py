@@ -1,3 +1,121 @@
+import datetime
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from items.models import Item, ItemType, PriceHistory
+from items.pricing import price_summary, rebuild, sync_lines
+from masters.models import UnitOfMeasure, Vendor
+from procurement.models import PurchaseOrder, PurchaseOrderItem
+
+
+PO_LINES = "procurement.PurchaseOrderItem"
+
+
+class PriceHistoryTests(TestCase):
+    """
+    Price history follows the priced lines and their documents, and price
+    summaries are read from it per party and item.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.vendor = Vendor.objects.create(name="Bharat Cables", code="BCL")
+        self.items = [
+            Item.objects.create(
+                code=f"CABLE-{n}",
+                name=f"Cable {n}",
+                item_type=ItemType.RAW_MATERIAL,
+                uom=uom,
+            )
+            for n in range(2)
+        ]
+        self.first = self.create_order("PO-1", datetime.date(2026, 4, 1), 100)
+        self.second = self.create_order("PO-2", datetime.date(2026, 5, 1), 120)
+
+    def create_order(self, number, order_date, rate):
+        order = PurchaseOrder.objects.create(
+            po_number=number, vendor=self.vendor, order_date=order_date
+        )
+        PurchaseOrderItem.objects.create(
+            purchase_order=order, item=self.items[0], quantity=10, rate=rate
+        )
+        return order
+
+    def history(self):
+        return sorted(
+            PriceHistory.objects.filter(vendor=self.vendor).values_list(
+                "price_date", "rate"
+            )
+        )
+
+    def test_history_follows_lines_and_documents(self):
+        line = self.second.items.get()
+        line.rate = 110
+        line.save()
+        self.assertEqual(
+            self.history(),
+            [(datetime.date(2026, 4, 1), 100), (datetime.date(2026, 5, 1), 110)],
+        )
+
+        self.first.order_date = datetime.date(2026, 3, 1)
+        self.first.save()
+        self.second.status = PurchaseOrder.StatusChoices.REJECTED
+        self.second.save()
+        self.assertEqual(self.history(), [(datetime.date(2026, 3, 1), 100)])
+
+        self.first.items.get().delete()
+        self.assertEqual(self.history(), [])
+
+    def test_saves_of_other_fields_skip_the_sync(self):
+        line = self.first.items.get()
+        PriceHistory.objects.update(rate=1)
+
+        line.save(update_fields=["received_quantity"])
+        self.first.save(update_fields=["remarks"])
+        PurchaseOrderItem.objects.bulk_update([line], ["received_quantity"])
+        self.assertEqual(PriceHistory.objects.get(source_line_id=line.pk).rate, 1)
+
+        line.save(update_fields=["rate"])
+        self.assertEqual(PriceHistory.objects.get(source_line_id=line.pk).rate, 100)
+
+    def test_sync_lines_repairs_the_history(self):
+        lines = list(PurchaseOrderItem.objects.order_by("rate"))
+        PriceHistory.objects.update(rate=1)
+        PriceHistory.objects.filter(source_line_id=lines[1].pk).delete()
+
+        sync_lines(PO_LINES, [lines[1].pk, None])
+        self.assertEqual(
+            self.history(),
+            [(datetime.date(2026, 4, 1), 1), (datetime.date(2026, 5, 1), 120)],
+        )
+        PurchaseOrder.objects.filter(pk=self.second.pk).update(is_active=False)
+        sync_lines(PO_LINES)
+        self.assertEqual(self.history(), [(datetime.date(2026, 4, 1), 100)])
+
+        PriceHistory.objects.all().delete()
+        rebuild()
+        self.assertEqual(self.history(), [(datetime.date(2026, 4, 1), 100)])
+
+    def test_price_summary(self):
+        self.create_order("PO-3", datetime.date(2026, 4, 15), 95)
+
+        summary = price_summary(self.items, vendor=self.vendor)
+        self.assertEqual(list(summary), [self.items[0].pk])
+        self.assertEqual(
+            summary[self.items[0].pk],
+            {
+                "last_rate": Decimal("120"),
+                "last_date": datetime.date(2026, 5, 1),
+                "min_rate": Decimal("95"),
+                "max_rate": Decimal("120"),
+                "avg_rate": Decimal("105"),
+            },
+        )
+
+        since = price_summary(
+            [self.items[0].pk], vendor=self.vendor, since=datetime.date(2026, 4, 10)
+        )
+        self.assertEqual(since[self.items[0].pk]["min_rate"], Decimal("95"))
+        with self.assertRaises(ValueError):
+            price_summary(self.items)
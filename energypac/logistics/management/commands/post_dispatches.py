@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from logistics.models import Dispatch
+from logistics.services import post_dispatches
+
+
+class Command(BaseCommand):
+    help = "Post approved dispatches to the stock ledger in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "dispatch_numbers", nargs="*", help="Dispatch numbers to post."
+        )
+        parser.add_argument(
+            "--all-approved",
+            action="store_true",
+            help="Post every approved dispatch.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of dispatches posted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        dispatches = Dispatch.objects.filter(status=Dispatch.StatusChoices.APPROVED)
+        if options["dispatch_numbers"]:
+            dispatches = dispatches.filter(
+                dispatch_number__in=options["dispatch_numbers"]
+            )
+        elif not options["all_approved"]:
+            raise CommandError("Pass dispatch numbers or --all-approved.")
+
+        dispatch_ids = list(
+            dispatches.order_by("dispatch_date", "dispatch_number").values_list(
+                "pk", flat=True
+            )
+        )
+        batch_size = options["batch_size"]
+
+        posted = 0
+        shortages = []
+        for start in range(0, len(dispatch_ids), batch_size):
+            entries, short = post_dispatches(dispatch_ids[start:start + batch_size])
+            posted += len(entries)
+            shortages.extend(short)
+
+        for shortage in shortages:
+            self.stdout.write(
+                f"{shortage['dispatch_number']}: item {shortage['item_id']} "
+                f"requested {shortage['requested']}, "
+                f"available {shortage['available']}"
+            )
+        message = (
+            f"Posted {posted} ledger entry(ies) from {len(dispatch_ids)} "
+            f"dispatch(es); {len(shortages)} line(s) short."
+        )
+        style = self.style.WARNING if shortages else self.style.SUCCESS
+        self.stdout.write(style(message))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-18 12:04
+
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef, Subquery
+
+
+def populate_posted_at(apps, schema_editor):
+    # Dispatches whose lines have DISPATCH entries are posted, whether the
+    # entries are in the ledger or in the archive of a fiscal year.
+    from inventory.archive import ArchiveReader
+
+    Dispatch = apps.get_model('logistics', 'Dispatch')
+    DispatchItem = apps.get_model('logistics', 'DispatchItem')
+    StockLedger = apps.get_model('inventory', 'StockLedger')
+    StockLedgerArchive = apps.get_model('inventory', 'StockLedgerArchive')
+
+    posted = Exists(
+        StockLedger.objects.filter(
+            reference_type='DISPATCH',
+            reference_id__in=Subquery(
+                DispatchItem.objects.filter(
+                    dispatch_id=OuterRef(OuterRef('pk'))
+                ).values('pk')
+            ),
+        )
+    )
+    Dispatch.objects.filter(posted).update(posted_at=F('updated_at'))
+
+    archived = []
+    for archive in StockLedgerArchive.objects.order_by('start_date'):
+        with ArchiveReader(archive.file_path) as reader:
+            archived.extend(
+                reference_id
+                for reference_type, reference_id in reader.scan(
+                    ('reference_type', 'reference_id')
+                )
+                if reference_type == 'DISPATCH'
+            )
+    for start in range(0, len(archived), 500):
+        Dispatch.objects.filter(
+            posted_at__isnull=True,
+            items__in=archived[start:start + 500],
+        ).update(posted_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_goodsreceiptitem_posted_at'),
+        ('logistics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispatch',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, help_text='When the dispatch was posted to the stock ledger', null=True),
+        ),
+        migrations.RunPython(populate_posted_at, migrations.RunPython.noop),
+    ]
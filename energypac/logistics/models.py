@@ -1,6 +1,6 @@
 from django.db import models
 
-from core.models import UUIDModel, TimeStampedModel, StatusModel
+from core.models import BulkSignalQuerySet, UUIDModel, TimeStampedModel, StatusModel
 from items.models import Item
 from masters.models import Warehouse
 from sales.models import SalesOrder, SalesInvoice
@@ -43,6 +43,12 @@ class Dispatch(UUIDModel, TimeStampedModel, StatusModel):
 
     remarks = models.TextField(blank=True)
 
+    posted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the dispatch was posted to the stock ledger"
+    )
+
     class Meta:
         db_table = "dispatches"
         verbose_name = "Dispatch"
@@ -74,6 +80,8 @@ class DispatchItem(UUIDModel, TimeStampedModel):
         decimal_places=3
     )
 
+    objects = BulkSignalQuerySet.as_manager()
+
     class Meta:
         db_table = "dispatch_items"
         verbose_name = "Dispatch Item"
@@ -0,0 +1,227 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.numbering import DocumentType
+from core.rollups import lock_rows
+from inventory.models import StockBalance, StockLedger
+from inventory.reservations import consume_reservations, lock_reservations
+from logistics.models import Dispatch, DispatchItem
+from sales.models import SalesInvoice
+from sales.services import ORDER_RESERVATION_REFERENCE, convert_documents
+
+
+def convert_invoices_to_dispatches(
+    invoices, warehouse, dispatch_date=None, quantities=None
+):
+    """
+    Dispatch invoiced goods from ``warehouse``, one dispatch per invoice.
+    Each dispatch also points at the invoice's sales order.
+    """
+    dispatch_date = dispatch_date or timezone.localdate()
+    return convert_documents(
+        invoices,
+        SalesInvoice,
+        Dispatch,
+        link_field="invoice",
+        number_field="dispatch_number",
+        document_type=DocumentType.DISPATCH,
+        day=dispatch_date,
+        header=lambda invoice: {
+            "order_id": invoice.order_id,
+            "warehouse": warehouse,
+            "dispatch_date": dispatch_date,
+        },
+        line_values=lambda line, quantity: {
+            "item_id": line.item_id,
+            "quantity": quantity,
+        },
+        quantities=quantities,
+    )
+
+
+DISPATCH_REFERENCE = "DISPATCH"
+
+ZERO = Decimal("0")
+
+
+def _pks(objects):
+    return [getattr(obj, "pk", obj) for obj in objects]
+
+
+def post_dispatches(dispatches):
+    """
+    Post approved dispatches to the stock ledger.
+
+    ``dispatches`` may be instances or primary keys. Every line of a
+    dispatch not posted yet becomes one OUT entry with
+    ``reference_type="DISPATCH"`` and ``reference_id`` set to the dispatch
+    line, and the dispatch is stamped ``posted_at``, so posting can safely
+    be repeated, also after the entries were archived.
+
+    The stock balances of all affected (item, warehouse) pairs are locked in
+    one query and availability is checked in memory, dispatches in date
+    order: a line may take stock nobody has reserved, plus what is reserved
+    for its dispatch or for the sales order the dispatch fulfils, and those
+    reservations are consumed. A dispatch is posted whole or not at all:
+    when any of its lines is short, none of them are posted and the short
+    lines are reported instead. All entries are written with one
+    ``bulk_create``.
+
+    Returns ``(entries, shortages)``: the ledger entries created and a list
+    of ``{"dispatch_id", "dispatch_number", "line_id", "item_id",
+    "warehouse_id", "requested", "available"}`` dicts.
+    """
+    with transaction.atomic():
+        # Lock the dispatches so two posting runs cannot both post them.
+        dispatch_ids = list(
+            Dispatch.objects.select_for_update()
+            .filter(
+                pk__in=_pks(dispatches),
+                status=Dispatch.StatusChoices.APPROVED,
+                posted_at__isnull=True,
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        if not dispatch_ids:
+            return [], []
+
+        lines = list(
+            DispatchItem.objects.filter(dispatch_id__in=dispatch_ids, quantity__gt=0)
+            .order_by(
+                "dispatch__dispatch_date",
+                "dispatch__dispatch_number",
+                "created_at",
+                "pk",
+            )
+            .values_list(
+                "pk",
+                "item_id",
+                "quantity",
+                "dispatch_id",
+                "dispatch__dispatch_number",
+                "dispatch__warehouse_id",
+                "dispatch__order_id",
+            )
+        )
+        # Dispatches take stock in date order; ones without lines come last.
+        by_dispatch = {}
+        for line in lines:
+            by_dispatch.setdefault(line[3], []).append(line)
+        for dispatch_id in dispatch_ids:
+            by_dispatch.setdefault(dispatch_id, [])
+
+        # Reservations are locked before balances, as in issue_stock.
+        references = {(DISPATCH_REFERENCE, pk) for pk in dispatch_ids} | {
+            (ORDER_RESERVATION_REFERENCE, line[6]) for line in lines if line[6]
+        }
+        reservations = lock_reservations(references)
+        reserved = {}
+        for reservation in reservations:
+            pool = (
+                reservation.reference_type,
+                reservation.reference_id,
+                reservation.item_id,
+                reservation.warehouse_id,
+            )
+            reserved[pool] = reserved.get(pool, ZERO) + reservation.quantity
+        initially_reserved = dict(reserved)
+
+        balances = lock_rows(
+            StockBalance,
+            ("item_id", "warehouse_id"),
+            {(line[1], line[5]) for line in lines},
+        )
+        free = {
+            key: balance.quantity - balance.reserved_quantity
+            for key, balance in balances.items()
+        }
+
+        entries = []
+        shortages = []
+        posted = []
+        for dispatch_id, dispatch_lines in by_dispatch.items():
+            dispatch_free = {}
+            dispatch_reserved = {}
+            short = []
+            for line_id, item_id, quantity, _, number, warehouse_id, order_id in (
+                dispatch_lines
+            ):
+                key = (item_id, warehouse_id)
+                pools = [(DISPATCH_REFERENCE, dispatch_id) + key]
+                if order_id:
+                    pools.append((ORDER_RESERVATION_REFERENCE, order_id) + key)
+                free_left = dispatch_free.get(key, free.get(key, ZERO))
+                own = [
+                    dispatch_reserved.get(pool, reserved.get(pool, ZERO))
+                    for pool in pools
+                ]
+                if quantity > free_left + sum(own):
+                    short.append(
+                        {
+                            "dispatch_id": dispatch_id,
+                            "dispatch_number": number,
+                            "line_id": line_id,
+                            "item_id": item_id,
+                            "warehouse_id": warehouse_id,
+                            "requested": quantity,
+                            "available": free_left + sum(own),
+                        }
+                    )
+                    continue
+                needed = quantity
+                for pool, left in zip(pools, own):
+                    taken = min(left, needed)
+                    dispatch_reserved[pool] = left - taken
+                    needed -= taken
+                dispatch_free[key] = free_left - needed
+            if short:
+                shortages.extend(short)
+                continue
+
+            free.update(dispatch_free)
+            reserved.update(dispatch_reserved)
+            posted.append(dispatch_id)
+            entries.extend(
+                StockLedger(
+                    item_id=item_id,
+                    warehouse_id=warehouse_id,
+                    movement_type=StockLedger.MovementType.OUT,
+                    quantity=quantity,
+                    reference_type=DISPATCH_REFERENCE,
+                    reference_id=line_id,
+                    remarks=number,
+                )
+                for line_id, item_id, quantity, _, number, warehouse_id, _ in (
+                    dispatch_lines
+                )
+            )
+
+        consumed = {
+            pool: quantity - reserved[pool]
+            for pool, quantity in initially_reserved.items()
+            if reserved[pool] != quantity
+        }
+        now = timezone.now()
+        consume_reservations(reservations, consumed, now)
+
+        # Issued stock always comes from locked balances, so they are
+        # updated here rather than locked again by the ledger insert.
+        changed = set()
+        for entry in entries:
+            key = (entry.item_id, entry.warehouse_id)
+            balances[key].quantity -= entry.quantity
+            changed.add(key)
+        for (_, _, item_id, warehouse_id), quantity in consumed.items():
+            balances[(item_id, warehouse_id)].reserved_quantity -= quantity
+        for key in changed:
+            balances[key].updated_at = now
+        StockBalance.objects.bulk_update(
+            [balances[key] for key in changed],
+            ["quantity", "reserved_quantity", "updated_at"],
+        )
+        entries = StockLedger.objects.bulk_create(entries, update_balances=False)
+        Dispatch.objects.filter(pk__in=posted).update(posted_at=now)
+        return entries, shortages
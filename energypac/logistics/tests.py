@@ -1,3 +1,217 @@
-from django.test import TestCase
+import datetime
+import tempfile
+import uuid
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inventory.archive import archive_fiscal_year
+from inventory.models import StockBalance, StockLedger, StockReservation
+from inventory.reservations import reserve_stock
+from items.models import Item, ItemType
+from logistics.models import Dispatch, DispatchItem
+from logistics.services import convert_invoices_to_dispatches, post_dispatches
+from masters.models import Customer, UnitOfMeasure, Warehouse
+from sales.models import SalesInvoice, SalesInvoiceItem, SalesOrder
+
+
+class DispatchPostingTests(TestCase):
+    """
+    Posting dispatches issues their stock exactly once.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.item = Item.objects.create(
+            code="TRANSFORMER-1",
+            name="Transformer",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+        StockLedger.objects.create(
+            item=self.item,
+            warehouse=self.warehouse,
+            movement_type=StockLedger.MovementType.IN,
+            quantity=Decimal("10"),
+            reference_type="ADJUSTMENT",
+            reference_id=uuid.uuid4(),
+        )
+
+    def create_dispatch(self, number, quantity, order=None):
+        dispatch = Dispatch.objects.create(
+            dispatch_number=number,
+            order=order,
+            dispatch_date=datetime.date(2024, 6, 1),
+            warehouse=self.warehouse,
+            status=Dispatch.StatusChoices.APPROVED,
+        )
+        DispatchItem.objects.create(
+            dispatch=dispatch, item=self.item, quantity=quantity
+        )
+        return dispatch
+
+    def on_hand(self):
+        return StockBalance.objects.on_hand(self.item, self.warehouse)
+
+    def test_dispatches_consume_their_own_reservations(self):
+        dispatch = self.create_dispatch("DSP-1", Decimal("8"))
+        reserve_stock([(self.item, self.warehouse, 8)], "DISPATCH", dispatch.pk)
+
+        entries, shortages = post_dispatches([dispatch])
+        self.assertEqual(shortages, [])
+        self.assertEqual(entries[0].quantity, 8)
+        balance = StockBalance.objects.get(item=self.item, warehouse=self.warehouse)
+        self.assertEqual((balance.quantity, balance.reserved_quantity), (2, 0))
+        self.assertEqual(
+            StockReservation.objects.get().reservation_status,
+            StockReservation.ReservationStatus.ISSUED,
+        )
+
+    def test_dispatches_consume_the_reservations_of_their_order(self):
+        customer = Customer.objects.create(name="Acme Power", code="ACME")
+        order = SalesOrder.objects.create(
+            order_number="SO-1",
+            customer=customer,
+            order_date=datetime.date(2024, 5, 1),
+        )
+        reserve_stock([(self.item, self.warehouse, 8)], "SALES_ORDER", order.pk)
+        fulfilling = self.create_dispatch("DSP-1", Decimal("5"), order=order)
+        other = self.create_dispatch("DSP-2", Decimal("4"))
+
+        entries, shortages = post_dispatches([fulfilling, other])
+        self.assertEqual([entry.quantity for entry in entries], [5])
+        self.assertEqual(
+            [(short["dispatch_number"], short["available"]) for short in shortages],
+            [("DSP-2", 2)],
+        )
+        balance = StockBalance.objects.get(item=self.item, warehouse=self.warehouse)
+        self.assertEqual((balance.quantity, balance.reserved_quantity), (5, 3))
+        reservation = StockReservation.objects.get()
+        self.assertEqual(reservation.quantity, 3)
+        self.assertEqual(
+            reservation.reservation_status, StockReservation.ReservationStatus.ACTIVE
+        )
+
+    def test_short_dispatches_are_reported_per_line_and_not_posted(self):
+        first = self.create_dispatch("DSP-1", Decimal("6"))
+        second = self.create_dispatch("DSP-2", Decimal("3"))
+        line = DispatchItem.objects.create(
+            dispatch=second, item=self.item, quantity=Decimal("3")
+        )
+
+        entries, shortages = post_dispatches([first, second])
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(
+            [
+                (shortage["line_id"], shortage["requested"], shortage["available"])
+                for shortage in shortages
+            ],
+            [(line.pk, 3, 1)],
+        )
+        self.assertEqual(self.on_hand(), 4)
+        second.refresh_from_db()
+        self.assertIsNone(second.posted_at)
+
+    def test_posting_runs_a_fixed_number_of_queries(self):
+        def post(count, prefix):
+            dispatches = [
+                self.create_dispatch(f"{prefix}-{index}", Decimal("1"))
+                for index in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                entries, shortages = post_dispatches(dispatches)
+            self.assertEqual((len(entries), shortages), (count, []))
+            return len(queries)
+
+        self.assertEqual(post(1, "DSP-A"), post(5, "DSP-B"))
+
+    def test_archived_dispatches_are_not_posted_again(self):
+        dispatch = self.create_dispatch("DSP-1", Decimal("4"))
+        entries, shortages = post_dispatches([dispatch])
+        self.assertEqual((len(entries), shortages), (1, []))
+        StockLedger.objects.update(
+            created_at=timezone.make_aware(datetime.datetime(2024, 6, 1, 12))
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(STOCK_LEDGER_ARCHIVE_DIR=directory):
+                archive_fiscal_year(2024)
+
+        self.assertEqual(post_dispatches([dispatch]), ([], []))
+        self.assertEqual(self.on_hand(), 6)
+
+
+class DispatchConversionTests(TestCase):
+    """
+    Invoices are dispatched in part or in full, never beyond what they
+    invoice, and the dispatches follow the invoice's sales order.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.item = Item.objects.create(
+            code="TRANSFORMER-1",
+            name="Transformer",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+        customer = Customer.objects.create(name="Acme Power", code="ACME")
+        self.order = SalesOrder.objects.create(
+            order_number="SO-1",
+            customer=customer,
+            order_date=datetime.date(2026, 4, 1),
+            status=SalesOrder.StatusChoices.APPROVED,
+        )
+        self.invoices = []
+        for number in ("INV-1", "INV-2"):
+            invoice = SalesInvoice.objects.create(
+                invoice_number=number,
+                customer=customer,
+                order=self.order,
+                invoice_date=datetime.date(2026, 4, 10),
+                status=SalesInvoice.StatusChoices.APPROVED,
+            )
+            SalesInvoiceItem.objects.create(
+                invoice=invoice, item=self.item, quantity=5, rate=Decimal("100.00")
+            )
+            self.invoices.append(invoice)
+
+    def dispatch(self, *invoices, quantities=None):
+        return convert_invoices_to_dispatches(
+            invoices,
+            self.warehouse,
+            datetime.date(2026, 4, 12),
+            quantities=quantities,
+        )
+
+    def test_invoices_are_dispatched_in_part_then_in_full(self):
+        line = self.invoices[0].items.get()
+        (partial,) = self.dispatch(self.invoices[0], quantities={line: 2})
+        self.assertEqual(
+            (partial.invoice, partial.order, partial.warehouse),
+            (self.invoices[0], self.order, self.warehouse),
+        )
+        self.assertEqual(partial.items.get().quantity, 2)
+
+        dispatches = self.dispatch(*self.invoices)
+        self.assertEqual(
+            {
+                dispatch.invoice.invoice_number: dispatch.items.get().quantity
+                for dispatch in dispatches
+            },
+            {"INV-1": 3, "INV-2": 5},
+        )
+        self.assertEqual(self.dispatch(*self.invoices), [])
+
+    def test_over_dispatching_is_refused(self):
+        line = self.invoices[0].items.get()
+        self.dispatch(self.invoices[0], quantities={line: 4})
+
+        with self.assertRaisesMessage(ValueError, "only 1"):
+            self.dispatch(*self.invoices, quantities={line: 2})
+        self.assertEqual(Dispatch.objects.count(), 1)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MastersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'masters'
+
+    def ready(self):
+        from masters import taxes
+
+        taxes.connect_signals()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masters', '0002_customer_vendor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='credit_limit',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Maximum credit exposure allowed; blank for no limit', max_digits=15, null=True),
+        ),
+    ]
@@ -175,6 +175,14 @@ class Customer(UUIDModel, TimeStampedModel, StatusModel):
 
     country = models.CharField(max_length=100, blank=True)
 
+    credit_limit = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Maximum credit exposure allowed; blank for no limit",
+    )
+
     class Meta:
         db_table = "master_customers"
         verbose_name = "Customer"
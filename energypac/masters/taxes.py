@@ -0,0 +1,226 @@
+"""
+GST computation from the Tax master.
+
+Lines built on ``TaxedLineModel`` carry a ``tax`` and its amounts split into
+CGST + SGST (half the rate each) when the document's party is in the
+company's GST state, or IGST (the full rate) when it is not. The party's
+state is the first two digits of its GST number; parties without one are
+treated as in-state.
+
+Tax rates are read through an in-process cache, so computing the tax of a
+day's worth of documents does not query ``master_taxes`` per line. The cache
+is cleared whenever a ``Tax`` is saved or deleted and expires after
+``TAX_RATE_CACHE_TIMEOUT`` seconds, which bounds how long other processes
+keep using a changed rate. A tax missing from the cache reloads it once.
+"""
+
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from core.models import TaxedLineModel
+from core.signals import post_bulk_write
+from masters.models import Tax
+
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+
+TAX_FIELDS = ("cgst_amount", "sgst_amount", "igst_amount")
+TAX_INPUT_FIELDS = TaxedLineModel.TAX_INPUT_FIELDS
+
+# Taxed line model -> (document field, party field)
+TAXED_LINES = {
+    "sales.SalesQuotationItem": ("quotation", "customer"),
+    "sales.SalesOrderItem": ("order", "customer"),
+    "sales.SalesInvoiceItem": ("invoice", "customer"),
+    "procurement.PurchaseOrderItem": ("purchase_order", "vendor"),
+}
+
+_lock = threading.Lock()
+_cache = {"rates": None, "loaded_at": 0.0}
+
+
+def tax_rates():
+    """
+    Rate of every tax, keyed by tax id, from the in-process cache.
+    """
+    with _lock:
+        expired = (
+            time.monotonic() - _cache["loaded_at"] > settings.TAX_RATE_CACHE_TIMEOUT
+        )
+        if _cache["rates"] is None or expired:
+            _cache["rates"] = dict(Tax.objects.values_list("pk", "rate"))
+            _cache["loaded_at"] = time.monotonic()
+        return _cache["rates"]
+
+
+def clear_tax_rates():
+    with _lock:
+        _cache["rates"] = None
+
+
+def is_interstate(gst_number):
+    state = (gst_number or "").strip()[:2]
+    return bool(state) and state != settings.COMPANY_GST_STATE_CODE
+
+
+def _round(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def line_taxes(quantity, rate, tax_id, interstate, rates=None):
+    """
+    ``{"cgst_amount", "sgst_amount", "igst_amount"}`` of one line.
+    """
+    if tax_id is None:
+        return dict.fromkeys(TAX_FIELDS, ZERO)
+    if rates is None:
+        rates = tax_rates()
+    if tax_id not in rates:
+        # Created by another process after the cache was loaded.
+        clear_tax_rates()
+        rates.update(tax_rates())
+    percent = rates[tax_id]
+    taxable = _round(Decimal(quantity) * Decimal(rate))
+    if interstate:
+        return {
+            "cgst_amount": ZERO,
+            "sgst_amount": ZERO,
+            "igst_amount": _round(taxable * percent / 100),
+        }
+    half = _round(taxable * percent / 200)
+    return {"cgst_amount": half, "sgst_amount": half, "igst_amount": ZERO}
+
+
+def apply_taxes(lines, gst_number):
+    """
+    Fill in the tax amounts of line instances of one party, in memory.
+    """
+    interstate = is_interstate(gst_number)
+    rates = tax_rates()
+    for line in lines:
+        for field, amount in line_taxes(
+            line.quantity, line.rate, line.tax_id, interstate, rates
+        ).items():
+            setattr(line, field, amount)
+    return lines
+
+
+def refresh_taxes(label, document_ids):
+    """
+    Recalculate the tax amounts of every taxed line of the given ``label``
+    documents: lines are read with their party's GST number in one query
+    and the changed ones written back with one ``bulk_update``. Returns the
+    number of lines changed.
+    """
+    line_model = apps.get_model(label)
+    document, party = TAXED_LINES[label]
+    document_ids = {pk for pk in document_ids if pk is not None}
+    if not document_ids:
+        return 0
+
+    rates = tax_rates()
+    changed = []
+    lines = (
+        line_model.objects.filter(**{f"{document}_id__in": document_ids})
+        .only("pk", "quantity", "rate", "tax_id", *TAX_FIELDS)
+        .annotate(party_gst_number=F(f"{document}__{party}__gst_number"))
+    )
+    for line in lines:
+        taxes = line_taxes(
+            line.quantity,
+            line.rate,
+            line.tax_id,
+            is_interstate(line.party_gst_number),
+            rates,
+        )
+        if any(getattr(line, field) != amount for field, amount in taxes.items()):
+            for field, amount in taxes.items():
+                setattr(line, field, amount)
+            changed.append(line)
+    if changed:
+        line_model.objects.bulk_update(changed, TAX_FIELDS)
+    return len(changed)
+
+
+def _party_gst_number(line_model, document, party, document_id):
+    document_model = line_model._meta.get_field(document).related_model
+    return (
+        document_model.objects.filter(pk=document_id)
+        .values_list(f"{party}__gst_number", flat=True)
+        .first()
+    )
+
+
+def on_tax_change(sender, **kwargs):
+    clear_tax_rates()
+    # Other threads may reload the old rate until the change commits.
+    transaction.on_commit(clear_tax_rates)
+
+
+def connect_signals():
+    """
+    Clear the rate cache when taxes change, fill in the tax amounts of
+    lines as they are saved, and recalculate them when lines are written
+    in bulk or a document (and so possibly its party) changes. Called from
+    ``MastersConfig.ready()``.
+    """
+    uid = "tax_rates"
+    post_save.connect(on_tax_change, sender=Tax, dispatch_uid=uid)
+    post_delete.connect(on_tax_change, sender=Tax, dispatch_uid=uid)
+
+    for label, (document, party) in TAXED_LINES.items():
+        line_model = apps.get_model(label)
+        document_model = line_model._meta.get_field(document).related_model
+
+        def on_line(sender, instance, document=document, party=party, **kwargs):
+            gst_number = None
+            if instance.tax_id is not None:
+                gst_number = _party_gst_number(
+                    sender, document, party, getattr(instance, f"{document}_id")
+                )
+            apply_taxes([instance], gst_number)
+
+        def on_document(sender, instance, label=label, **kwargs):
+            refresh_taxes(label, [instance.pk])
+
+        def on_bulk(
+            sender, instances, fields, label=label, document=document, **kwargs
+        ):
+            if fields is None or TAX_INPUT_FIELDS.intersection(fields):
+                refresh_taxes(
+                    label,
+                    {getattr(instance, f"{document}_id") for instance in instances},
+                )
+
+        uid = f"taxes:{label}"
+        pre_save.connect(on_line, sender=line_model, weak=False, dispatch_uid=uid)
+        post_bulk_write.connect(
+            on_bulk, sender=line_model, weak=False, dispatch_uid=uid
+        )
+        post_save.connect(
+            on_document, sender=document_model, weak=False, dispatch_uid=uid
+        )
+
+
+def tax_summary(label, document_ids):
+    """
+    CGST, SGST and IGST totals per document of the ``label`` lines, keyed by
+    document id, in one grouped query.
+    """
+    line_model = apps.get_model(label)
+    document, _ = TAXED_LINES[label]
+    rows = (
+        line_model.objects.filter(**{f"{document}_id__in": document_ids})
+        .order_by()
+        .values(f"{document}_id")
+        .annotate(**{field: Sum(field) for field in TAX_FIELDS})
+    )
+    return {row.pop(f"{document}_id"): row for row in rows}
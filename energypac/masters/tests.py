@@ -1,3 +1,81 @@
+import datetime
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from items.models import Item, ItemType
+from masters import taxes
+from masters.models import Customer, Tax, UnitOfMeasure
+from sales.models import SalesOrder, SalesOrderItem
+
+
+class TaxComputationTests(TestCase):
+    """
+    GST amounts of document lines follow the tax rate and the party's state.
+    """
+
+    def setUp(self):
+        taxes.clear_tax_rates()
+        self.addCleanup(taxes.clear_tax_rates)
+        self.gst = Tax.objects.create(name="GST 18%", code="GST18", rate=18)
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.item = Item.objects.create(
+            code="METER-1",
+            name="Energy Meter",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+
+    def create_line(self, gst_number, tax=None, quantity=2, rate=Decimal("500.00")):
+        customer = Customer.objects.create(
+            name=f"Customer {gst_number}",
+            code=f"C-{gst_number}",
+            gst_number=gst_number,
+        )
+        order = SalesOrder.objects.create(
+            order_number=f"SO-{gst_number}",
+            customer=customer,
+            order_date=datetime.date(2026, 5, 1),
+        )
+        return SalesOrderItem.objects.create(
+            order=order,
+            item=self.item,
+            quantity=quantity,
+            rate=rate,
+            tax=tax or self.gst,
+        )
+
+    def amounts(self, line):
+        line.refresh_from_db()
+        return (line.cgst_amount, line.sgst_amount, line.igst_amount)
+
+    def test_in_state_lines_split_cgst_and_sgst(self):
+        line = self.create_line("19AAACE1234F1Z5")
+        self.assertEqual(self.amounts(line), (90, 90, 0))
+
+    def test_interstate_lines_pay_igst(self):
+        line = self.create_line("27AAACE1234F1Z5")
+        self.assertEqual(self.amounts(line), (0, 0, 180))
+
+    def test_taxes_missing_from_the_cache_are_reloaded(self):
+        taxes.tax_rates()
+        # Written without signals, as by another process.
+        (gst_5,) = Tax.objects.bulk_create(
+            [Tax(name="GST 5%", code="GST5", rate=5)]
+        )
+
+        line = self.create_line("27AAACE1234F1Z5", tax=gst_5)
+        self.assertEqual(self.amounts(line), (0, 0, 50))
+
+    def test_partial_and_bulk_updates_recalculate_taxes(self):
+        line = self.create_line("19AAACE1234F1Z5")
+
+        line.quantity = 4
+        line.save(update_fields=["quantity"])
+        self.assertEqual(self.amounts(line), (180, 180, 0))
+
+        line.rate = Decimal("250.00")
+        SalesOrderItem.objects.bulk_update([line], ["rate"])
+        self.assertEqual(self.amounts(line), (90, 90, 0))
+        line.order.refresh_from_db()
+        self.assertEqual(line.order.tax_amount, 180)
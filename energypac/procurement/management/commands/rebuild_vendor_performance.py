@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from procurement.models import VendorPerformance
+from procurement.performance import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the vendor performance rollups from posted GRNs and inspections."
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Rebuilt vendor performance: "
+                f"{VendorPerformance.objects.count()} vendor month(s)."
+            )
+        )
@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from items.models import Item
+from masters.models import Department
+from procurement.mrp import create_requisition, run_mrp
+
+
+class Command(BaseCommand):
+    help = "Compute net material requirements and optionally raise a requisition."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--department",
+            help="Department code; raises a purchase requisition for the shortages.",
+        )
+        parser.add_argument(
+            "--required-date",
+            type=datetime.date.fromisoformat,
+            help="Required date of the requisition (YYYY-MM-DD). Defaults to today.",
+        )
+
+    def handle(self, *args, **options):
+        rows = run_mrp()
+        shortages = [row for row in rows if row["shortage"] > 0]
+
+        item_ids = [row["item_id"] for row in shortages]
+        codes = dict(Item.objects.filter(pk__in=item_ids).values_list("pk", "code"))
+        for row in shortages:
+            self.stdout.write(
+                f"{codes[row['item_id']]}: demand {row['demand']}, "
+                f"on hand {row['on_hand']}, open POs {row['open_supply']}, "
+                f"pending PRs {row['pending_requisitions']}, "
+                f"shortage {row['shortage']}"
+            )
+
+        if options["department"]:
+            try:
+                department = Department.objects.get(code=options["department"])
+            except Department.DoesNotExist:
+                raise CommandError(f"Unknown department {options['department']}.")
+
+            requisition = create_requisition(
+                rows, department, options["required_date"] or timezone.localdate()
+            )
+            if requisition:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Raised purchase requisition {requisition}.")
+                )
+
+        self.stdout.write(f"{len(shortages)} of {len(rows)} item(s) short.")
@@ -0,0 +1,61 @@
+# Generated by Django 5.2 on 2026-10-18 11:26
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_received_quantities(apps, schema_editor):
+    GoodsReceiptItem = apps.get_model('inventory', 'GoodsReceiptItem')
+    StockLedger = apps.get_model('inventory', 'StockLedger')
+    PurchaseOrderItem = apps.get_model('procurement', 'PurchaseOrderItem')
+    posted = StockLedger.objects.filter(reference_type='GRN').values('reference_id')
+    received = {
+        (row['grn__purchase_order_id'], row['item_id']): row['total']
+        for row in GoodsReceiptItem.objects.filter(pk__in=posted)
+        .order_by()
+        .values('grn__purchase_order_id', 'item_id')
+        .annotate(total=Sum('quantity'))
+    }
+    lines = {}
+    for line in PurchaseOrderItem.objects.order_by('created_at', 'pk'):
+        lines.setdefault((line.purchase_order_id, line.item_id), []).append(line)
+
+    changed = []
+    for key, quantity in received.items():
+        matching = lines.get(key, [])
+        for index, line in enumerate(matching):
+            taken = quantity if index == len(matching) - 1 else min(line.quantity, quantity)
+            line.received_quantity = taken
+            quantity -= taken
+            changed.append(line)
+            if not quantity:
+                break
+    PurchaseOrderItem.objects.bulk_update(changed, ['received_quantity'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stock_reservation'),
+        ('items', '0001_initial'),
+        ('procurement', '0002_purchaseorder_vendor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='received_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Quantity received through posted GRNs', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='open_quantity',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantity'), '-', models.F('received_quantity')), output_field=models.DecimalField(decimal_places=3, max_digits=12)),
+        ),
+        migrations.RunPython(populate_received_quantities, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='purchaseorderitem',
+            index=models.Index(condition=models.Q(('open_quantity__gt', 0)), fields=['item', 'purchase_order'], name='po_item_open_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 11:33
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def populate_totals(apps, schema_editor):
+    # Lines carry no tax yet, so tax_amount keeps its default of zero.
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    line_total = Round(
+        ExpressionWrapper(F('quantity') * F('rate'), output_field=amount), 2
+    )
+    subtotal = (
+        apps.get_model('procurement', 'PurchaseOrderItem')
+        .objects.filter(purchase_order=OuterRef('pk'))
+        .order_by()
+        .values('purchase_order')
+        .annotate(total=Sum(line_total, output_field=amount))
+        .values('total')
+    )
+    apps.get_model('procurement', 'PurchaseOrder').objects.update(
+        subtotal=Coalesce(Subquery(subtotal, output_field=amount), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0003_purchaseorderitem_receipts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='grand_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('subtotal'), '+', models.F('tax_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 5.2 on 2026-10-18 11:44
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+def populate_performance(apps, schema_editor):
+    GoodsReceiptNote = apps.get_model('inventory', 'GoodsReceiptNote')
+    QualityInspectionItem = apps.get_model('quality', 'QualityInspectionItem')
+    VendorPerformance = apps.get_model('procurement', 'VendorPerformance')
+    VendorRejection = apps.get_model('procurement', 'VendorRejection')
+
+    performance = {}
+    rejections = {}
+
+    def figures(vendor_id, day):
+        return performance.setdefault(
+            (vendor_id, day.replace(day=1)),
+            {
+                'grn_count': 0,
+                'on_time_grn_count': 0,
+                'late_days': 0,
+                'inspected_quantity': 0,
+                'rejected_quantity': 0,
+            },
+        )
+
+    grns = GoodsReceiptNote.objects.filter(
+        posted_at__isnull=False, purchase_order__vendor__isnull=False
+    ).values_list(
+        'purchase_order__vendor_id', 'received_date', 'purchase_order__delivery_date'
+    )
+    for vendor_id, received_date, delivery_date in grns.iterator():
+        row = figures(vendor_id, received_date)
+        late = (received_date - delivery_date).days if delivery_date else 0
+        row['grn_count'] += 1
+        if late > 0:
+            row['late_days'] += late
+        else:
+            row['on_time_grn_count'] += 1
+
+    lines = QualityInspectionItem.objects.filter(
+        inspection__posted_at__isnull=False,
+        inspection__grn__purchase_order__vendor__isnull=False,
+    ).values_list(
+        'inspection__grn__purchase_order__vendor_id',
+        'inspection__inspection_date',
+        'rejection_reason_id',
+        'received_quantity',
+        'rejected_quantity',
+    )
+    for vendor_id, day, reason_id, received, rejected in lines.iterator():
+        row = figures(vendor_id, day)
+        row['inspected_quantity'] += received
+        row['rejected_quantity'] += rejected
+        if reason_id is not None and rejected:
+            key = (vendor_id, day.replace(day=1), reason_id)
+            rejections[key] = rejections.get(key, 0) + rejected
+
+    VendorPerformance.objects.bulk_create(
+        [
+            VendorPerformance(vendor_id=vendor_id, month=month, **row)
+            for (vendor_id, month), row in performance.items()
+        ],
+        batch_size=1000,
+    )
+    VendorRejection.objects.bulk_create(
+        [
+            VendorRejection(
+                vendor_id=vendor_id,
+                month=month,
+                reason_id=reason_id,
+                rejected_quantity=quantity,
+            )
+            for (vendor_id, month, reason_id), quantity in rejections.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masters', '0003_customer_credit_limit'),
+        ('inventory', '0007_goodsreceiptnote_posted_at'),
+        ('procurement', '0004_document_totals'),
+        ('quality', '0002_qualityinspection_posted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorPerformance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('grn_count', models.IntegerField(default=0)),
+                ('on_time_grn_count', models.IntegerField(default=0, help_text='GRNs received on or before the PO delivery date')),
+                ('late_days', models.IntegerField(default=0, help_text='Days late summed over late GRNs')),
+                ('inspected_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('rejected_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='performance', to='masters.vendor')),
+            ],
+            options={
+                'verbose_name': 'Vendor Performance',
+                'verbose_name_plural': 'Vendor Performance',
+                'db_table': 'vendor_performance',
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'month'), name='uniq_vendor_performance_month')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorRejection',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('rejected_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('reason', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_rejections', to='quality.rejectionreason')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rejections', to='masters.vendor')),
+            ],
+            options={
+                'verbose_name': 'Vendor Rejection',
+                'verbose_name_plural': 'Vendor Rejections',
+                'db_table': 'vendor_rejections',
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'month', 'reason'), name='uniq_vendor_rejection_month_reason')],
+            },
+        ),
+        migrations.RunPython(populate_performance, migrations.RunPython.noop),
+    ]
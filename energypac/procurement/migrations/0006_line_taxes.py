@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 11:51
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('masters', '0003_customer_credit_limit'),
+        ('procurement', '0005_vendor_performance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='cgst_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='igst_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='sgst_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='tax',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='masters.tax'),
+        ),
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='tax_amount',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('cgst_amount'), '+', models.F('sgst_amount')), '+', models.F('igst_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+    ]
@@ -1,6 +1,14 @@
 from django.db import models
 
-from core.models import UUIDModel, TimeStampedModel, StatusModel
+from core.models import (
+    BulkSignalQuerySet,
+    DocumentTotalsModel,
+    MaintainedFieldsModel,
+    StatusModel,
+    TaxedLineModel,
+    TimeStampedModel,
+    UUIDModel,
+)
 from items.models import Item
 from masters.models import Department
 from masters.models import Vendor
@@ -59,7 +67,9 @@ class PurchaseRequisitionItem(UUIDModel, TimeStampedModel):
         return f"{self.purchase_requisition.pr_number} - {self.item.code}"
 
 
-class PurchaseOrder(UUIDModel, TimeStampedModel, StatusModel):
+class PurchaseOrder(
+    UUIDModel, TimeStampedModel, StatusModel, DocumentTotalsModel
+):
     """
     Purchase Order (PO).
     Represents a confirmed order placed to a vendor.
@@ -94,7 +104,9 @@ class PurchaseOrder(UUIDModel, TimeStampedModel, StatusModel):
         return self.po_number
 
 
-class PurchaseOrderItem(UUIDModel, TimeStampedModel):
+class PurchaseOrderItem(
+    UUIDModel, TimeStampedModel, MaintainedFieldsModel, TaxedLineModel
+):
     """
     Line items for a Purchase Order.
     """
@@ -111,10 +123,116 @@ class PurchaseOrderItem(UUIDModel, TimeStampedModel):
 
     rate = models.DecimalField(max_digits=12, decimal_places=2)
 
+    received_quantity = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        default=0,
+        help_text="Quantity received through posted GRNs",
+    )
+
+    open_quantity = models.GeneratedField(
+        expression=models.F("quantity") - models.F("received_quantity"),
+        output_field=models.DecimalField(max_digits=12, decimal_places=3),
+        db_persist=True,
+    )
+
+    objects = BulkSignalQuerySet.as_manager()
+
+    maintained_fields = ("received_quantity",)
+
     class Meta:
         db_table = "purchase_order_items"
         verbose_name = "Purchase Order Item"
         verbose_name_plural = "Purchase Order Items"
+        indexes = [
+            models.Index(
+                fields=["item", "purchase_order"],
+                condition=models.Q(open_quantity__gt=0),
+                name="po_item_open_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.purchase_order.po_number} - {self.item.code}"
+
+
+class VendorPerformance(UUIDModel, TimeStampedModel):
+    """
+    Vendor performance rollup per vendor and month.
+    Delivery figures are added when GRNs are posted (by received date) and
+    quality figures when inspections are posted (by inspection date).
+    """
+
+    vendor = models.ForeignKey(
+        Vendor, on_delete=models.CASCADE, related_name="performance"
+    )
+
+    month = models.DateField(help_text="First day of the month")
+
+    grn_count = models.IntegerField(default=0)
+
+    on_time_grn_count = models.IntegerField(
+        default=0, help_text="GRNs received on or before the PO delivery date"
+    )
+
+    late_days = models.IntegerField(
+        default=0, help_text="Days late summed over late GRNs"
+    )
+
+    inspected_quantity = models.DecimalField(
+        max_digits=15, decimal_places=3, default=0
+    )
+
+    rejected_quantity = models.DecimalField(
+        max_digits=15, decimal_places=3, default=0
+    )
+
+    class Meta:
+        db_table = "vendor_performance"
+        verbose_name = "Vendor Performance"
+        verbose_name_plural = "Vendor Performance"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["vendor", "month"], name="uniq_vendor_performance_month"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor.code} | {self.month:%Y-%m}"
+
+
+class VendorRejection(UUIDModel, TimeStampedModel):
+    """
+    Rejected quantity per vendor, month and rejection reason.
+    Rejections without a reason only count in ``VendorPerformance``.
+    """
+
+    vendor = models.ForeignKey(
+        Vendor, on_delete=models.CASCADE, related_name="rejections"
+    )
+
+    month = models.DateField(help_text="First day of the month")
+
+    reason = models.ForeignKey(
+        "quality.RejectionReason",
+        on_delete=models.CASCADE,
+        related_name="vendor_rejections",
+    )
+
+    rejected_quantity = models.DecimalField(
+        max_digits=15, decimal_places=3, default=0
+    )
+
+    class Meta:
+        db_table = "vendor_rejections"
+        verbose_name = "Vendor Rejection"
+        verbose_name_plural = "Vendor Rejections"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["vendor", "month", "reason"],
+                name="uniq_vendor_rejection_month_reason",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor.code} | {self.month:%Y-%m} | {self.reason}"
@@ -0,0 +1,160 @@
+"""
+Material requirements planning (MRP).
+
+Each input is one grouped query returning a quantity per item; net
+requirements are then worked out over those per-item vectors at once.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from core.models import StatusModel
+from core.numbering import DocumentType, next_number
+from inventory.models import StockBalance
+from procurement.models import (
+    PurchaseOrderItem,
+    PurchaseRequisition,
+    PurchaseRequisitionItem,
+)
+from sales.atp import reserved_for_demand
+from sales.models import SalesOrderItem
+
+
+OPEN_STATUSES = (
+    StatusModel.StatusChoices.SUBMITTED,
+    StatusModel.StatusChoices.APPROVED,
+)
+
+ZERO = Decimal("0")
+
+
+def _per_item(queryset, field="quantity"):
+    return dict(
+        queryset.order_by()
+        .values("item_id")
+        .annotate(total=Sum(field))
+        .values_list("item_id", "total")
+    )
+
+
+def _filter_items(queryset, items):
+    if items is None:
+        return queryset
+    return queryset.filter(item__in=items)
+
+
+def open_demand(items=None):
+    return _per_item(
+        _filter_items(
+            SalesOrderItem.objects.filter(
+                pending_quantity__gt=0,
+                order__status__in=OPEN_STATUSES,
+                order__is_active=True,
+            ),
+            items,
+        ),
+        "pending_quantity",
+    )
+
+
+def on_hand(items=None):
+    """
+    Stock outside the quarantine warehouse that is not reserved for anything
+    but open sales orders, whose lines are already counted as demand.
+    """
+    stock = _per_item(
+        _filter_items(StockBalance.objects.usable(), items),
+        F("quantity") - F("reserved_quantity"),
+    )
+    for item_id, quantity in reserved_for_demand(items).items():
+        stock[item_id] = (stock.get(item_id) or ZERO) + quantity
+    return stock
+
+
+def open_supply(items=None):
+    return _per_item(
+        _filter_items(
+            PurchaseOrderItem.objects.filter(
+                open_quantity__gt=0,
+                purchase_order__status__in=OPEN_STATUSES,
+                purchase_order__is_active=True,
+            ),
+            items,
+        ),
+        "open_quantity",
+    )
+
+
+def pending_requisitions(items=None):
+    return _per_item(
+        _filter_items(
+            PurchaseRequisitionItem.objects.filter(
+                purchase_requisition__status__in=OPEN_STATUSES,
+                purchase_requisition__is_active=True,
+                purchase_requisition__purchase_orders__isnull=True,
+            ),
+            items,
+        )
+    )
+
+
+def run_mrp(items=None):
+    """
+    Net requirements per item.
+
+    Returns one dict per item with undispatched sales order ``demand``, ``on_hand``
+    stock, ``open_supply`` from purchase orders, ``pending_requisitions``
+    and the resulting ``shortage`` (never negative), largest shortage first.
+    """
+    demand = open_demand(items)
+    if not demand:
+        return []
+
+    vectors = {
+        "on_hand": on_hand(items),
+        "open_supply": open_supply(items),
+        "pending_requisitions": pending_requisitions(items),
+    }
+
+    rows = []
+    for item_id, required in demand.items():
+        row = {"item_id": item_id, "demand": required}
+        for name, vector in vectors.items():
+            row[name] = vector.get(item_id) or ZERO
+        row["shortage"] = max(required - sum(row[name] for name in vectors), ZERO)
+        rows.append(row)
+
+    rows.sort(key=lambda row: row["shortage"], reverse=True)
+    return rows
+
+
+def create_requisition(rows, department, required_date, pr_number=None):
+    """
+    Turn the shortages of an MRP run into one purchase requisition.
+    Returns ``None`` if there is nothing to order.
+    """
+    shortages = [row for row in rows if row["shortage"] > 0]
+    if not shortages:
+        return None
+
+    if pr_number is None:
+        pr_number = next_number(DocumentType.PURCHASE_REQUISITION)
+
+    with transaction.atomic():
+        requisition = PurchaseRequisition.objects.create(
+            pr_number=pr_number,
+            department=department,
+            required_date=required_date,
+            remarks="Suggested by MRP run",
+        )
+        PurchaseRequisitionItem.objects.bulk_create(
+            PurchaseRequisitionItem(
+                purchase_requisition=requisition,
+                item_id=row["item_id"],
+                quantity=row["shortage"],
+            )
+            for row in shortages
+        )
+    return requisition
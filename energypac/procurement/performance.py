@@ -0,0 +1,187 @@
+"""
+Vendor performance rollups.
+
+``VendorPerformance`` keeps per-vendor monthly delivery figures (GRNs
+received, on time, days late) and quality figures (inspected and rejected
+quantities), and ``VendorRejection`` splits the rejections by reason.
+Posting GRNs and inspections adds to the rollups with
+``core.rollups.apply_deltas`` and reversing GRNs takes them off again, so
+the scorecard never has to join the PO, GRN and QC tables.
+"""
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F, Sum
+
+from core.rollups import apply_deltas
+from procurement.models import VendorPerformance, VendorRejection
+
+
+KEY_FIELDS = ("vendor_id", "month")
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _delivery_deltas(grns, sign=1):
+    deltas = {}
+    for vendor_id, received_date, delivery_date in grns:
+        if vendor_id is None:
+            continue
+        late = (received_date - delivery_date).days if delivery_date else 0
+        changes = deltas.setdefault(
+            (vendor_id, month_start(received_date)),
+            {"grn_count": 0, "on_time_grn_count": 0, "late_days": 0},
+        )
+        changes["grn_count"] += sign
+        if late > 0:
+            changes["late_days"] += sign * late
+        else:
+            changes["on_time_grn_count"] += sign
+    return deltas
+
+
+def _quality_deltas(lines, sign=1):
+    totals = {}
+    by_reason = {}
+    for vendor_id, day, reason_id, received, rejected in lines:
+        if vendor_id is None:
+            continue
+        key = (vendor_id, month_start(day))
+        changes = totals.setdefault(
+            key, {"inspected_quantity": 0, "rejected_quantity": 0}
+        )
+        changes["inspected_quantity"] += sign * received
+        changes["rejected_quantity"] += sign * rejected
+        if reason_id is not None and rejected:
+            changes = by_reason.setdefault(key + (reason_id,), {"rejected_quantity": 0})
+            changes["rejected_quantity"] += sign * rejected
+    return totals, by_reason
+
+
+def record_deliveries(grns, sign=1):
+    """
+    Add posted GRNs, given as ``(vendor_id, received_date, delivery_date)``
+    tuples, to the rollups; ``sign=-1`` takes reversed GRNs off again.
+    """
+    apply_deltas(VendorPerformance, KEY_FIELDS, _delivery_deltas(grns, sign))
+
+
+def record_inspections(lines, sign=1):
+    """
+    Add posted inspection lines, given as ``(vendor_id, inspection_date,
+    rejection_reason_id, received_quantity, rejected_quantity)`` tuples, to
+    the rollups.
+    """
+    totals, by_reason = _quality_deltas(lines, sign)
+    with transaction.atomic():
+        apply_deltas(VendorPerformance, KEY_FIELDS, totals)
+        apply_deltas(VendorRejection, KEY_FIELDS + ("reason_id",), by_reason)
+
+
+def rebuild():
+    """
+    Rebuild the rollups from the posted GRNs and inspections.
+    """
+    grns = apps.get_model("inventory", "GoodsReceiptNote").objects.filter(
+        posted_at__isnull=False
+    )
+    lines = apps.get_model("quality", "QualityInspectionItem").objects.filter(
+        inspection__posted_at__isnull=False
+    )
+
+    with transaction.atomic():
+        VendorPerformance.objects.all().delete()
+        VendorRejection.objects.all().delete()
+        apply_deltas(
+            VendorPerformance,
+            KEY_FIELDS,
+            _delivery_deltas(
+                grns.values_list(
+                    "purchase_order__vendor_id",
+                    "received_date",
+                    "purchase_order__delivery_date",
+                ).iterator()
+            ),
+        )
+        totals, by_reason = _quality_deltas(
+            lines.values_list(
+                "inspection__grn__purchase_order__vendor_id",
+                "inspection__inspection_date",
+                "rejection_reason_id",
+                "received_quantity",
+                "rejected_quantity",
+            ).iterator()
+        )
+        apply_deltas(VendorPerformance, KEY_FIELDS, totals)
+        apply_deltas(VendorRejection, KEY_FIELDS + ("reason_id",), by_reason)
+
+
+def _ratio(part, whole):
+    return part / whole if whole else None
+
+
+def vendor_scorecard(start=None, end=None, vendor=None, monthly=False):
+    """
+    Delivery and quality scorecard per vendor (and per month with
+    ``monthly=True``) for the months from ``start`` to ``end``, read from
+    the rollups only.
+
+    Each row has the summed rollup figures plus ``on_time_rate``,
+    ``average_days_late`` (over late GRNs), ``rejection_rate`` and
+    ``rejections``, a list of ``{"reason_id", "reason", "rejected_quantity",
+    "rejection_rate"}`` dicts, largest first. Rates are ``None`` where there
+    is nothing to divide by.
+    """
+    filters = {}
+    if start is not None:
+        filters["month__gte"] = month_start(start)
+    if end is not None:
+        filters["month__lte"] = end
+    if vendor is not None:
+        filters["vendor"] = vendor
+    group = ["vendor_id", "month"] if monthly else ["vendor_id"]
+
+    rows = (
+        VendorPerformance.objects.filter(**filters)
+        .values(*group)
+        .annotate(
+            vendor_code=F("vendor__code"),
+            vendor_name=F("vendor__name"),
+            grn_count=Sum("grn_count"),
+            on_time_grn_count=Sum("on_time_grn_count"),
+            late_days=Sum("late_days"),
+            inspected_quantity=Sum("inspected_quantity"),
+            rejected_quantity=Sum("rejected_quantity"),
+        )
+        .order_by("vendor__code", *group[1:])
+    )
+    rejections = {}
+    for row in (
+        VendorRejection.objects.filter(**filters)
+        .values(*group, "reason_id")
+        .annotate(
+            reason=F("reason__description"),
+            rejected_quantity=Sum("rejected_quantity"),
+        )
+        .order_by("-rejected_quantity")
+    ):
+        key = tuple(row.pop(field) for field in group)
+        rejections.setdefault(key, []).append(row)
+
+    scorecard = []
+    for row in rows:
+        late_grns = row["grn_count"] - row["on_time_grn_count"]
+        row["on_time_rate"] = _ratio(row["on_time_grn_count"], row["grn_count"])
+        row["average_days_late"] = _ratio(row["late_days"], late_grns)
+        row["rejection_rate"] = _ratio(
+            row["rejected_quantity"], row["inspected_quantity"]
+        )
+        row["rejections"] = rejections.get(tuple(row[field] for field in group), [])
+        for reason in row["rejections"]:
+            reason["rejection_rate"] = _ratio(
+                reason["rejected_quantity"], row["inspected_quantity"]
+            )
+        scorecard.append(row)
+    return scorecard
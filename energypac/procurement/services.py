@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from core.models import StatusModel
+from procurement.models import PurchaseOrderItem
+
+
+OPEN_STATUSES = (
+    StatusModel.StatusChoices.SUBMITTED,
+    StatusModel.StatusChoices.APPROVED,
+)
+
+
+def apply_receipts(receipts):
+    """
+    Add received quantities to purchase order lines.
+
+    ``receipts`` maps ``(purchase_order_id, item_id)`` to a quantity;
+    negative quantities reverse earlier receipts. Receipts fill the matching
+    lines oldest first and reversals empty them newest first; anything beyond
+    the ordered quantity stays on the last line. Lines are locked in one
+    query and written with one ``bulk_update``.
+    """
+    receipts = {key: quantity for key, quantity in receipts.items() if quantity}
+    if not receipts:
+        return []
+
+    with transaction.atomic():
+        lines = {}
+        for line in (
+            PurchaseOrderItem.objects.select_for_update()
+            .filter(
+                purchase_order_id__in={po_id for po_id, _ in receipts},
+                item_id__in={item_id for _, item_id in receipts},
+            )
+            .order_by("purchase_order_id", "created_at", "pk")
+        ):
+            lines.setdefault((line.purchase_order_id, line.item_id), []).append(line)
+
+        changed = []
+        for key, quantity in receipts.items():
+            matching = lines.get(key)
+            if not matching:
+                continue
+
+            if quantity > 0:
+                for index, line in enumerate(matching):
+                    last = index == len(matching) - 1
+                    room = max(line.quantity - line.received_quantity, Decimal("0"))
+                    taken = quantity if last else min(room, quantity)
+                    line.received_quantity += taken
+                    quantity -= taken
+                    if taken:
+                        changed.append(line)
+                    if not quantity:
+                        break
+            else:
+                quantity = -quantity
+                for line in reversed(matching):
+                    taken = min(line.received_quantity, quantity)
+                    line.received_quantity -= taken
+                    quantity -= taken
+                    if taken:
+                        changed.append(line)
+                    if not quantity:
+                        break
+
+        PurchaseOrderItem.objects.bulk_update(changed, ["received_quantity"])
+    return changed
+
+
+def open_purchase_order_lines(vendor=None, item=None):
+    """
+    Purchase order lines with quantity still to be received, for one vendor
+    and/or item. Reads the maintained ``open_quantity`` in a single query.
+    """
+    lines = PurchaseOrderItem.objects.filter(
+        open_quantity__gt=0,
+        purchase_order__status__in=OPEN_STATUSES,
+        purchase_order__is_active=True,
+    )
+    if vendor is not None:
+        lines = lines.filter(purchase_order__vendor=vendor)
+    if item is not None:
+        lines = lines.filter(item=item)
+    return lines.select_related(
+        "purchase_order", "purchase_order__vendor", "item"
+    ).order_by("purchase_order__delivery_date", "purchase_order__po_number")
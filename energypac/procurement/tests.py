@@ -1,3 +1,254 @@
+import datetime
+import uuid
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import StatusModel
+from inventory.models import GoodsReceiptItem, GoodsReceiptNote, StockLedger
+from inventory.reservations import reserve_stock
+from inventory.services import post_grns
+from items.models import Item, ItemType
+from masters.models import Customer, UnitOfMeasure, Vendor, Warehouse
+from procurement.models import (
+    PurchaseOrder,
+    PurchaseOrderItem,
+    VendorPerformance,
+    VendorRejection,
+)
+from procurement.mrp import run_mrp
+from procurement.performance import (
+    rebuild,
+    record_deliveries,
+    record_inspections,
+    vendor_scorecard,
+)
+from quality.models import QualityInspection, QualityInspectionItem, RejectionReason
+from quality.services import post_inspections
+from sales.models import SalesOrder, SalesOrderItem
+
+
+def day(month, day):
+    return datetime.date(2026, month, day)
+
+
+APRIL = day(4, 1)
+MAY = day(5, 1)
+
+
+class MaterialRequirementsTests(TestCase):
+    """
+    MRP nets open sales order demand against usable stock and open supply.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+        StockLedger.objects.create(
+            item=self.item,
+            warehouse=self.warehouse,
+            movement_type=StockLedger.MovementType.IN,
+            quantity=10,
+            reference_type="ADJUSTMENT",
+            reference_id=uuid.uuid4(),
+        )
+        customer = Customer.objects.create(name="Acme Power", code="ACME")
+        self.order = SalesOrder.objects.create(
+            order_number="SO-1",
+            customer=customer,
+            order_date=datetime.date(2026, 4, 1),
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        SalesOrderItem.objects.create(
+            order=self.order, item=self.item, quantity=12, rate=Decimal("100.00")
+        )
+
+    def test_stock_reserved_for_the_demand_is_counted_once(self):
+        reserve_stock([(self.item, self.warehouse, 6)], "SALES_ORDER", self.order.pk)
+        reserve_stock([(self.item, self.warehouse, 3)], "DISPATCH", uuid.uuid4())
+
+        [row] = run_mrp()
+        self.assertEqual((row["demand"], row["on_hand"]), (12, 7))
+        self.assertEqual(row["shortage"], 5)
+
+
+class VendorPerformanceTests(TestCase):
+    """
+    Posting and reversing add to and take off the vendor rollups, rebuild
+    recomputes them from the posted documents, and the scorecard reads its
+    ratios from them.
+    """
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(name="Bharat Cables", code="BCL")
+        self.other = Vendor.objects.create(name="Crompton Wires", code="CWL")
+        self.damaged = RejectionReason.objects.create(
+            code="DMG", description="Damaged"
+        )
+        self.rusted = RejectionReason.objects.create(code="RUST", description="Rust")
+
+    def performance(self, vendor=None):
+        return list(
+            VendorPerformance.objects.filter(vendor=vendor or self.vendor)
+            .order_by("month")
+            .values_list(
+                "month",
+                "grn_count",
+                "on_time_grn_count",
+                "late_days",
+                "inspected_quantity",
+                "rejected_quantity",
+            )
+        )
+
+    def rejections(self):
+        return dict(
+            VendorRejection.objects.filter(vendor=self.vendor).values_list(
+                "reason__code", "rejected_quantity"
+            )
+        )
+
+    def test_deliveries_are_posted_and_reversed(self):
+        late = (self.vendor.pk, day(4, 20), day(4, 15))
+        record_deliveries(
+            [
+                (self.vendor.pk, day(4, 10), day(4, 10)),
+                late,
+                (self.vendor.pk, day(5, 2), None),
+                (None, day(5, 2), None),
+            ]
+        )
+        self.assertEqual(
+            self.performance(), [(APRIL, 2, 1, 5, 0, 0), (MAY, 1, 1, 0, 0, 0)]
+        )
+
+        record_deliveries([late], sign=-1)
+        self.assertEqual(
+            self.performance(), [(APRIL, 1, 1, 0, 0, 0), (MAY, 1, 1, 0, 0, 0)]
+        )
+
+    def test_inspections_are_posted_and_reversed(self):
+        damaged = (self.vendor.pk, day(4, 11), self.damaged.pk, 10, 2)
+        record_inspections(
+            [
+                damaged,
+                (self.vendor.pk, day(4, 12), self.rusted.pk, 5, 1),
+                (self.vendor.pk, day(4, 13), None, 5, 0),
+            ]
+        )
+        self.assertEqual(self.performance(), [(APRIL, 0, 0, 0, 20, 3)])
+        self.assertEqual(self.rejections(), {"DMG": 2, "RUST": 1})
+
+        record_inspections([damaged], sign=-1)
+        self.assertEqual(self.performance(), [(APRIL, 0, 0, 0, 10, 1)])
+        self.assertEqual(self.rejections(), {"DMG": 0, "RUST": 1})
+
+    def test_scorecard_ratios(self):
+        record_deliveries(
+            [
+                (self.vendor.pk, day(4, 10), day(4, 10)),
+                (self.vendor.pk, day(4, 20), day(4, 14)),
+                (self.vendor.pk, day(5, 20), day(5, 18)),
+                (self.vendor.pk, day(5, 21), day(5, 21)),
+                (self.other.pk, day(5, 2), day(5, 2)),
+            ]
+        )
+        record_inspections(
+            [
+                (self.vendor.pk, day(4, 11), self.damaged.pk, 40, 4),
+                (self.vendor.pk, day(5, 21), self.rusted.pk, 60, 6),
+                (self.vendor.pk, day(5, 21), self.damaged.pk, 0, 3),
+            ]
+        )
+
+        bharat, crompton = vendor_scorecard()
+        self.assertEqual(bharat["grn_count"], 4)
+        self.assertEqual(bharat["on_time_rate"], Decimal("0.5"))
+        self.assertEqual(bharat["average_days_late"], 4)
+        self.assertEqual(bharat["rejection_rate"], Decimal("0.13"))
+        self.assertEqual(
+            [
+                (row["reason"], row["rejected_quantity"], row["rejection_rate"])
+                for row in bharat["rejections"]
+            ],
+            [("Damaged", 7, Decimal("0.07")), ("Rust", 6, Decimal("0.06"))],
+        )
+        self.assertEqual(crompton["on_time_rate"], 1)
+        self.assertIsNone(crompton["average_days_late"])
+        self.assertIsNone(crompton["rejection_rate"])
+        self.assertEqual(crompton["rejections"], [])
+
+        april, may = vendor_scorecard(vendor=self.vendor, monthly=True)
+        self.assertEqual((april["month"], may["month"]), (APRIL, MAY))
+        self.assertEqual(april["average_days_late"], 6)
+        self.assertEqual(may["rejection_rate"], Decimal("9") / Decimal("60"))
+
+        (only_may,) = vendor_scorecard(
+            start=day(5, 15), end=MAY, vendor=self.vendor
+        )
+        self.assertEqual(only_may["grn_count"], 2)
+
+    def test_rebuild_matches_posting(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        Warehouse.objects.create(name="Quarantine", code="QUAR")
+        item = Item.objects.create(
+            code="CABLE-1", name="Cable", item_type=ItemType.RAW_MATERIAL, uom=uom
+        )
+        order = PurchaseOrder.objects.create(
+            po_number="PO-1",
+            vendor=self.vendor,
+            order_date=day(4, 1),
+            delivery_date=day(4, 10),
+            status=PurchaseOrder.StatusChoices.APPROVED,
+        )
+        PurchaseOrderItem.objects.create(
+            purchase_order=order, item=item, quantity=20, rate=100
+        )
+        grns = []
+        for number, received_date in (
+            ("GRN-1", day(4, 13)),
+            ("GRN-2", day(4, 9)),
+        ):
+            grn = GoodsReceiptNote.objects.create(
+                grn_number=number,
+                purchase_order=order,
+                received_date=received_date,
+                warehouse=warehouse,
+                status=GoodsReceiptNote.StatusChoices.APPROVED,
+            )
+            GoodsReceiptItem.objects.create(grn=grn, item=item, quantity=10)
+            grns.append(grn)
+        post_grns(grns[:1])
+        inspection = QualityInspection.objects.create(
+            grn=grns[1],
+            inspection_date=day(4, 12),
+            status=QualityInspection.StatusChoices.APPROVED,
+        )
+        QualityInspectionItem.objects.create(
+            inspection=inspection,
+            grn_item=grns[1].items.get(),
+            item=item,
+            received_quantity=10,
+            accepted_quantity=8,
+            rejected_quantity=2,
+            rejection_reason=self.damaged,
+        )
+        post_inspections([inspection])
+        posted = self.performance()
+        self.assertEqual(posted, [(APRIL, 2, 1, 3, 10, 2)])
+
+        VendorPerformance.objects.update(grn_count=99, inspected_quantity=0)
+        VendorRejection.objects.all().delete()
+        record_deliveries([(self.other.pk, APRIL, None)])
+        rebuild()
+
+        self.assertEqual(self.performance(), posted)
+        self.assertEqual(self.rejections(), {"DMG": 2})
+        self.assertEqual(self.performance(self.other), [])
@@ -0,0 +1,171 @@
+"""
+Quality analytics over daily QC facts.
+
+``QualityDailyFact`` holds received, accepted and rejected quantities per
+inspection day, item, vendor and rejection reason. ``post_inspections``
+adds every posted inspection line to it with ``core.rollups.apply_deltas``,
+so trends and Pareto charts group a few fact rows instead of joining the
+inspection lines through the GRNs to the purchase orders.
+"""
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from core.rollups import apply_deltas
+from quality.models import QualityDailyFact, QualityInspectionItem
+
+
+KEY_FIELDS = ("day", "item_id", "vendor_id", "reason_id")
+
+DIMENSIONS = {
+    "item": ("item_id", "item__code"),
+    "vendor": ("vendor_id", "vendor__code"),
+    "reason": ("reason_id", "reason__description"),
+}
+
+PERIODS = {
+    "day": F("day"),
+    "week": TruncWeek("day"),
+    "month": TruncMonth("day"),
+}
+
+
+def _fact_deltas(lines, sign=1):
+    deltas = {}
+    for day, item_id, vendor_id, reason_id, received, accepted, rejected in lines:
+        changes = deltas.setdefault(
+            (day, item_id, vendor_id, reason_id),
+            {
+                "line_count": 0,
+                "received_quantity": 0,
+                "accepted_quantity": 0,
+                "rejected_quantity": 0,
+            },
+        )
+        changes["line_count"] += sign
+        changes["received_quantity"] += sign * received
+        changes["accepted_quantity"] += sign * accepted
+        changes["rejected_quantity"] += sign * rejected
+    return deltas
+
+
+def record_facts(lines, sign=1):
+    """
+    Add posted inspection lines, given as ``(inspection_date, item_id,
+    vendor_id, rejection_reason_id, received_quantity, accepted_quantity,
+    rejected_quantity)`` tuples, to the daily facts.
+    """
+    apply_deltas(QualityDailyFact, KEY_FIELDS, _fact_deltas(lines, sign))
+
+
+def rebuild():
+    """
+    Rebuild the daily facts from the posted inspections.
+    """
+    lines = QualityInspectionItem.objects.filter(
+        inspection__posted_at__isnull=False
+    )
+    with transaction.atomic():
+        QualityDailyFact.objects.all().delete()
+        apply_deltas(
+            QualityDailyFact,
+            KEY_FIELDS,
+            _fact_deltas(
+                lines.values_list(
+                    "inspection__inspection_date",
+                    "item_id",
+                    "inspection__grn__purchase_order__vendor_id",
+                    "rejection_reason_id",
+                    "received_quantity",
+                    "accepted_quantity",
+                    "rejected_quantity",
+                ).iterator()
+            ),
+        )
+
+
+def _facts(start=None, end=None, **filters):
+    facts = QualityDailyFact.objects.filter(
+        **{field: value for field, value in filters.items() if value is not None}
+    )
+    if start is not None:
+        facts = facts.filter(day__gte=start)
+    if end is not None:
+        facts = facts.filter(day__lte=end)
+    return facts.order_by()
+
+
+def _totals():
+    return {
+        "line_count": Sum("line_count"),
+        "received_quantity": Sum("received_quantity"),
+        "accepted_quantity": Sum("accepted_quantity"),
+        "rejected_quantity": Sum("rejected_quantity"),
+    }
+
+
+def _rate(rejected, received):
+    return rejected / received if received else None
+
+
+def rejection_trend(
+    by="item",
+    period="month",
+    start=None,
+    end=None,
+    item=None,
+    vendor=None,
+    reason=None,
+):
+    """
+    Rejection rate over time per ``by`` ("item", "vendor" or "reason"),
+    bucketed by ``period`` ("day", "week" or "month"), in one query.
+
+    Returns rows with ``key``, ``label``, ``period`` and the summed
+    quantities plus ``rejection_rate``, ordered by key and period. The rate
+    of a reason is its rejected quantity over everything received by the
+    rows it appears in; for reason trends, pass ``item`` or ``vendor`` to
+    narrow them.
+    """
+    key, label = DIMENSIONS[by]
+    rows = (
+        _facts(start, end, item=item, vendor=vendor, reason=reason)
+        .annotate(period=PERIODS[period])
+        .values(key, "period")
+        .annotate(label=F(label), **_totals())
+        .order_by(label, "period")
+    )
+    trend = []
+    for row in rows:
+        row["key"] = row.pop(key)
+        row["rejection_rate"] = _rate(
+            row["rejected_quantity"], row["received_quantity"]
+        )
+        trend.append(row)
+    return trend
+
+
+def rejection_pareto(by="reason", start=None, end=None, item=None, vendor=None):
+    """
+    Rejected quantity per ``by`` ("reason", "item" or "vendor"), largest
+    first, with each row's ``share`` of all rejections and the
+    ``cumulative_share`` for a Pareto chart. Rows without rejections are
+    left out; rejections recorded without a reason show under ``key=None``.
+    """
+    key, label = DIMENSIONS[by]
+    rows = list(
+        _facts(start, end, item=item, vendor=vendor)
+        .filter(rejected_quantity__gt=0)
+        .values(key)
+        .annotate(label=F(label), rejected_quantity=Sum("rejected_quantity"))
+        .order_by("-rejected_quantity", label)
+    )
+    total = sum(row["rejected_quantity"] for row in rows)
+    cumulative = 0
+    for row in rows:
+        row["key"] = row.pop(key)
+        cumulative += row["rejected_quantity"]
+        row["share"] = _rate(row["rejected_quantity"], total)
+        row["cumulative_share"] = _rate(cumulative, total)
+    return rows
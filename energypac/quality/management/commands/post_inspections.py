@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+
+from quality.models import QualityInspection
+from quality.services import post_inspections
+
+
+class Command(BaseCommand):
+    help = "Post approved quality inspections to the stock ledger in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of inspections posted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        inspection_ids = list(
+            QualityInspection.objects.filter(
+                status=QualityInspection.StatusChoices.APPROVED,
+                posted_at__isnull=True,
+            )
+            .order_by("inspection_date", "pk")
+            .values_list("pk", flat=True)
+        )
+        batch_size = options["batch_size"]
+
+        posted = 0
+        mismatches = []
+        shortages = []
+        for start in range(0, len(inspection_ids), batch_size):
+            entries, lines, short = post_inspections(
+                inspection_ids[start:start + batch_size]
+            )
+            posted += len(entries)
+            mismatches.extend(lines)
+            shortages.extend(short)
+
+        for line in mismatches:
+            self.stdout.write(
+                f"{line['grn_number']}: item {line['item_id']} received "
+                f"{line['received_quantity']} (GRN line {line['grn_received']} "
+                f"of {line['grn_quantity']}), "
+                f"accepted {line['accepted_quantity']}, "
+                f"rejected {line['rejected_quantity']}"
+            )
+        for shortage in shortages:
+            self.stdout.write(
+                f"{shortage['grn_number']}: item {shortage['item_id']} rejects "
+                f"{shortage['requested']} exceed the {shortage['available']} "
+                f"available"
+            )
+        message = (
+            f"Posted {posted} ledger entry(ies) from {len(inspection_ids)} "
+            f"inspection(s); {len(mismatches)} line(s) do not add up, "
+            f"{len(shortages)} reject(s) are no longer in stock."
+        )
+        style = self.style.WARNING if mismatches or shortages else self.style.SUCCESS
+        self.stdout.write(style(message))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from quality.analytics import rebuild
+from quality.models import QualityDailyFact
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily QC facts from posted quality inspections."
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt QC facts: {QualityDailyFact.objects.count()} row(s)."
+            )
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quality', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qualityinspection',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, help_text='When the results were posted to the stock ledger', null=True),
+        ),
+    ]
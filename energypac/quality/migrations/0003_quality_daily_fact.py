@@ -0,0 +1,87 @@
+# Generated by Django 5.2 on 2026-10-18 11:46
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+def populate_facts(apps, schema_editor):
+    QualityDailyFact = apps.get_model('quality', 'QualityDailyFact')
+    rows = (
+        apps.get_model('quality', 'QualityInspectionItem')
+        .objects.filter(inspection__posted_at__isnull=False)
+        .order_by()
+        .values_list(
+            'inspection__inspection_date',
+            'item_id',
+            'inspection__grn__purchase_order__vendor_id',
+            'rejection_reason_id',
+        )
+        .annotate(
+            line_count=Count('pk'),
+            received=Sum('received_quantity'),
+            accepted=Sum('accepted_quantity'),
+            rejected=Sum('rejected_quantity'),
+        )
+    )
+    QualityDailyFact.objects.bulk_create(
+        (
+            QualityDailyFact(
+                day=day,
+                item_id=item_id,
+                vendor_id=vendor_id,
+                reason_id=reason_id,
+                line_count=line_count,
+                received_quantity=received,
+                accepted_quantity=accepted,
+                rejected_quantity=rejected,
+            )
+            for (
+                day,
+                item_id,
+                vendor_id,
+                reason_id,
+                line_count,
+                received,
+                accepted,
+                rejected,
+            ) in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0002_price_history'),
+        ('masters', '0003_customer_credit_limit'),
+        ('quality', '0002_qualityinspection_posted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QualityDailyFact',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField(help_text='Inspection date')),
+                ('line_count', models.IntegerField(default=0)),
+                ('received_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('accepted_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('rejected_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='qc_facts', to='items.item')),
+                ('reason', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='qc_facts', to='quality.rejectionreason')),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='qc_facts', to='masters.vendor')),
+            ],
+            options={
+                'verbose_name': 'Quality Daily Fact',
+                'verbose_name_plural': 'Quality Daily Facts',
+                'db_table': 'quality_daily_facts',
+                'indexes': [models.Index(fields=['item', 'day'], name='quality_dai_item_id_1b7ba8_idx'), models.Index(fields=['reason', 'day'], name='quality_dai_reason__90fcf0_idx'), models.Index(fields=['vendor', 'day'], name='quality_dai_vendor__b8ef82_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'item', 'vendor', 'reason'), name='uniq_quality_fact_day_item_vendor_reason')],
+            },
+        ),
+        migrations.RunPython(populate_facts, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 from core.models import UUIDModel, TimeStampedModel, StatusModel
 from inventory.models import GoodsReceiptNote, GoodsReceiptItem
 from items.models import Item
+from masters.models import Vendor
 
 
 class RejectionReason(UUIDModel, TimeStampedModel, StatusModel):
@@ -43,6 +44,12 @@ class QualityInspection(UUIDModel, TimeStampedModel, StatusModel):
 
     remarks = models.TextField(blank=True)
 
+    posted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the results were posted to the stock ledger"
+    )
+
     class Meta:
         db_table = "quality_inspections"
         verbose_name = "Quality Inspection"
@@ -107,3 +114,74 @@ class QualityInspectionItem(UUIDModel, TimeStampedModel):
 
     def __str__(self):
         return f"{self.inspection.grn.grn_number} - {self.item.code}"
+
+
+class QualityDailyFact(UUIDModel, TimeStampedModel):
+    """
+    Daily QC results per item, vendor and rejection reason.
+    Added to when inspections are posted, so quality analytics never read
+    the inspection lines.
+    """
+
+    day = models.DateField(help_text="Inspection date")
+
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="qc_facts"
+    )
+
+    vendor = models.ForeignKey(
+        Vendor,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="qc_facts"
+    )
+
+    reason = models.ForeignKey(
+        RejectionReason,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="qc_facts"
+    )
+
+    line_count = models.IntegerField(default=0)
+
+    received_quantity = models.DecimalField(
+        max_digits=15,
+        decimal_places=3,
+        default=0
+    )
+
+    accepted_quantity = models.DecimalField(
+        max_digits=15,
+        decimal_places=3,
+        default=0
+    )
+
+    rejected_quantity = models.DecimalField(
+        max_digits=15,
+        decimal_places=3,
+        default=0
+    )
+
+    class Meta:
+        db_table = "quality_daily_facts"
+        verbose_name = "Quality Daily Fact"
+        verbose_name_plural = "Quality Daily Facts"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "item", "vendor", "reason"],
+                name="uniq_quality_fact_day_item_vendor_reason",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["item", "day"]),
+            models.Index(fields=["reason", "day"]),
+            models.Index(fields=["vendor", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} | {self.item.code}"
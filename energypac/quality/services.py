@@ -0,0 +1,259 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from inventory.models import StockBalance, StockLedger
+from inventory.reservations import InsufficientStock, take_stock
+from inventory.services import GRN_REFERENCE, mark_received
+from masters.models import Warehouse
+from procurement.performance import record_inspections
+from procurement.services import apply_receipts
+from quality.analytics import record_facts
+from quality.models import QualityInspection, QualityInspectionItem
+
+
+QC_REJECT_REFERENCE = "QC_REJECT"
+
+
+def _pks(objects):
+    return [getattr(obj, "pk", obj) for obj in objects]
+
+
+def quarantine_warehouse():
+    """
+    Warehouse receiving rejected stock, from ``QC_QUARANTINE_WAREHOUSE_CODE``.
+    """
+    code = settings.QC_QUARANTINE_WAREHOUSE_CODE
+    try:
+        return Warehouse.objects.get(code=code)
+    except Warehouse.DoesNotExist:
+        raise ImproperlyConfigured(f"Quarantine warehouse {code!r} does not exist.")
+
+
+def inspection_mismatches(inspection_ids):
+    """
+    Inspection lines whose accepted and rejected quantities do not add up to
+    the received quantity, or whose GRN line is received in a different
+    total than its quantity, in one query. An inspection may split a GRN
+    line over several lines, e.g. one per rejection reason.
+    """
+    received = (
+        QualityInspectionItem.objects.filter(
+            inspection_id=OuterRef("inspection_id"),
+            grn_item_id=OuterRef("grn_item_id"),
+        )
+        .order_by()
+        .values("grn_item_id")
+        .annotate(total=Sum("received_quantity"))
+        .values("total")
+    )
+    return list(
+        QualityInspectionItem.objects.filter(inspection_id__in=inspection_ids)
+        .annotate(grn_received=Subquery(received))
+        .filter(
+            ~Q(received_quantity=F("accepted_quantity") + F("rejected_quantity"))
+            | ~Q(grn_received=F("grn_item__quantity"))
+        )
+        .order_by("inspection__grn__grn_number", "pk")
+        .values(
+            "inspection_id",
+            "grn_item_id",
+            "item_id",
+            "received_quantity",
+            "accepted_quantity",
+            "rejected_quantity",
+            "grn_received",
+            line_id=F("pk"),
+            grn_number=F("inspection__grn__grn_number"),
+            grn_quantity=F("grn_item__quantity"),
+        )
+    )
+
+
+def _take_rejects(lines):
+    """
+    Take the rejects of inspection ``lines`` already received off the GRN
+    warehouse balances, one savepoint per inspection in GRN number order.
+    Returns the shortages of the inspections that could not be taken;
+    nothing is taken for them.
+    """
+    rejects = {}
+    for line in lines:
+        if line["received"] and line["rejected_quantity"]:
+            totals = rejects.setdefault(
+                (line["grn_number"], line["inspection_id"]), {}
+            )
+            key = (line["item_id"], line["warehouse_id"])
+            totals[key] = totals.get(key, 0) + line["rejected_quantity"]
+
+    shortages = []
+    for (grn_number, inspection_id), totals in sorted(rejects.items()):
+        try:
+            with transaction.atomic():
+                take_stock(totals)
+        except InsufficientStock as exc:
+            shortages.extend(
+                {"inspection_id": inspection_id, "grn_number": grn_number, **shortage}
+                for shortage in exc.shortages
+            )
+    return shortages
+
+
+def post_inspections(inspections):
+    """
+    Post approved quality inspections to the stock ledger.
+
+    ``inspections`` may be instances or primary keys. For GRN lines that are
+    not received yet, the accepted quantity goes in to the GRN's warehouse
+    with ``reference_type="GRN"`` and ``reference_id`` set to the GRN line
+    (``post_grns`` leaves inspected lines to this step), and the GRN lines
+    and purchase order lines are marked received. The rejected quantity goes in
+    to the quarantine warehouse with ``reference_type="QC_REJECT"`` and
+    ``reference_id`` set to the inspection line; when the GRN line was
+    already received it is moved out of the GRN's warehouse first, which is
+    checked against the stock available there as ``issue_stock`` does.
+
+    Inspections with lines that do not add up, or whose rejects are no
+    longer available to move, are skipped. Everything else
+    is written with one ``bulk_create`` in a single transaction, the
+    inspections are stamped ``posted_at`` and added to the vendor
+    performance rollups and the daily QC facts, and posting can safely be
+    repeated.
+
+    Returns ``(entries, mismatches, shortages)``: the ledger entries
+    created, the offending lines as returned by ``inspection_mismatches()``
+    and the shortages of ``InsufficientStock``, each with the
+    ``inspection_id`` and ``grn_number`` it held back.
+    """
+    with transaction.atomic():
+        # Lock the inspections so two posting runs cannot both post them.
+        inspection_ids = list(
+            QualityInspection.objects.select_for_update()
+            .filter(
+                pk__in=_pks(inspections),
+                status=QualityInspection.StatusChoices.APPROVED,
+                posted_at__isnull=True,
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        if not inspection_ids:
+            return [], [], []
+
+        mismatches = inspection_mismatches(inspection_ids)
+        skipped = {line["inspection_id"] for line in mismatches}
+        inspection_ids = [pk for pk in inspection_ids if pk not in skipped]
+
+        lines = list(
+            QualityInspectionItem.objects.filter(
+                inspection_id__in=inspection_ids
+            ).values(
+                "pk",
+                "inspection_id",
+                "grn_item_id",
+                "item_id",
+                "received_quantity",
+                "accepted_quantity",
+                "rejected_quantity",
+                "rejection_reason_id",
+                grn_id=F("inspection__grn_id"),
+                received=Q(grn_item__posted_at__isnull=False),
+                day=F("inspection__inspection_date"),
+                warehouse_id=F("inspection__grn__warehouse_id"),
+                grn_number=F("inspection__grn__grn_number"),
+                purchase_order_id=F("inspection__grn__purchase_order_id"),
+                vendor_id=F("inspection__grn__purchase_order__vendor_id"),
+            )
+        )
+        shortages = _take_rejects(lines)
+        if shortages:
+            short = {shortage["inspection_id"] for shortage in shortages}
+            inspection_ids = [pk for pk in inspection_ids if pk not in short]
+            lines = [line for line in lines if line["inspection_id"] not in short]
+
+        quarantine = None
+        if any(line["rejected_quantity"] for line in lines):
+            quarantine = quarantine_warehouse().pk
+
+        IN, OUT = StockLedger.MovementType.IN, StockLedger.MovementType.OUT
+        # (line, warehouse_id, movement type, quantity, reference type, id field)
+        movements = []
+        receipts = {}
+        received_ids = []
+        for line in lines:
+            accepted = line["accepted_quantity"]
+            rejected = line["rejected_quantity"]
+            warehouse_id = line["warehouse_id"]
+            received = line["received"]
+            if not received:
+                received_ids.append(line["grn_item_id"])
+                if accepted:
+                    movements.append(
+                        (line, warehouse_id, IN, accepted, GRN_REFERENCE, "grn_item_id")
+                    )
+                key = (line["purchase_order_id"], line["item_id"])
+                receipts[key] = receipts.get(key, 0) + accepted + rejected
+            if rejected:
+                if received:
+                    # Already received in full: move the rejects out again.
+                    movements.append(
+                        (line, warehouse_id, OUT, rejected, QC_REJECT_REFERENCE, "pk")
+                    )
+                movements.append(
+                    (line, quarantine, IN, rejected, QC_REJECT_REFERENCE, "pk")
+                )
+
+        entries = [
+            StockLedger(
+                item_id=line["item_id"],
+                warehouse_id=warehouse_id,
+                movement_type=movement_type,
+                quantity=quantity,
+                reference_type=reference_type,
+                reference_id=line[reference_field],
+                remarks=line["grn_number"],
+            )
+            for (
+                line,
+                warehouse_id,
+                movement_type,
+                quantity,
+                reference_type,
+                reference_field,
+            ) in movements
+        ]
+        apply_receipts(receipts)
+        mark_received(received_ids, {line["grn_id"] for line in lines})
+        record_inspections(
+            (
+                line["vendor_id"],
+                line["day"],
+                line["rejection_reason_id"],
+                line["received_quantity"],
+                line["rejected_quantity"],
+            )
+            for line in lines
+        )
+        record_facts(
+            (
+                line["day"],
+                line["item_id"],
+                line["vendor_id"],
+                line["rejection_reason_id"],
+                line["received_quantity"],
+                line["accepted_quantity"],
+                line["rejected_quantity"],
+            )
+            for line in lines
+        )
+        QualityInspection.objects.filter(pk__in=inspection_ids).update(
+            posted_at=timezone.now()
+        )
+        # The rejects moved out were taken off the balances by _take_rejects.
+        entries = StockLedger.objects.bulk_create(entries, update_balances=False)
+        StockBalance.objects.apply_movements(
+            entry for entry in entries if entry.movement_type == IN
+        )
+        return entries, mismatches, shortages
@@ -1,3 +1,326 @@
+import datetime
+import io
+import uuid
+from decimal import Decimal
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from inventory.models import GoodsReceiptItem, GoodsReceiptNote, StockBalance
+from inventory.reservations import issue_stock
+from inventory.services import post_grns
+from items.models import Item, ItemType
+from masters.models import UnitOfMeasure, Vendor, Warehouse
+from procurement.models import PurchaseOrder, PurchaseOrderItem
+from quality.models import (
+    QualityDailyFact,
+    QualityInspection,
+    QualityInspectionItem,
+    RejectionReason,
+)
+from quality.analytics import (
+    rebuild,
+    record_facts,
+    rejection_pareto,
+    rejection_trend,
+)
+from quality.services import post_inspections
+
+
+class InspectionPostingTests(TestCase):
+    """
+    Inspections post accepted stock to the GRN's warehouse and rejects to
+    quarantine, skip lines that do not add up or rejects no longer in stock,
+    and post only once.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.quarantine = Warehouse.objects.create(name="Quarantine", code="QUAR")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+        self.order = PurchaseOrder.objects.create(
+            po_number="PO-1",
+            vendor=Vendor.objects.create(name="Bharat Cables", code="BCL"),
+            order_date=datetime.date(2026, 4, 1),
+            status=PurchaseOrder.StatusChoices.APPROVED,
+        )
+        self.order_line = PurchaseOrderItem.objects.create(
+            purchase_order=self.order, item=self.item, quantity=30, rate=100
+        )
+        self.reason = RejectionReason.objects.create(code="DMG", description="Damaged")
+
+    def receive(self, number, quantity):
+        grn = GoodsReceiptNote.objects.create(
+            grn_number=number,
+            purchase_order=self.order,
+            received_date=datetime.date(2026, 4, 10),
+            warehouse=self.warehouse,
+            status=GoodsReceiptNote.StatusChoices.APPROVED,
+        )
+        GoodsReceiptItem.objects.create(
+            grn=grn,
+            item=self.item,
+            quantity=quantity,
+            purchase_order_item=self.order_line,
+        )
+        return grn
+
+    def inspect(self, grn, accepted, rejected, received=None):
+        inspection = QualityInspection.objects.create(
+            grn=grn,
+            inspection_date=datetime.date(2026, 4, 11),
+            status=QualityInspection.StatusChoices.APPROVED,
+        )
+        QualityInspectionItem.objects.create(
+            inspection=inspection,
+            grn_item=grn.items.get(),
+            item=self.item,
+            received_quantity=accepted + rejected if received is None else received,
+            accepted_quantity=accepted,
+            rejected_quantity=rejected,
+            rejection_reason=self.reason if rejected else None,
+        )
+        return inspection
+
+    def assertStock(self, on_hand, quarantined):
+        self.assertEqual(
+            StockBalance.objects.on_hand(self.item, self.warehouse), on_hand
+        )
+        self.assertEqual(
+            StockBalance.objects.on_hand(self.item, self.quarantine), quarantined
+        )
+
+    def posted(self, *inspections):
+        return [
+            QualityInspection.objects.get(pk=inspection.pk).posted_at is not None
+            for inspection in inspections
+        ]
+
+    def test_inspections_are_posted_in_bulk(self):
+        first = self.inspect(self.receive("GRN-1", 10), accepted=8, rejected=2)
+        second = self.inspect(self.receive("GRN-2", 5), accepted=5, rejected=0)
+
+        entries, mismatches, shortages = post_inspections([first.pk, second])
+
+        self.assertEqual(len(entries), 3)
+        self.assertEqual((mismatches, shortages), ([], []))
+        self.assertStock(on_hand=13, quarantined=2)
+        self.order_line.refresh_from_db()
+        self.assertEqual(self.order_line.received_quantity, 15)
+        self.assertFalse(
+            GoodsReceiptItem.objects.filter(posted_at__isnull=True).exists()
+        )
+        self.assertEqual(self.posted(first, second), [True, True])
+        self.assertEqual(
+            sum(QualityDailyFact.objects.values_list("rejected_quantity", flat=True)),
+            2,
+        )
+
+    def test_posting_again_posts_nothing(self):
+        inspection = self.inspect(self.receive("GRN-1", 10), accepted=8, rejected=2)
+        post_inspections([inspection])
+
+        self.assertEqual(post_inspections([inspection]), ([], [], []))
+        self.assertStock(on_hand=8, quarantined=2)
+        self.assertEqual(
+            sum(QualityDailyFact.objects.values_list("line_count", flat=True)), 1
+        )
+
+    def test_lines_that_do_not_add_up_are_skipped(self):
+        unbalanced = self.inspect(
+            self.receive("GRN-1", 10), accepted=8, rejected=1, received=10
+        )
+        short = self.inspect(
+            self.receive("GRN-2", 5), accepted=3, rejected=1, received=4
+        )
+        good = self.inspect(self.receive("GRN-3", 3), accepted=3, rejected=0)
+
+        entries, mismatches, _ = post_inspections([unbalanced, short, good])
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(
+            [(line["grn_number"], line["grn_quantity"]) for line in mismatches],
+            [("GRN-1", Decimal("10")), ("GRN-2", Decimal("5"))],
+        )
+        self.assertStock(on_hand=3, quarantined=0)
+        self.assertEqual(self.posted(unbalanced, short, good), [False, False, True])
+
+    def test_rebuild_matches_posted_facts(self):
+        post_inspections(
+            [
+                self.inspect(self.receive("GRN-1", 10), accepted=8, rejected=2),
+                self.inspect(self.receive("GRN-2", 5), accepted=5, rejected=0),
+            ]
+        )
+        self.inspect(self.receive("GRN-3", 4), accepted=0, rejected=4)
+        facts = list(
+            QualityDailyFact.objects.order_by("reason").values_list(
+                "day",
+                "vendor_id",
+                "reason_id",
+                "line_count",
+                "received_quantity",
+                "accepted_quantity",
+                "rejected_quantity",
+            )
+        )
+        self.assertEqual(len(facts), 2)
+
+        QualityDailyFact.objects.update(line_count=9, rejected_quantity=0)
+        rebuild()
+
+        self.assertEqual(
+            list(
+                QualityDailyFact.objects.order_by("reason").values_list(
+                    "day",
+                    "vendor_id",
+                    "reason_id",
+                    "line_count",
+                    "received_quantity",
+                    "accepted_quantity",
+                    "rejected_quantity",
+                )
+            ),
+            facts,
+        )
+
+    def test_rejects_of_received_lines_move_to_quarantine(self):
+        grn = self.receive("GRN-1", 10)
+        post_grns([grn])
+        self.assertStock(on_hand=10, quarantined=0)
+
+        post_inspections([self.inspect(grn, accepted=7, rejected=3)])
+
+        self.assertStock(on_hand=7, quarantined=3)
+        self.order_line.refresh_from_db()
+        self.assertEqual(self.order_line.received_quantity, 10)
+
+    def test_rejects_no_longer_in_stock_hold_back_their_inspection(self):
+        grns = [self.receive("GRN-1", 10), self.receive("GRN-2", 5)]
+        post_grns(grns)
+        issue_stock([(self.item, self.warehouse, 13)], "ISSUE", uuid.uuid4())
+        issued = self.inspect(grns[0], accepted=7, rejected=3)
+        other = self.inspect(grns[1], accepted=4, rejected=1)
+
+        output = io.StringIO()
+        call_command("post_inspections", stdout=output)
+
+        self.assertIn("GRN-1: item", output.getvalue())
+        self.assertIn("1 reject(s) are no longer in stock", output.getvalue())
+        self.assertEqual(self.posted(issued, other), [False, True])
+        self.assertStock(on_hand=1, quarantined=1)
+
+
+class QualityAnalyticsTests(TestCase):
+    """
+    Daily QC facts add up posted lines, and rejection trends and Pareto
+    charts are grouped from them.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.cable, self.wire = [
+            Item.objects.create(
+                code=code, name=code, item_type=ItemType.RAW_MATERIAL, uom=uom
+            )
+            for code in ("CABLE-1", "WIRE-1")
+        ]
+        self.vendor = Vendor.objects.create(name="Bharat Cables", code="BCL")
+        self.damaged = RejectionReason.objects.create(code="DMG", description="Damaged")
+        self.rusted = RejectionReason.objects.create(code="RUST", description="Rust")
+
+        first = (datetime.date(2026, 4, 6), self.cable.pk, self.damaged.pk, 10, 8, 2)
+        self.record(
+            first,
+            first,
+            (datetime.date(2026, 4, 20), self.cable.pk, None, 10, 10, 0),
+            (datetime.date(2026, 4, 21), self.wire.pk, None, 5, 4, 1),
+            (datetime.date(2026, 5, 4), self.cable.pk, self.rusted.pk, 20, 15, 5),
+            (datetime.date(2026, 5, 4), self.wire.pk, self.damaged.pk, 10, 9, 1),
+            (datetime.date(2026, 5, 5), self.wire.pk, self.damaged.pk, 10, 7, 3),
+        )
+        # The first line was recorded twice; take one off again.
+        self.record(first, sign=-1)
+
+    def record(self, *lines, sign=1):
+        record_facts(
+            (
+                (day, item_id, self.vendor.pk, reason_id, received, accepted, rejected)
+                for day, item_id, reason_id, received, accepted, rejected in lines
+            ),
+            sign=sign,
+        )
+
+    def rows(self, rows, *fields):
+        return [tuple(row[field] for field in fields) for row in rows]
+
+    def test_lines_add_up_per_day_item_vendor_and_reason(self):
+        fact = QualityDailyFact.objects.get(
+            day=datetime.date(2026, 4, 6), item=self.cable, reason=self.damaged
+        )
+        self.assertEqual(
+            (fact.line_count, fact.received_quantity, fact.rejected_quantity),
+            (1, 10, 2),
+        )
+        self.assertEqual(QualityDailyFact.objects.count(), 6)
+
+    def test_rejection_trend(self):
+        self.assertEqual(
+            self.rows(
+                rejection_trend(),
+                "label",
+                "period",
+                "line_count",
+                "received_quantity",
+                "rejection_rate",
+            ),
+            [
+                ("CABLE-1", datetime.date(2026, 4, 1), 2, 20, Decimal("0.1")),
+                ("CABLE-1", datetime.date(2026, 5, 1), 1, 20, Decimal("0.25")),
+                ("WIRE-1", datetime.date(2026, 4, 1), 1, 5, Decimal("0.2")),
+                ("WIRE-1", datetime.date(2026, 5, 1), 2, 20, Decimal("0.2")),
+            ],
+        )
+        self.assertEqual(
+            self.rows(
+                rejection_trend(
+                    by="reason",
+                    period="week",
+                    start=datetime.date(2026, 5, 1),
+                    item=self.wire,
+                ),
+                "key",
+                "period",
+                "rejected_quantity",
+            ),
+            [(self.damaged.pk, datetime.date(2026, 5, 4), 4)],
+        )
+
+    def test_rejection_pareto(self):
+        self.assertEqual(
+            self.rows(
+                rejection_pareto(), "label", "rejected_quantity", "cumulative_share"
+            ),
+            [
+                ("Damaged", 6, Decimal("0.5")),
+                ("Rust", 5, Decimal("11") / Decimal("12")),
+                (None, 1, 1),
+            ],
+        )
+        self.assertEqual(
+            self.rows(
+                rejection_pareto(by="item", end=datetime.date(2026, 4, 30)),
+                "key",
+                "share",
+            ),
+            [
+                (self.cable.pk, Decimal("2") / Decimal("3")),
+                (self.wire.pk, Decimal("1") / Decimal("3")),
+            ],
+        )
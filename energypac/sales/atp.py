@@ -0,0 +1,233 @@
+"""
+Time-phased available-to-promise (ATP).
+
+Each item has a cached profile of its future supply (open purchase order
+lines by delivery date) and committed demand (undispatched sales order
+quantities by order date). Profiles are rebuilt in set-based queries only
+for items whose cache entry is missing, and entries are dropped once a
+transaction changing a purchase order, sales order, dispatch or stock
+ledger entry of the item commits. A promise check then reads cached
+profiles plus the current stock balances and reservations. Reservations
+for open sales orders are not taken off stock, since the order lines are
+already counted as demand.
+"""
+
+import bisect
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+
+from core.models import StatusModel
+from inventory.models import StockBalance, StockReservation
+from procurement.models import PurchaseOrderItem
+from sales.models import SalesOrderItem
+from sales.services import ORDER_RESERVATION_REFERENCE
+
+
+OPEN_STATUSES = (
+    StatusModel.StatusChoices.SUBMITTED,
+    StatusModel.StatusChoices.APPROVED,
+)
+
+ZERO = Decimal("0")
+
+
+def _cache_key(item_id):
+    return f"atp:profile:{item_id}"
+
+
+def _timeout():
+    return getattr(settings, "ATP_CACHE_TIMEOUT", 3600)
+
+
+def _buckets(queryset, date_field, field="quantity"):
+    return (
+        queryset.order_by()
+        .values_list("item_id", date_field)
+        .annotate(total=Sum(field))
+    )
+
+
+def build_profiles(item_ids):
+    """
+    Net supply minus demand per date for each item, as sorted
+    ``[(date, change), ...]`` lists keyed by item id.
+    """
+    changes = {item_id: {} for item_id in item_ids}
+
+    def add(rows, sign):
+        for item_id, day, quantity in rows:
+            dates = changes[item_id]
+            dates[day] = dates.get(day, ZERO) + sign * quantity
+
+    add(
+        _buckets(
+            PurchaseOrderItem.objects.filter(
+                item__in=item_ids,
+                open_quantity__gt=0,
+                purchase_order__status__in=OPEN_STATUSES,
+                purchase_order__is_active=True,
+                purchase_order__delivery_date__isnull=False,
+            ),
+            "purchase_order__delivery_date",
+            "open_quantity",
+        ),
+        1,
+    )
+    add(
+        _buckets(
+            SalesOrderItem.objects.filter(
+                item__in=item_ids,
+                pending_quantity__gt=0,
+                order__status__in=OPEN_STATUSES,
+                order__is_active=True,
+            ),
+            "order__order_date",
+            "pending_quantity",
+        ),
+        -1,
+    )
+
+    return {
+        item_id: sorted((day, change) for day, change in dates.items() if change)
+        for item_id, dates in changes.items()
+    }
+
+
+def get_profiles(item_ids):
+    """
+    Cached profiles for ``item_ids``; only missing ones are rebuilt.
+    """
+    item_ids = list(item_ids)
+    profiles = {}
+    cached = cache.get_many([_cache_key(item_id) for item_id in item_ids])
+    missing = []
+    for item_id in item_ids:
+        profile = cached.get(_cache_key(item_id))
+        if profile is None:
+            missing.append(item_id)
+        else:
+            profiles[item_id] = profile
+
+    if missing:
+        built = build_profiles(missing)
+        cache.set_many(
+            {_cache_key(item_id): profile for item_id, profile in built.items()},
+            _timeout(),
+        )
+        profiles.update(built)
+
+    return profiles
+
+
+def invalidate(item_ids):
+    """
+    Drop the cached profiles of ``item_ids`` when the current transaction
+    commits, so a concurrent rebuild cannot cache uncommitted changes.
+    """
+    keys = [_cache_key(item_id) for item_id in set(item_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def reserved_for_demand(item_ids=None, warehouses=None):
+    """
+    Stock reserved for open sales order lines, up to what they still have
+    to dispatch, per item outside the quarantine warehouse.
+
+    That stock is already counted as demand through the lines' pending
+    quantity, so availability adds it back to unreserved stock instead of
+    taking it off twice.
+    """
+    reservations = StockReservation.objects.filter(
+        reference_type=ORDER_RESERVATION_REFERENCE,
+        reservation_status=StockReservation.ReservationStatus.ACTIVE,
+    ).exclude(warehouse__code=settings.QC_QUARANTINE_WAREHOUSE_CODE)
+    if item_ids is not None:
+        reservations = reservations.filter(item__in=item_ids)
+    if warehouses is not None:
+        reservations = reservations.filter(warehouse__in=warehouses)
+    reserved = {
+        (order_id, item_id): total
+        for order_id, item_id, total in reservations.order_by()
+        .values_list("reference_id", "item_id")
+        .annotate(total=Sum("quantity"))
+    }
+    if not reserved:
+        return {}
+
+    pending = SalesOrderItem.objects.filter(
+        order_id__in={order_id for order_id, _ in reserved},
+        pending_quantity__gt=0,
+        order__status__in=OPEN_STATUSES,
+        order__is_active=True,
+    )
+    totals = {}
+    for order_id, item_id, quantity in (
+        pending.order_by()
+        .values_list("order_id", "item_id")
+        .annotate(total=Sum("pending_quantity"))
+    ):
+        held = min(reserved.get((order_id, item_id), ZERO), quantity)
+        totals[item_id] = totals.get(item_id, ZERO) + held
+    return totals
+
+
+def _on_hand(item_ids, warehouses):
+    """
+    Stock per item outside the quarantine warehouse that is not reserved
+    for anything but counted demand.
+    """
+    balances = StockBalance.objects.usable().filter(item__in=item_ids)
+    if warehouses is not None:
+        balances = balances.filter(warehouse__in=warehouses)
+    on_hand = dict(
+        balances.order_by()
+        .values("item_id")
+        .annotate(total=Sum(F("quantity") - F("reserved_quantity")))
+        .values_list("item_id", "total")
+    )
+    for item_id, quantity in reserved_for_demand(item_ids, warehouses).items():
+        on_hand[item_id] = (on_hand.get(item_id) or ZERO) + quantity
+    return on_hand
+
+
+def _promise(on_hand, profile, day):
+    """
+    Quantity that can be promised by ``day`` without breaking supply
+    already committed to later demand.
+    """
+    dates = [entry[0] for entry in profile]
+    available = on_hand
+    cumulative = [available]
+    for _, change in profile:
+        available += change
+        cumulative.append(available)
+
+    start = bisect.bisect_right(dates, day)
+    return max(min(cumulative[start:]), ZERO)
+
+
+def available_to_promise(items, day, warehouses=None):
+    """
+    Quantity of each item that can be promised by ``day``, keyed by item id.
+
+    ``items`` may be instances or ids. Unreserved stock is taken from all
+    warehouses but quarantine unless ``warehouses`` is given; stock reserved
+    for open sales orders counts, as their demand is in the profile.
+    """
+    item_ids = [getattr(item, "pk", item) for item in items]
+    profiles = get_profiles(item_ids)
+    on_hand = _on_hand(item_ids, warehouses)
+    return {
+        item_id: _promise(on_hand.get(item_id) or ZERO, profiles[item_id], day)
+        for item_id in item_ids
+    }
+
+
+def can_promise(item, quantity, day, warehouses=None):
+    item_id = getattr(item, "pk", item)
+    return available_to_promise([item_id], day, warehouses)[item_id] >= quantity
@@ -0,0 +1,40 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from sales.services import order_backlog
+
+
+class Command(BaseCommand):
+    help = "Report open sales order lines still to be dispatched, as CSV."
+
+    def handle(self, *args, **options):
+        writer = csv.writer(self.stdout)
+        writer.writerow(
+            [
+                "order",
+                "order_date",
+                "customer",
+                "item",
+                "ordered",
+                "dispatched",
+                "invoiced",
+                "pending",
+                "uninvoiced",
+            ]
+        )
+        for line in order_backlog().iterator(chunk_size=2000):
+            order = line.order
+            writer.writerow(
+                [
+                    order.order_number,
+                    order.order_date,
+                    order.customer.name if order.customer else order.customer_name,
+                    line.item.code,
+                    line.quantity,
+                    line.dispatched_quantity,
+                    line.invoiced_quantity,
+                    line.pending_quantity,
+                    line.uninvoiced_quantity,
+                ]
+            )
@@ -0,0 +1,79 @@
+# Generated by Django 5.2 on 2026-10-18 11:28
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+COUNTED_STATUSES = ['SUBMITTED', 'APPROVED', 'CLOSED']
+
+
+def populate_fulfilment(apps, schema_editor):
+    DispatchItem = apps.get_model('logistics', 'DispatchItem')
+    SalesInvoiceItem = apps.get_model('sales', 'SalesInvoiceItem')
+    SalesOrderItem = apps.get_model('sales', 'SalesOrderItem')
+
+    def totals(queryset, prefix):
+        return {
+            (row[f'{prefix}__order_id'], row['item_id']): row['total']
+            for row in queryset.filter(
+                **{f'{prefix}__status__in': COUNTED_STATUSES, f'{prefix}__is_active': True}
+            )
+            .exclude(**{f'{prefix}__order_id': None})
+            .order_by()
+            .values(f'{prefix}__order_id', 'item_id')
+            .annotate(total=Sum('quantity'))
+        }
+
+    counts = {
+        'dispatched_quantity': totals(DispatchItem.objects.all(), 'dispatch'),
+        'invoiced_quantity': totals(SalesInvoiceItem.objects.all(), 'invoice'),
+    }
+    lines = {}
+    for line in SalesOrderItem.objects.order_by('created_at', 'pk'):
+        lines.setdefault((line.order_id, line.item_id), []).append(line)
+
+    changed = []
+    for key, matching in lines.items():
+        for field, by_key in counts.items():
+            total = by_key.get(key, 0)
+            for index, line in enumerate(matching):
+                share = total if index == len(matching) - 1 else min(line.quantity, total)
+                setattr(line, field, share)
+                total -= share
+        changed.extend(matching)
+    SalesOrderItem.objects.bulk_update(
+        changed, ['dispatched_quantity', 'invoiced_quantity'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0001_initial'),
+        ('logistics', '0001_initial'),
+        ('sales', '0002_salesinvoice_customer_salesorder_customer_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='dispatched_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Quantity on dispatches against the order', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='invoiced_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Quantity on invoices against the order', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='pending_quantity',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantity'), '-', models.F('dispatched_quantity')), output_field=models.DecimalField(decimal_places=3, max_digits=12)),
+        ),
+        migrations.RunPython(populate_fulfilment, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='salesorderitem',
+            index=models.Index(condition=models.Q(('pending_quantity__gt', 0)), fields=['item', 'order'], name='so_item_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2 on 2026-10-18 11:33
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def populate_totals(apps, schema_editor):
+    # Lines carry no tax yet, so tax_amount keeps its default of zero.
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    line_total = Round(
+        ExpressionWrapper(F('quantity') * F('rate'), output_field=amount), 2
+    )
+    for document, line, field in [
+        ('SalesQuotation', 'SalesQuotationItem', 'quotation'),
+        ('SalesOrder', 'SalesOrderItem', 'order'),
+        ('SalesInvoice', 'SalesInvoiceItem', 'invoice'),
+    ]:
+        subtotal = (
+            apps.get_model('sales', line).objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Sum(line_total, output_field=amount))
+            .values('total')
+        )
+        apps.get_model('sales', document).objects.update(
+            subtotal=Coalesce(Subquery(subtotal, output_field=amount), Value(0))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0004_document_totals'),
+        ('sales', '0003_salesorderitem_fulfilment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesquotation',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesquotation',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='grand_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('subtotal'), '+', models.F('tax_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='grand_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('subtotal'), '+', models.F('tax_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+        migrations.AddField(
+            model_name='salesquotation',
+            name='grand_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('subtotal'), '+', models.F('tax_amount')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
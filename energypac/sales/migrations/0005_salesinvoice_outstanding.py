@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 11:35
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_amount_paid(apps, schema_editor):
+    InvoicePayment = apps.get_model('finance', 'InvoicePayment')
+    SalesInvoice = apps.get_model('sales', 'SalesInvoice')
+    paid = (
+        InvoicePayment.objects.filter(invoice=OuterRef('pk'))
+        .order_by()
+        .values('invoice')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    SalesInvoice.objects.update(
+        amount_paid=Coalesce(
+            Subquery(paid, output_field=models.DecimalField(max_digits=14, decimal_places=2)),
+            Value(0, output_field=models.DecimalField(max_digits=14, decimal_places=2)),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0001_initial'),
+        ('masters', '0002_customer_vendor'),
+        ('sales', '0004_document_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Sum of payments received against the invoice', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='outstanding',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('subtotal'), '+', models.F('tax_amount')), '-', models.F('amount_paid')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+        migrations.RunPython(populate_amount_paid, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='salesinvoice',
+            index=models.Index(condition=models.Q(('outstanding__gt', 0)), fields=['customer', 'invoice_date'], name='invoice_unpaid_idx'),
+        ),
+    ]
@@ -1,11 +1,21 @@
 from django.db import models
 
-from core.models import UUIDModel, TimeStampedModel, StatusModel
+from core.models import (
+    BulkSignalQuerySet,
+    DocumentTotalsModel,
+    MaintainedFieldsModel,
+    StatusModel,
+    TaxedLineModel,
+    TimeStampedModel,
+    UUIDModel,
+)
 from items.models import Item
 from masters.models import Customer
 
 
-class SalesQuotation(UUIDModel, TimeStampedModel, StatusModel):
+class SalesQuotation(
+    UUIDModel, TimeStampedModel, StatusModel, DocumentTotalsModel
+):
     """
     Sales Quotation.
     Represents an offer made to a customer.
@@ -42,7 +52,7 @@ class SalesQuotation(UUIDModel, TimeStampedModel, StatusModel):
         return self.quotation_number
 
 
-class SalesQuotationItem(UUIDModel, TimeStampedModel):
+class SalesQuotationItem(UUIDModel, TimeStampedModel, TaxedLineModel):
     """
     Line items for Sales Quotation.
     """
@@ -59,6 +69,8 @@ class SalesQuotationItem(UUIDModel, TimeStampedModel):
 
     rate = models.DecimalField(max_digits=12, decimal_places=2)
 
+    objects = BulkSignalQuerySet.as_manager()
+
     class Meta:
         db_table = "sales_quotation_items"
         verbose_name = "Sales Quotation Item"
@@ -68,7 +80,9 @@ class SalesQuotationItem(UUIDModel, TimeStampedModel):
         return f"{self.quotation.quotation_number} - {self.item.code}"
 
 
-class SalesOrder(UUIDModel, TimeStampedModel, StatusModel):
+class SalesOrder(
+    UUIDModel, TimeStampedModel, StatusModel, DocumentTotalsModel
+):
     """
     Sales Order.
     Represents a confirmed customer order.
@@ -109,7 +123,9 @@ class SalesOrder(UUIDModel, TimeStampedModel, StatusModel):
         return self.order_number
 
 
-class SalesOrderItem(UUIDModel, TimeStampedModel):
+class SalesOrderItem(
+    UUIDModel, TimeStampedModel, MaintainedFieldsModel, TaxedLineModel
+):
     """
     Line items for Sales Order.
     """
@@ -126,16 +142,49 @@ class SalesOrderItem(UUIDModel, TimeStampedModel):
 
     rate = models.DecimalField(max_digits=12, decimal_places=2)
 
+    dispatched_quantity = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        default=0,
+        help_text="Quantity on dispatches against the order",
+    )
+
+    invoiced_quantity = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        default=0,
+        help_text="Quantity on invoices against the order",
+    )
+
+    pending_quantity = models.GeneratedField(
+        expression=models.F("quantity") - models.F("dispatched_quantity"),
+        output_field=models.DecimalField(max_digits=12, decimal_places=3),
+        db_persist=True,
+    )
+
+    objects = BulkSignalQuerySet.as_manager()
+
+    maintained_fields = ("dispatched_quantity", "invoiced_quantity")
+
     class Meta:
         db_table = "sales_order_items"
         verbose_name = "Sales Order Item"
         verbose_name_plural = "Sales Order Items"
+        indexes = [
+            models.Index(
+                fields=["item", "order"],
+                condition=models.Q(pending_quantity__gt=0),
+                name="so_item_pending_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.order.order_number} - {self.item.code}"
 
 
-class SalesInvoice(UUIDModel, TimeStampedModel, StatusModel):
+class SalesInvoice(
+    UUIDModel, TimeStampedModel, StatusModel, DocumentTotalsModel
+):
     """
     Sales Invoice.
     Represents billing to customer.
@@ -167,16 +216,40 @@ class SalesInvoice(UUIDModel, TimeStampedModel, StatusModel):
 
     remarks = models.TextField(blank=True)
 
+    amount_paid = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Sum of payments received against the invoice",
+    )
+
+    outstanding = models.GeneratedField(
+        expression=(
+            models.F("subtotal") + models.F("tax_amount") - models.F("amount_paid")
+        ),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        db_persist=True,
+    )
+
+    maintained_fields = DocumentTotalsModel.maintained_fields + ("amount_paid",)
+
     class Meta:
         db_table = "sales_invoices"
         verbose_name = "Sales Invoice"
         verbose_name_plural = "Sales Invoices"
+        indexes = [
+            models.Index(
+                fields=["customer", "invoice_date"],
+                condition=models.Q(outstanding__gt=0),
+                name="invoice_unpaid_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.invoice_number
 
 
-class SalesInvoiceItem(UUIDModel, TimeStampedModel):
+class SalesInvoiceItem(UUIDModel, TimeStampedModel, TaxedLineModel):
     """
     Line items for Sales Invoice.
     """
@@ -193,6 +266,8 @@ class SalesInvoiceItem(UUIDModel, TimeStampedModel):
 
     rate = models.DecimalField(max_digits=12, decimal_places=2)
 
+    objects = BulkSignalQuerySet.as_manager()
+
     class Meta:
         db_table = "sales_invoice_items"
         verbose_name = "Sales Invoice Item"
@@ -0,0 +1,368 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core.models import StatusModel, TaxedLineModel
+from core.numbering import DocumentType, next_numbers
+from finance.credit import check_credit
+from logistics.models import DispatchItem
+from masters.taxes import apply_taxes
+from sales.models import (
+    SalesInvoice,
+    SalesInvoiceItem,
+    SalesOrder,
+    SalesOrderItem,
+    SalesQuotation,
+)
+
+
+OPEN_STATUSES = (
+    StatusModel.StatusChoices.SUBMITTED,
+    StatusModel.StatusChoices.APPROVED,
+)
+
+# Dispatches and invoices that count towards fulfilment of their order.
+COUNTED_STATUSES = OPEN_STATUSES + (StatusModel.StatusChoices.CLOSED,)
+
+REJECTED = StatusModel.StatusChoices.REJECTED
+
+# Reference under which stock is reserved for a sales order.
+ORDER_RESERVATION_REFERENCE = "SALES_ORDER"
+
+ZERO = Decimal("0")
+
+
+def _pks(objects):
+    return [getattr(obj, "pk", obj) for obj in objects]
+
+
+def _totals(queryset, order_field):
+    return {
+        (order_id, item_id): total
+        for order_id, item_id, total in queryset.order_by()
+        .values_list(order_field, "item_id")
+        .annotate(total=Sum("quantity"))
+    }
+
+
+def _allocate(lines, total, field):
+    """
+    Spread ``total`` over ``lines`` oldest first; anything beyond the
+    ordered quantity stays on the last line.
+    """
+    for index, line in enumerate(lines):
+        last = index == len(lines) - 1
+        share = total if last else min(line.quantity, total)
+        setattr(line, field, share)
+        total -= share
+
+
+def refresh_order_fulfilment(order_ids):
+    """
+    Recompute dispatched and invoiced quantities of the lines of
+    ``order_ids`` from their dispatches and invoices.
+
+    Each count is one grouped query over all the orders, matched to order
+    lines by item; only lines whose figures changed are written, with one
+    ``bulk_update``. Returns the lines that changed.
+    """
+    order_ids = {order_id for order_id in order_ids if order_id}
+    if not order_ids:
+        return []
+
+    with transaction.atomic():
+        lines = {}
+        for line in (
+            SalesOrderItem.objects.select_for_update()
+            .filter(order_id__in=order_ids)
+            .order_by("order_id", "created_at", "pk")
+        ):
+            lines.setdefault((line.order_id, line.item_id), []).append(line)
+
+        counts = {
+            "dispatched_quantity": _totals(
+                DispatchItem.objects.filter(
+                    dispatch__order_id__in=order_ids,
+                    dispatch__status__in=COUNTED_STATUSES,
+                    dispatch__is_active=True,
+                ),
+                "dispatch__order_id",
+            ),
+            "invoiced_quantity": _totals(
+                SalesInvoiceItem.objects.filter(
+                    invoice__order_id__in=order_ids,
+                    invoice__status__in=COUNTED_STATUSES,
+                    invoice__is_active=True,
+                ),
+                "invoice__order_id",
+            ),
+        }
+
+        changed = []
+        for key, matching in lines.items():
+            before = [
+                (line.dispatched_quantity, line.invoiced_quantity)
+                for line in matching
+            ]
+            for field, totals in counts.items():
+                _allocate(matching, totals.get(key, ZERO), field)
+            changed.extend(
+                line
+                for line, previous in zip(matching, before)
+                if (line.dispatched_quantity, line.invoiced_quantity) != previous
+            )
+
+        SalesOrderItem.objects.bulk_update(
+            changed, ["dispatched_quantity", "invoiced_quantity"]
+        )
+    return changed
+
+
+def order_backlog(customer=None, item=None):
+    """
+    Open sales order lines with quantity still to dispatch, read from the
+    maintained counters in a single query. Each line is annotated with
+    ``uninvoiced_quantity``.
+    """
+    lines = SalesOrderItem.objects.filter(
+        pending_quantity__gt=0,
+        order__status__in=OPEN_STATUSES,
+        order__is_active=True,
+    )
+    if customer is not None:
+        lines = lines.filter(order__customer=customer)
+    if item is not None:
+        lines = lines.filter(item=item)
+    return (
+        lines.annotate(uninvoiced_quantity=F("quantity") - F("invoiced_quantity"))
+        .select_related("order", "order__customer", "item")
+        .order_by("order__order_date", "order__order_number", "created_at")
+    )
+
+
+def backlog_summary():
+    """
+    Ordered, dispatched, invoiced and pending totals per open order, in one
+    grouped query over the order book.
+    """
+    return (
+        SalesOrderItem.objects.filter(
+            order__status__in=OPEN_STATUSES, order__is_active=True
+        )
+        .order_by()
+        .values("order_id", "order__order_number", "order__order_date")
+        .annotate(
+            ordered=Sum("quantity"),
+            dispatched=Sum("dispatched_quantity"),
+            invoiced=Sum("invoiced_quantity"),
+            pending=Sum("pending_quantity"),
+        )
+        .filter(pending__gt=0)
+        .order_by("order__order_date", "order__order_number")
+    )
+
+
+def _lines(model):
+    relation = model._meta.get_field("items")
+    return relation.related_model, relation.field.name
+
+
+def _customer_name(document):
+    if document.customer_name or document.customer is None:
+        return document.customer_name
+    return document.customer.name
+
+
+def _quantities_to_convert(lines, source_field, converted, quantities):
+    """
+    Quantity to convert per source line: what is left after earlier
+    conversions (matched to lines oldest first), or the requested quantity
+    from ``quantities``, which may not exceed it.
+    """
+    attname = f"{source_field}_id"
+    if quantities is not None:
+        quantities = {
+            getattr(line, "pk", line): Decimal(quantity)
+            for line, quantity in quantities.items()
+        }
+
+    already = dict(converted)
+    picked = {}
+    for line in lines:
+        key = (getattr(line, attname), line.item_id)
+        used = min(already.get(key, ZERO), line.quantity)
+        already[key] = already.get(key, ZERO) - used
+        left = line.quantity - used
+
+        quantity = left if quantities is None else quantities.get(line.pk, ZERO)
+        if quantity > left:
+            raise ValueError(
+                f"Cannot convert {quantity} of line {line.pk}; only {left} is left."
+            )
+        if quantity > 0:
+            picked[line] = quantity
+    return picked
+
+
+def convert_documents(
+    sources,
+    source_model,
+    target_model,
+    link_field,
+    number_field,
+    document_type,
+    day,
+    header,
+    line_values,
+    quantities=None,
+    validate=None,
+):
+    """
+    Convert many customer documents of ``source_model`` into
+    ``target_model`` documents.
+
+    ``link_field`` is the target's foreign key to its source. Each source
+    with quantity left to convert gets one target, numbered from
+    ``document_type`` and built from ``header(source)``; its lines are built
+    from ``line_values(source_line, quantity)``. By default all quantity not
+    yet converted by live (not rejected) targets is taken; ``quantities``
+    maps source lines to partial quantities instead. Taxed target lines get
+    their tax amounts from cached rates. ``validate(targets,
+    target_lines)`` may raise to stop the conversion before anything is
+    written.
+
+    Sources and lines are read, numbers reserved and targets and lines
+    written with ``bulk_create`` in a fixed number of queries, however many
+    documents and lines there are. Returns the targets created.
+    """
+    source_line_model, source_field = _lines(source_model)
+    target_line_model, target_field = _lines(target_model)
+
+    with transaction.atomic():
+        documents = {
+            document.pk: document
+            for document in source_model.objects.select_for_update(of=("self",))
+            .select_related("customer")
+            .filter(pk__in=_pks(sources), is_active=True)
+            .exclude(status=REJECTED)
+            .order_by("pk")
+        }
+        if not documents:
+            return []
+
+        lines = source_line_model.objects.filter(
+            **{f"{source_field}_id__in": documents}
+        ).order_by(source_field, "created_at", "pk")
+        converted = _totals(
+            target_line_model.objects.filter(
+                **{
+                    f"{target_field}__{link_field}_id__in": documents,
+                    f"{target_field}__is_active": True,
+                }
+            ).exclude(**{f"{target_field}__status": REJECTED}),
+            f"{target_field}__{link_field}_id",
+        )
+        picked = _quantities_to_convert(lines, source_field, converted, quantities)
+
+        by_source = {}
+        for line, quantity in picked.items():
+            by_source.setdefault(getattr(line, f"{source_field}_id"), []).append(
+                (line, quantity)
+            )
+        numbers = next_numbers(document_type, len(by_source), day)
+
+        targets = []
+        target_lines = []
+        for number, (source_id, source_lines) in zip(numbers, by_source.items()):
+            source = documents[source_id]
+            target = target_model(
+                **{number_field: number, link_field: source}, **header(source)
+            )
+            targets.append(target)
+            new_lines = [
+                target_line_model(
+                    **{target_field: target}, **line_values(line, quantity)
+                )
+                for line, quantity in source_lines
+            ]
+            if issubclass(target_line_model, TaxedLineModel):
+                customer = source.customer
+                apply_taxes(new_lines, customer.gst_number if customer else None)
+            target_lines.extend(new_lines)
+
+        if validate is not None:
+            validate(targets, target_lines)
+        target_model.objects.bulk_create(targets)
+        target_line_model.objects.bulk_create(target_lines)
+    return targets
+
+
+def _check_order_credit(orders, lines):
+    customers = {order.pk: order.customer_id for order in orders}
+    amounts = {}
+    for line in lines:
+        customer_id = customers[line.order_id]
+        amount = line.quantity * line.rate
+        amounts[customer_id] = amounts.get(customer_id, ZERO) + amount
+    check_credit(amounts)
+
+
+def convert_quotations_to_orders(quotations, order_date=None, quantities=None):
+    """
+    Raise sales orders from quotations, one order per quotation. Raises
+    ``CreditLimitExceeded`` if the orders would take a customer over their
+    credit limit.
+    """
+    order_date = order_date or timezone.localdate()
+    return convert_documents(
+        quotations,
+        SalesQuotation,
+        SalesOrder,
+        link_field="quotation",
+        number_field="order_number",
+        document_type=DocumentType.SALES_ORDER,
+        day=order_date,
+        header=lambda quotation: {
+            "customer_id": quotation.customer_id,
+            "customer_name": _customer_name(quotation),
+            "order_date": order_date,
+        },
+        line_values=lambda line, quantity: {
+            "item_id": line.item_id,
+            "quantity": quantity,
+            "rate": line.rate,
+            "tax_id": line.tax_id,
+        },
+        quantities=quantities,
+        validate=_check_order_credit,
+    )
+
+
+def convert_orders_to_invoices(orders, invoice_date=None, quantities=None):
+    """
+    Invoice sales orders, one invoice per order.
+    """
+    invoice_date = invoice_date or timezone.localdate()
+    return convert_documents(
+        orders,
+        SalesOrder,
+        SalesInvoice,
+        link_field="order",
+        number_field="invoice_number",
+        document_type=DocumentType.SALES_INVOICE,
+        day=invoice_date,
+        header=lambda order: {
+            "customer_id": order.customer_id,
+            "customer_name": _customer_name(order),
+            "invoice_date": invoice_date,
+        },
+        line_values=lambda line, quantity: {
+            "item_id": line.item_id,
+            "quantity": quantity,
+            "rate": line.rate,
+            "tax_id": line.tax_id,
+        },
+        quantities=quantities,
+    )
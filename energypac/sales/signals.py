@@ -0,0 +1,82 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.signals import post_bulk_write
+from sales import atp, services
+
+
+@receiver(post_save, sender="procurement.PurchaseOrderItem")
+@receiver(post_delete, sender="procurement.PurchaseOrderItem")
+@receiver(post_save, sender="sales.SalesOrderItem")
+@receiver(post_delete, sender="sales.SalesOrderItem")
+@receiver(post_save, sender="logistics.DispatchItem")
+@receiver(post_delete, sender="logistics.DispatchItem")
+@receiver(post_save, sender="inventory.StockLedger")
+def invalidate_line_atp(sender, instance, **kwargs):
+    atp.invalidate([instance.item_id])
+
+
+@receiver(post_save, sender="procurement.PurchaseOrder")
+@receiver(post_save, sender="sales.SalesOrder")
+@receiver(post_save, sender="logistics.Dispatch")
+def invalidate_document_atp(sender, instance, **kwargs):
+    atp.invalidate(instance.items.values_list("item_id", flat=True))
+
+
+@receiver(post_bulk_write, sender="procurement.PurchaseOrderItem")
+@receiver(post_bulk_write, sender="sales.SalesOrderItem")
+@receiver(post_bulk_write, sender="logistics.DispatchItem")
+@receiver(post_bulk_write, sender="inventory.StockLedger")
+def invalidate_bulk_atp(sender, instances, **kwargs):
+    atp.invalidate(instance.item_id for instance in instances)
+
+
+# Order fulfilment counters. Dispatches and invoices remember the order they
+# pointed at before saving, so moving one to another order refreshes both.
+
+
+@receiver(pre_save, sender="logistics.Dispatch")
+@receiver(pre_save, sender="sales.SalesInvoice")
+def remember_previous_order(sender, instance, **kwargs):
+    instance._previous_order_id = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list("order_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender="logistics.Dispatch")
+@receiver(post_save, sender="sales.SalesInvoice")
+@receiver(post_delete, sender="logistics.Dispatch")
+@receiver(post_delete, sender="sales.SalesInvoice")
+def refresh_document_fulfilment(sender, instance, **kwargs):
+    services.refresh_order_fulfilment(
+        [instance.order_id, getattr(instance, "_previous_order_id", None)]
+    )
+
+
+FULFILMENT_PARENTS = {
+    "logistics.DispatchItem": "dispatch",
+    "sales.SalesInvoiceItem": "invoice",
+}
+
+
+def _parent_order_ids(sender, instances):
+    parent = sender._meta.get_field(FULFILMENT_PARENTS[sender._meta.label])
+    return parent.related_model.objects.filter(
+        pk__in={getattr(instance, parent.attname) for instance in instances}
+    ).values_list("order_id", flat=True)
+
+
+@receiver(post_save, sender="logistics.DispatchItem")
+@receiver(post_save, sender="sales.SalesInvoiceItem")
+@receiver(post_delete, sender="logistics.DispatchItem")
+@receiver(post_delete, sender="sales.SalesInvoiceItem")
+def refresh_line_fulfilment(sender, instance, **kwargs):
+    services.refresh_order_fulfilment(_parent_order_ids(sender, [instance]))
+
+
+@receiver(post_bulk_write, sender="logistics.DispatchItem")
+@receiver(post_bulk_write, sender="sales.SalesInvoiceItem")
+def refresh_bulk_fulfilment(sender, instances, **kwargs):
+    services.refresh_order_fulfilment(_parent_order_ids(sender, instances))
@@ -1,3 +1,415 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import numbering
+from core.models import StatusModel
+from finance.models import InvoicePayment
+from inventory.models import StockLedger
+from inventory.reservations import reserve_stock
+from items.models import Item, ItemType
+from logistics.models import Dispatch, DispatchItem
+from masters.models import Customer, UnitOfMeasure, Warehouse
+from sales import atp
+from sales.models import SalesInvoice, SalesInvoiceItem, SalesOrder, SalesOrderItem
+from sales.services import (
+    backlog_summary,
+    convert_orders_to_invoices,
+    order_backlog,
+    refresh_order_fulfilment,
+)
+
+
+class AvailableToPromiseCacheTests(TestCase):
+    """
+    Cached ATP profiles are dropped only once stock changes commit.
+    """
+
+    def setUp(self):
+        cache.clear()
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.RAW_MATERIAL,
+            uom=uom,
+        )
+
+    def receive(self, quantity):
+        StockLedger.objects.bulk_create(
+            [
+                StockLedger(
+                    item=self.item,
+                    warehouse=self.warehouse,
+                    movement_type=StockLedger.MovementType.IN,
+                    quantity=quantity,
+                    reference_type="ADJUSTMENT",
+                    reference_id=uuid.uuid4(),
+                )
+            ]
+        )
+
+    def test_stock_writes_invalidate_profiles_on_commit(self):
+        atp.get_profiles([self.item.pk])
+        key = atp._cache_key(self.item.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.receive(5)
+            self.assertIsNotNone(cache.get(key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(key))
+
+        self.assertEqual(
+            atp.available_to_promise([self.item], datetime.date(2026, 12, 31)),
+            {self.item.pk: 5},
+        )
+
+
+class ReservedDemandTests(TestCase):
+    """
+    Stock reserved for an open sales order is counted once, as the
+    order's demand.
+    """
+
+    def setUp(self):
+        cache.clear()
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+        StockLedger.objects.create(
+            item=self.item,
+            warehouse=self.warehouse,
+            movement_type=StockLedger.MovementType.IN,
+            quantity=10,
+            reference_type="ADJUSTMENT",
+            reference_id=uuid.uuid4(),
+        )
+        customer = Customer.objects.create(name="Acme Power", code="ACME")
+        self.order = SalesOrder.objects.create(
+            order_number="SO-1",
+            customer=customer,
+            order_date=datetime.date(2026, 4, 1),
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        SalesOrderItem.objects.create(
+            order=self.order, item=self.item, quantity=6, rate=Decimal("100.00")
+        )
+
+    def test_order_reservations_are_not_taken_off_twice(self):
+        # 2 of the 8 reserved go beyond the order's demand and stay held.
+        reserve_stock([(self.item, self.warehouse, 8)], "SALES_ORDER", self.order.pk)
+
+        self.assertEqual(atp.reserved_for_demand([self.item.pk]), {self.item.pk: 6})
+        self.assertEqual(
+            atp.available_to_promise([self.item], datetime.date(2026, 12, 31)),
+            {self.item.pk: 2},
+        )
+
+    def test_other_reservations_are_taken_off(self):
+        reserve_stock([(self.item, self.warehouse, 3)], "DISPATCH", uuid.uuid4())
+
+        self.assertEqual(atp.reserved_for_demand([self.item.pk]), {})
+        self.assertEqual(
+            atp.available_to_promise([self.item], datetime.date(2026, 12, 31)),
+            {self.item.pk: 1},
+        )
+
+
+class MaintainedFieldsTests(TestCase):
+    """
+    Saving a stale document or line keeps the figures services maintain.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.item = Item.objects.create(
+            code="CABLE-1",
+            name="Cable",
+            item_type=ItemType.FINISHED_GOOD,
+            uom=uom,
+        )
+        self.customer = Customer.objects.create(name="Acme Power", code="ACME")
+        self.order = SalesOrder.objects.create(
+            order_number="SO-1",
+            customer=self.customer,
+            order_date=datetime.date(2026, 4, 1),
+        )
+        self.line = SalesOrderItem.objects.create(
+            order=self.order, item=self.item, quantity=5, rate=Decimal("100.00")
+        )
+
+    def test_stale_order_save_keeps_totals(self):
+        self.assertEqual(self.order.subtotal, 0)
+
+        self.order.remarks = "Urgent"
+        self.order.save()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.remarks, "Urgent")
+        self.assertEqual(self.order.subtotal, Decimal("500.00"))
+
+    def test_stale_line_save_keeps_fulfilment_counters(self):
+        SalesOrderItem.objects.filter(pk=self.line.pk).update(
+            dispatched_quantity=2, invoiced_quantity=1
+        )
+
+        self.line.rate = Decimal("90.00")
+        self.line.save()
+        self.line.refresh_from_db()
+        self.assertEqual(self.line.rate, Decimal("90.00"))
+        self.assertEqual(self.line.dispatched_quantity, 2)
+        self.assertEqual(self.line.invoiced_quantity, 1)
+
+    def test_stale_invoice_save_keeps_amount_paid(self):
+        invoice = SalesInvoice.objects.create(
+            invoice_number="INV-1",
+            customer=self.customer,
+            invoice_date=datetime.date(2026, 4, 1),
+        )
+        InvoicePayment.objects.create(
+            invoice=invoice,
+            payment_date=datetime.date(2026, 5, 1),
+            amount=Decimal("200.00"),
+        )
+
+        invoice.remarks = "Part paid"
+        invoice.save()
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.amount_paid, Decimal("200.00"))
+
+
+class OrderFulfilmentTests(TestCase):
+    """
+    Dispatched and invoiced quantities are spread over order lines oldest
+    first whenever dispatches and invoices change, and the backlog reads
+    them back.
+    """
+
+    def setUp(self):
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.warehouse = Warehouse.objects.create(name="Main Store", code="MAIN")
+        self.cable, self.wire = [
+            Item.objects.create(
+                code=code, name=code, item_type=ItemType.FINISHED_GOOD, uom=uom
+            )
+            for code in ("CABLE-1", "WIRE-1")
+        ]
+        self.customer = Customer.objects.create(name="Acme Power", code="ACME")
+        self.order = self.create_order(
+            "SO-1", datetime.date(2026, 4, 1), (self.cable, 4), (self.cable, 6)
+        )
+        self.other = self.create_order(
+            "SO-2", datetime.date(2026, 4, 5), (self.wire, 5)
+        )
+
+    def create_order(self, number, order_date, *lines):
+        order = SalesOrder.objects.create(
+            order_number=number,
+            customer=self.customer,
+            order_date=order_date,
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        for item, quantity in lines:
+            SalesOrderItem.objects.create(
+                order=order, item=item, quantity=quantity, rate=Decimal("100.00")
+            )
+        return order
+
+    def dispatch(self, number, order, item, quantity, **fields):
+        dispatch = Dispatch.objects.create(
+            dispatch_number=number,
+            order=order,
+            dispatch_date=datetime.date(2026, 4, 10),
+            warehouse=self.warehouse,
+            status=fields.pop("status", Dispatch.StatusChoices.APPROVED),
+        )
+        DispatchItem.objects.create(dispatch=dispatch, item=item, quantity=quantity)
+        return dispatch
+
+    def counts(self, order, field):
+        return list(
+            order.items.order_by("created_at", "pk").values_list(field, flat=True)
+        )
+
+    def test_dispatches_fill_the_oldest_lines_first(self):
+        first = self.dispatch("DSP-1", self.order, self.cable, 5)
+        self.assertEqual(self.counts(self.order, "dispatched_quantity"), [4, 1])
+
+        self.dispatch("DSP-2", self.order, self.cable, 7)
+        self.dispatch(
+            "DSP-3", self.order, self.cable, 9, status=Dispatch.StatusChoices.DRAFT
+        )
+        # Anything beyond the ordered quantity stays on the last line.
+        self.assertEqual(self.counts(self.order, "dispatched_quantity"), [4, 8])
+
+        first.delete()
+        self.assertEqual(self.counts(self.order, "dispatched_quantity"), [4, 3])
+        self.assertEqual(refresh_order_fulfilment([self.order.pk, None]), [])
+
+    def test_invoices_moved_to_another_order_refresh_both(self):
+        invoice = SalesInvoice.objects.create(
+            invoice_number="INV-1",
+            customer=self.customer,
+            order=self.order,
+            invoice_date=datetime.date(2026, 4, 10),
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        SalesInvoiceItem.objects.bulk_create(
+            [
+                SalesInvoiceItem(
+                    invoice=invoice, item=item, quantity=3, rate=Decimal("100.00")
+                )
+                for item in (self.cable, self.wire)
+            ]
+        )
+        self.assertEqual(self.counts(self.order, "invoiced_quantity"), [3, 0])
+
+        invoice.order = self.other
+        invoice.save()
+        self.assertEqual(self.counts(self.order, "invoiced_quantity"), [0, 0])
+        self.assertEqual(self.counts(self.other, "invoiced_quantity"), [3])
+
+    def test_backlog(self):
+        self.dispatch("DSP-1", self.other, self.wire, 5)
+        self.dispatch("DSP-2", self.order, self.cable, 5)
+        invoice = SalesInvoice.objects.create(
+            invoice_number="INV-1",
+            customer=self.customer,
+            order=self.order,
+            invoice_date=datetime.date(2026, 4, 10),
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        SalesInvoiceItem.objects.create(
+            invoice=invoice, item=self.cable, quantity=2, rate=Decimal("100.00")
+        )
+        draft = self.create_order("SO-3", datetime.date(2026, 4, 2), (self.wire, 1))
+        draft.status = StatusModel.StatusChoices.DRAFT
+        draft.save()
+
+        backlog = list(order_backlog())
+        self.assertEqual(
+            [
+                (line.order.order_number, line.pending_quantity)
+                for line in backlog
+            ],
+            [("SO-1", 5)],
+        )
+        self.assertEqual(backlog[0].uninvoiced_quantity, 6)
+        self.assertEqual(list(order_backlog(item=self.wire)), [])
+        self.assertEqual(len(order_backlog(customer=self.customer)), 1)
+
+        self.assertEqual(
+            [
+                (
+                    row["order__order_number"],
+                    row["ordered"],
+                    row["dispatched"],
+                    row["invoiced"],
+                    row["pending"],
+                )
+                for row in backlog_summary()
+            ],
+            [("SO-1", 10, 5, 2, 5)],
+        )
+
+
+class DocumentConversionTests(TestCase):
+    """
+    Orders are invoiced in part or in full, never beyond what is left to
+    convert, in a fixed number of queries.
+    """
+
+    def setUp(self):
+        numbering._blocks.clear()
+        uom = UnitOfMeasure.objects.create(name="Numbers", code="NOS")
+        self.cable, self.wire = [
+            Item.objects.create(
+                code=code, name=code, item_type=ItemType.FINISHED_GOOD, uom=uom
+            )
+            for code in ("CABLE-1", "WIRE-1")
+        ]
+        self.customer = Customer.objects.create(name="Acme Power", code="ACME")
+        self.order = self.create_order("SO-1", (self.cable, 10), (self.wire, 4))
+
+    def create_order(self, number, *lines):
+        order = SalesOrder.objects.create(
+            order_number=number,
+            customer=self.customer,
+            order_date=datetime.date(2026, 4, 1),
+            status=StatusModel.StatusChoices.APPROVED,
+        )
+        for item, quantity in lines:
+            SalesOrderItem.objects.create(
+                order=order, item=item, quantity=quantity, rate=Decimal("100.00")
+            )
+        return order
+
+    def invoice(self, *orders, quantities=None):
+        return convert_orders_to_invoices(
+            orders, datetime.date(2026, 4, 10), quantities=quantities
+        )
+
+    def lines(self, invoice):
+        return list(
+            invoice.items.order_by("item__code").values_list("item__code", "quantity")
+        )
+
+    def test_orders_are_invoiced_in_part_then_in_full(self):
+        cable = self.order.items.get(item=self.cable)
+        (partial,) = self.invoice(self.order, quantities={cable: 4})
+        self.assertEqual(partial.order, self.order)
+        self.assertEqual(partial.customer, self.customer)
+        self.assertEqual(self.lines(partial), [("CABLE-1", 4)])
+
+        other = self.create_order("SO-2", (self.cable, 5))
+        invoices = self.invoice(self.order, other)
+        self.assertEqual(
+            {invoice.order.order_number: self.lines(invoice) for invoice in invoices},
+            {"SO-1": [("CABLE-1", 6), ("WIRE-1", 4)], "SO-2": [("CABLE-1", 5)]},
+        )
+        self.assertEqual(len({invoice.invoice_number for invoice in invoices}), 2)
+        self.assertEqual(self.invoice(self.order, other), [])
+
+        # A rejected invoice no longer counts as converted.
+        partial.status = StatusModel.StatusChoices.REJECTED
+        partial.save()
+        (again,) = self.invoice(self.order)
+        self.assertEqual(self.lines(again), [("CABLE-1", 4)])
+
+    def test_over_conversion_is_refused(self):
+        cable = self.order.items.get(item=self.cable)
+        with self.assertRaisesMessage(ValueError, "only 10"):
+            self.invoice(self.order, quantities={cable.pk: 11})
+        self.assertFalse(SalesInvoice.objects.exists())
+
+        self.invoice(self.order, quantities={cable: 4})
+        with self.assertRaisesMessage(ValueError, "only 6"):
+            self.invoice(self.order, quantities={cable: "6.5"})
+        self.assertEqual(SalesInvoice.objects.count(), 1)
+
+    def test_conversion_runs_a_fixed_number_of_queries(self):
+        def convert(*orders):
+            numbering._blocks.clear()
+            with CaptureQueriesContext(connection) as queries:
+                invoices = self.invoice(*orders)
+            self.assertEqual(len(invoices), len(orders))
+            return len(queries)
 
-# Create your tests here.
+        orders = [
+            self.create_order(f"SO-{n}", (self.cable, n), (self.wire, 1))
+            for n in range(2, 6)
+        ]
+        # The first invoice of the year also creates its number sequence.
+        convert(self.order)
+        self.assertEqual(convert(orders[0]), convert(*orders[1:]))